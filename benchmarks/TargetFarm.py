@@ -0,0 +1,203 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Event, Process
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+import random
+import time
+
+
+class TargetHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of the target farm.
+
+    The behaviour of each target is set in the query string of the url:
+        latency : seconds before the response is sent
+        error_rate : probability of answering with a 500
+        flap : seconds of each up and down period. The target starts up and is down every other period
+        size : bytes of the body
+    """
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like most of the real webs
+
+    def do_GET(self):
+        self.__respond(True)
+
+    def do_HEAD(self):
+        self.__respond(False)
+
+    def __respond(self, send_body):
+        """Send the response of the target
+
+        Parameters
+        ----------
+        send_body : bool
+            False for HEAD requests
+        """
+        options = {key: float(values[0]) for key, values in parse_qs(urlsplit(self.path).query).items()}
+        time.sleep(options.get('latency', 0.0))
+
+        status_code = 200
+        flap = options.get('flap', 0.0)
+        if flap > 0 and int((time.time() - self.server.start_time) / flap) % 2 == 1:  # Down period
+            status_code = 503
+        elif random.random() < options.get('error_rate', 0.0):
+            status_code = 500
+
+        body = b'x' * int(options.get('size', 100))
+        self.send_response(status_code)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Don't print each request
+
+
+class FarmServer(ThreadingHTTPServer):
+    """
+    Threading HTTP server that accepts many connections at the same time.
+    """
+
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def run_servers(host, ports, start_time, stop):
+    """Entry point of the process of the servers. Runs them until the stop event is set
+
+    Parameters
+    ----------
+    host : str
+        Address of the servers
+    ports : list
+        Port of each server
+    start_time : float
+        Timestamp when the flapping periods start
+    stop : multiprocessing.Event
+        Event to stop the servers
+    """
+    for port in ports:
+        server = FarmServer((host, port), TargetHandler)
+        server.start_time = start_time
+        Thread(target=server.serve_forever, daemon=True).start()
+    stop.wait()
+
+
+class TargetFarm(object):
+    """
+    A class that runs local HTTP servers to benchmark the monitor without internet.
+
+    The servers run in another process, so they don't compete for the GIL with the monitor.
+
+    Attributes
+    ----------
+    host : str
+        Address of the servers
+    ports : list
+        Port of each server
+    start_time : float
+        Timestamp when the flapping periods start
+    _stop : multiprocessing.Event
+        Event to stop the servers
+    _process : Process
+        Process of the servers
+
+    Methods
+    -------
+    """
+
+    def __init__(self, servers=4, first_port=18080, host='127.0.0.1'):
+        """
+        Parameters
+        ----------
+        servers : int
+            Number of servers, each one in its own port
+        first_port : int
+            Port of the first server
+        host : str
+            Address of the servers
+        """
+        self.host = host
+        self.ports = [first_port + index for index in range(servers)]
+        self.start_time = time.time()
+        self._stop = Event()
+        self._process = None
+
+    def url(self, index, latency=0.0, error_rate=0.0, flap=0.0, size=100):
+        """Url of a target
+
+        Parameters
+        ----------
+        index : int
+            Index of the target, used to choose the server
+        latency : float
+            Seconds before the response is sent
+        error_rate : float
+            Probability of answering with a 500
+        flap : float
+            Seconds of each up and down period. 0 for a target that doesn't flap
+        size : int
+            Bytes of the body
+
+        Returns
+        -------
+        url : str
+        """
+        port = self.ports[index % len(self.ports)]
+        return "http://{}:{}/target/{}?latency={}&error_rate={}&flap={}&size={}".format(
+            self.host, port, index, latency, error_rate, flap, size)
+
+    def down_periods(self, flap, until):
+        """Start times of the down periods of a flapping target
+
+        Parameters
+        ----------
+        flap : float
+            Seconds of each up and down period
+        until : float
+            Last timestamp
+
+        Returns
+        -------
+        starts : list
+            Timestamps when the target went down
+        """
+        starts = []
+        start = self.start_time + flap
+        while start < until:
+            starts.append(start)
+            start += 2 * flap
+
+        return starts
+
+    def up_periods(self, flap, until):
+        """Start times of the up periods of a flapping target, without the first one
+
+        Parameters
+        ----------
+        flap : float
+            Seconds of each up and down period
+        until : float
+            Last timestamp
+
+        Returns
+        -------
+        starts : list
+            Timestamps when the target was up again
+        """
+        return [start + flap for start in self.down_periods(flap, until) if start + flap < until]
+
+    def start(self):
+        """Starts the process of the servers and waits until they accept connections
+        """
+        self._process = Process(target=run_servers, args=(self.host, self.ports, self.start_time, self._stop),
+                                daemon=True)
+        self._process.start()
+        time.sleep(0.5)
+
+    def stop(self):
+        """Stops the servers
+        """
+        self._stop.set()
+        self._process.join()
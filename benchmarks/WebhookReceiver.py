@@ -0,0 +1,108 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+import argparse
+import json
+import random
+import time
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of the webhook receiver. Saves the body of each POST and answers with the configured behaviour.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.latency)
+        if random.random() < self.server.fail_rate:
+            status_code = 503
+        else:
+            status_code = 200
+            self.server.receive(json.loads(body))
+        self.send_response(status_code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass  # Don't print each request
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """
+    A local stand-in of a webhook, to test the alert sinks without internet.
+
+    It saves the batches of alerts that it accepts. The failures and the latency of a real webhook can be simulated.
+
+    Attributes
+    ----------
+    fail_rate : float
+        Probability of answering with a 503 without saving the batch
+    latency : float
+        Seconds before each response
+    batches : list
+        Bodies of the accepted requests, oldest first
+    _lock : Lock
+        Lock for the batches, saved by the threads of the requests
+
+    Methods
+    -------
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, host='127.0.0.1', fail_rate=0.0, latency=0.0):
+        """
+        Parameters
+        ----------
+        port : int
+            Port where the receiver listens. 0 = any free port
+        host : str
+            Address where the receiver listens
+        fail_rate : float
+            Probability of answering with a 503 without saving the batch
+        latency : float
+            Seconds before each response
+        """
+        super().__init__((host, port), WebhookHandler)
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.batches = []
+        self._lock = Lock()
+
+    @property
+    def url(self):
+        return "http://{}:{}/".format(*self.server_address)
+
+    def receive(self, body):
+        """Save an accepted batch
+
+        Parameters
+        ----------
+        body : dict
+            Body of the request, with the list of alerts
+        """
+        with self._lock:
+            self.batches.append(body)
+        print("Received {} alerts: {}".format(len(body['alerts']), json.dumps(body['alerts'])), flush=True)
+
+    def start(self):
+        """Starts the thread of the server
+        """
+        Thread(target=self.serve_forever, name="WebhookReceiver", daemon=True).start()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local webhook that prints the alerts it receives")
+    parser.add_argument('--port', type=int, default=9000, help="port where the webhook listens")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="probability of answering with a 503")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before each response")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    receiver = WebhookReceiver(arguments.port, fail_rate=arguments.fail_rate, latency=arguments.latency)
+    print("Listening on {}".format(receiver.url), flush=True)
+    receiver.serve_forever()
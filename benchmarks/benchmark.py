@@ -0,0 +1,404 @@
+from configparser import ConfigParser
+from datetime import datetime, timedelta
+from threading import Thread
+import argparse
+import json
+import logging
+import os
+import platform
+import queue
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+
+from benchmarks import TargetFarm as tf
+from classes import Engines
+from classes import ResultStore as rs
+from classes import TargetLoader as tl
+from model import SqliteWeb as sqlite_web
+from model import Web as web
+import main
+
+
+def rss_bytes():
+    """Resident memory of this process
+
+    Returns
+    -------
+    rss : int
+        Bytes of resident memory. 0 if /proc is not available
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def git_revision():
+    """Revision of the code that is benchmarked
+
+    Returns
+    -------
+    revision : str
+        Git commit or None if git is not available
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def generate_config(farm, args):
+    """Generate the app configuration with the webs of the farm
+
+    Parameters
+    ----------
+    farm : TargetFarm
+        Farm of targets
+    args : argparse.Namespace
+        Benchmark options
+
+    Returns
+    -------
+    config : ConfigParser
+        Configuration with a section for each web
+    flapping : set
+        Names of the webs that flap
+    """
+    config = ConfigParser()
+    config['default'] = {
+        'home_dir': os.getcwd(),
+        'engine': args.engine,
+        'workers': str(args.workers),
+        'max_in_flight': str(args.max_in_flight)
+    }
+    flapping = set()
+    flapping_every = int(1 / args.flapping) if args.flapping > 0 else 0
+    for index in range(args.webs):
+        name = "Target{}".format(index)
+        flap = args.flap_period if flapping_every and index % flapping_every == 0 else 0.0
+        if flap:
+            flapping.add(name)
+        config[name] = {
+            'name': name,
+            'interval': str(args.interval),
+            'url': farm.url(index, args.latency, args.error_rate, flap),
+            'probe': args.probe
+        }
+
+    return config, flapping
+
+
+def collect_alerts(alerts, received):
+    """Infinite loop that saves the alerts with the time they arrived
+
+    Parameters
+    ----------
+    alerts : queue.Queue
+        Alerts of the webs
+    received : list
+        List where the alerts are saved
+    """
+    while True:
+        alert = alerts.get()
+        alert['received'] = time.time()
+        received.append(alert)
+
+
+def detection_delays(farm, alerts, flapping, until, flap_period):
+    """Seconds between each status change of the flapping targets and its alert
+
+    Parameters
+    ----------
+    farm : TargetFarm
+        Farm of targets
+    alerts : list
+        Alerts received
+    flapping : set
+        Names of the webs that flap
+    until : float
+        Timestamp when the benchmark finished
+    flap_period : float
+        Seconds of each up and down period
+
+    Returns
+    -------
+    delays : dict
+        Delays of the down and up alerts
+    """
+    changes = {
+        False: farm.down_periods(flap_period, until),
+        True: farm.up_periods(flap_period, until)
+    }
+    delays = {False: [], True: []}
+    for alert in alerts:
+        if alert['name'] not in flapping:
+            continue
+        previous = [change for change in changes[alert['status']] if change <= alert['received']]
+        if previous:
+            delays[alert['status']].append(alert['received'] - previous[-1])
+
+    return {
+        'down_alerts': len(delays[False]),
+        'down_delay_avg': round(sum(delays[False]) / len(delays[False]), 3) if delays[False] else None,
+        'down_delay_max': round(max(delays[False]), 3) if delays[False] else None,
+        'up_alerts': len(delays[True]),
+        'up_delay_avg': round(sum(delays[True]) / len(delays[True]), 3) if delays[True] else None
+    }
+
+
+def stats_latency(webs, repeat=5):
+    """Microseconds per web of the running stats and of the stats calculated from the responses
+
+    Parameters
+    ----------
+    webs : list
+        Web objects
+    repeat : int
+        Times each measure is repeated
+
+    Returns
+    -------
+    latency : dict
+    """
+    now = time.time()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for monitored_web in webs:
+            monitored_web.window_stats(10, now)
+    window_seconds = time.perf_counter() - start
+
+    time_from = datetime.now() - timedelta(minutes=10)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for monitored_web in webs:
+            monitored_web.calculate_stats(time_from)
+    scan_seconds = time.perf_counter() - start
+
+    return {
+        'window_stats_us': round(window_seconds / (repeat * len(webs)) * 1e6, 2),
+        'calculate_stats_us': round(scan_seconds / (repeat * len(webs)) * 1e6, 2)
+    }
+
+
+def startup(targets, interval):
+    """Seconds and memory to load, validate and create the webs of a targets file
+
+    The memory is the growth of the resident memory, that is the peak memory because the freed memory is kept by the
+    process. It's measured after the checks of the benchmark, so it doesn't reuse memory freed before the checks
+
+    Parameters
+    ----------
+    targets : int
+        Number of webs of the targets file
+    interval : int
+        Seconds between checks of each web
+
+    Returns
+    -------
+    startup : dict
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'targets.csv')
+        with open(path, 'w') as targets_file:
+            targets_file.write("name,interval,url\n")
+            for index in range(targets):
+                targets_file.write("Target{0},{1},http://127.0.0.1:18080/{0}\n".format(index, interval))
+
+        rss_start = rss_bytes()
+        start = time.perf_counter()
+        webs_data = tl.TargetLoader(path).load()
+        load_seconds = time.perf_counter() - start
+        rss_load = rss_bytes()
+        start = time.perf_counter()
+        webs = [web.Web(**web_data) for web_data in webs_data.values()]
+        create_seconds = time.perf_counter() - start
+        rss_end = rss_bytes()
+
+    return {
+        'targets': len(webs),
+        'load_seconds': round(load_seconds, 3),
+        'create_seconds': round(create_seconds, 3),
+        'load_rss_mb': round((rss_load - rss_start) / 2 ** 20, 2),
+        'rss_mb': round((rss_end - rss_start) / 2 ** 20, 2)
+    }
+
+
+def restart(webs, interval):
+    """Seconds to create the webs of the sqlite model when the database has their responses of the retention time
+
+    Parameters
+    ----------
+    webs : int
+        Number of webs
+    interval : int
+        Seconds between the saved responses of each web
+
+    Returns
+    -------
+    restart : dict
+    """
+    retention = web.Web.optional_keys['retention']
+    with tempfile.TemporaryDirectory() as directory:
+        store = rs.ResultStore(os.path.join(directory, 'monitor.db'))
+        now = time.time()
+        connection = sqlite3.connect(store.path)
+        with connection:
+            for index in range(webs):
+                connection.executemany("INSERT INTO responses VALUES (?, ?, ?, ?, ?)", (
+                    ("Target{}".format(index), now - offset, 1, 200, random.uniform(0.01, 0.5))
+                    for offset in range(retention * 60, 0, -interval)))
+        connection.close()
+
+        start = time.perf_counter()
+        restarted = [sqlite_web.SqliteWeb(store, name="Target{}".format(index), interval=interval,
+                                          url="http://127.0.0.1:18080/{}".format(index)) for index in range(webs)]
+        seconds = time.perf_counter() - start
+        store.close()
+
+    return {
+        'webs': len(restarted),
+        'responses': sum(len(restarted_web.responses) for restarted_web in restarted),
+        'seconds': round(seconds, 3)
+    }
+
+
+def run(args):
+    """Run the benchmark
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Benchmark options
+
+    Returns
+    -------
+    result : dict
+        Options and results of the benchmark
+    """
+    farm = tf.TargetFarm(args.servers, args.port)
+    farm.start()
+    try:
+        config, flapping = generate_config(farm, args)
+        webs_data = main.conf_to_dict(config)['webs']
+
+        rss_start = rss_bytes()
+        alerts = queue.Queue()
+        webs = []
+        for web_name in webs_data.keys():
+            monitored_web = web.Web(**webs_data[web_name])
+            monitored_web.alerts = alerts
+            webs.append(monitored_web)
+        received = []
+        Thread(target=collect_alerts, args=(alerts, received), daemon=True).start()
+
+        engine = Engines.create_engine(webs, dict(config['default']))
+        cpu_start = time.process_time()
+        start = time.time()
+        engine.start()
+        engine.stats()  # Reset the scheduler lag
+
+        time.sleep(args.duration)
+
+        elapsed = time.time() - start
+        cpu_seconds = time.process_time() - cpu_start
+        engine_stats = engine.stats()
+        rss_end = rss_bytes()
+        checks = sum(len(monitored_web.responses) for monitored_web in webs)
+    finally:
+        farm.stop()
+
+    return {
+        'revision': git_revision(),
+        'date': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'options': vars(args),
+        'results': {
+            'checks': checks,
+            'checks_per_second': round(checks / elapsed, 2),
+            'expected_checks_per_second': round(args.webs / args.interval, 2),
+            'scheduler': engine_stats['scheduler'],
+            'connections': engine_stats['connections'],
+            'cpu_percent': round(cpu_seconds / elapsed * 100, 2),
+            'cpu_ms_per_check': round(cpu_seconds / checks * 1000, 4) if checks else None,
+            'rss_mb': round(rss_end / 2 ** 20, 2),
+            'rss_kb_per_web': round((rss_end - rss_start) / args.webs / 1024, 2),
+            'stats_latency': stats_latency(webs),
+            'alerts': detection_delays(farm, received, flapping, time.time(), args.flap_period),
+            'startup': startup(args.targets, args.interval) if args.targets > 0 else None,
+            'restart': restart(args.restart_webs, args.interval) if args.restart_webs > 0 else None
+        }
+    }
+
+
+def compare(result, previous):
+    """Print the change of the main results against a previous benchmark
+
+    Parameters
+    ----------
+    result : dict
+        Result of this benchmark
+    previous : dict
+        Result of the previous benchmark
+    """
+    keys = ('checks_per_second', 'cpu_percent', 'cpu_ms_per_check', 'rss_kb_per_web')
+    print("Comparing with revision {}".format(previous.get('revision')))
+    for key in keys:
+        old, new = previous['results'].get(key), result['results'].get(key)
+        change = "{:+.1f}%".format((new - old) / old * 100) if old and new is not None else "n/a"
+        print("{}: {} -> {} ({})".format(key, old, new, change))
+    old, new = previous['results']['scheduler']['lag_avg'], result['results']['scheduler']['lag_avg']
+    print("scheduler lag_avg: {} -> {}".format(old, new))
+    for key in ('window_stats_us', 'calculate_stats_us'):
+        old, new = previous['results']['stats_latency'][key], result['results']['stats_latency'][key]
+        print("{}: {} -> {}".format(key, old, new))
+    if previous['results'].get('startup') and result['results']['startup']:
+        for key in ('load_seconds', 'create_seconds', 'rss_mb'):
+            old, new = previous['results']['startup'][key], result['results']['startup'][key]
+            print("startup {}: {} -> {}".format(key, old, new))
+    if previous['results'].get('restart') and result['results']['restart']:
+        old, new = previous['results']['restart']['seconds'], result['results']['restart']['seconds']
+        print("restart seconds: {} -> {}".format(old, new))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the web monitor against a local target farm")
+    parser.add_argument('--webs', type=int, default=500, help="number of monitored webs")
+    parser.add_argument('--interval', type=int, default=1, help="seconds between checks of each web")
+    parser.add_argument('--duration', type=float, default=120, help="seconds the monitor runs")
+    # The coordinator only checks the webs through worker nodes, which the benchmark doesn't start
+    parser.add_argument('--engine', choices=('thread', 'asyncio'), default='thread',
+                        help="engine that checks the webs (default %(default)s)")
+    parser.add_argument('--workers', type=int, default=50, help="worker threads of the thread engine")
+    parser.add_argument('--max-in-flight', type=int, default=100, help="max requests of the asyncio engine")
+    parser.add_argument('--probe', default='get', help="probe mode of the webs")
+    parser.add_argument('--servers', type=int, default=4, help="number of servers of the farm")
+    parser.add_argument('--port', type=int, default=18080, help="port of the first server")
+    parser.add_argument('--latency', type=float, default=0.01, help="seconds each target takes to respond")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="probability of a 500 response")
+    parser.add_argument('--flapping', type=float, default=0.1, help="fraction of the webs that flap")
+    parser.add_argument('--flap-period', type=float, default=40, help="seconds of each up and down period")
+    parser.add_argument('--targets', type=int, default=20000,
+                        help="webs of the targets file of the startup measure. 0 = not measured")
+    parser.add_argument('--restart-webs', type=int, default=1000,
+                        help="webs of the sqlite model of the restart measure. 0 = not measured")
+    parser.add_argument('--output', default='bench_output.json', help="file where the results are saved")
+    parser.add_argument('--compare', help="results file of a previous benchmark")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    arguments = parse_args()
+    benchmark_result = run(arguments)
+
+    with open(arguments.output, 'w') as output:
+        json.dump(benchmark_result, output, indent=2)
+    print(json.dumps(benchmark_result['results'], indent=2))
+
+    if arguments.compare:
+        with open(arguments.compare) as previous_output:
+            compare(benchmark_result, json.load(previous_output))
@@ -0,0 +1,288 @@
+from collections import deque
+from threading import Lock, Thread
+import logging
+import queue
+import time
+
+from exceptions import alert_exception as ae
+
+
+class AlertDispatcher(object):
+    """
+    A class that delivers the alerts of the webs to the sinks in batches, in background threads.
+
+    The alerts are put in a queue, so the checks and the console never wait for a sink. The alerts that arrive within
+    batch_window seconds of the first one are sent together, so when a shared dependency fails and hundreds of webs
+    change at once the sinks get one notification. Inside a batch only the last alert of each web is kept, and an
+    alert with the same status that was already sent is dropped. The first alert of a web is only sent if it's down,
+    because a web that starts up didn't recover from anything. A web that changed its status more than flap_limit
+    times in the last flap_window seconds is flapping: its alerts are held and only its last status is sent when it
+    stops flapping.
+
+    Each sink has its own thread and queue, so a slow or failing sink doesn't delay the others. A failed batch is sent
+    again up to retries times, waiting retry_backoff seconds doubled after each attempt. The batches that arrive
+    meanwhile are sent together with it.
+
+    Attributes
+    ----------
+    sinks : list
+        Sinks where the alerts are sent. Each one has a send method that receives a list of alerts
+    batch_window : float
+        Seconds the alerts that arrive after the first one of a batch are waited for
+    max_batch : int
+        Max alerts of a batch
+    flap_window : float
+        Seconds of the status changes counted to know if a web is flapping
+    flap_limit : int
+        Max status changes in flap_window seconds of a web that is not flapping
+    retries : int
+        Times a failed batch is sent again
+    retry_backoff : float
+        Seconds waited before the first retry
+    log : LogRecord
+        log object
+    _queue : queue.Queue
+        Alerts waiting to be batched
+    _sink_queues : list
+        Batches waiting to be sent to each sink
+    _sent_status : dict
+        Last status sent of each web name
+    _changes : dict
+        Timestamps of the last status changes of each web name
+    _held : dict
+        Last alert of each flapping web, sent when it stops flapping
+    _stats : dict
+        Counters since the last stats
+    _lock : Lock
+        Lock for the counters, updated by the threads of the sinks
+
+    Methods
+    -------
+    """
+
+    def __init__(self, sinks, batch_window=1.0, max_batch=100, flap_window=600.0, flap_limit=4, retries=3,
+                 retry_backoff=1.0):
+        """
+        Parameters
+        ----------
+        sinks : list
+            Sinks where the alerts are sent
+        batch_window : float
+            Seconds the alerts that arrive after the first one of a batch are waited for
+        max_batch : int
+            Max alerts of a batch
+        flap_window : float
+            Seconds of the status changes counted to know if a web is flapping
+        flap_limit : int
+            Max status changes in flap_window seconds of a web that is not flapping. 0 = flapping is not detected
+        retries : int
+            Times a failed batch is sent again
+        retry_backoff : float
+            Seconds waited before the first retry
+        """
+        self.sinks = list(sinks)
+        self.batch_window = batch_window
+        self.max_batch = max(1, max_batch)
+        self.flap_window = flap_window
+        self.flap_limit = flap_limit
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.log = logging.getLogger("Monitor")
+        self._queue = queue.Queue()
+        self._sink_queues = [queue.Queue() for _ in self.sinks]
+        self._sent_status = {}
+        self._changes = {}
+        self._held = {}
+        self._stats = self.__empty_stats()
+        self._lock = Lock()
+
+    @property
+    def holding(self):
+        return bool(self._held)
+
+    @staticmethod
+    def __empty_stats():
+        return {'alerts': 0, 'batches': 0, 'sent': 0, 'duplicates': 0, 'held': 0, 'retries': 0, 'failed': 0}
+
+    def start(self):
+        """Starts the thread that makes the batches and the thread of each sink
+        """
+        Thread(target=self.__batch, name="AlertBatcher", daemon=True).start()
+        for sink, batches in zip(self.sinks, self._sink_queues):
+            Thread(target=self.__deliver, args=(sink, batches), name="AlertSink", daemon=True).start()
+
+    def put(self, alert):
+        """Queue an alert to be sent. It never blocks
+
+        Parameters
+        ----------
+        alert : dict
+            Name of the web, its new status, its availability and the timestamp of the change
+        """
+        self._queue.put(alert)
+
+    def __batch(self):
+        """Infinite loop that groups the alerts in batches and gives them to the sinks
+        """
+        while True:
+            alerts = []
+            try:
+                alerts.append(self._queue.get(timeout=self.batch_window))  # Timeout to release the held alerts
+                deadline = time.monotonic() + self.batch_window
+                while len(alerts) < self.max_batch:
+                    alerts.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            batch = self.filter(alerts, time.time())
+            if batch:
+                for batches in self._sink_queues:
+                    batches.put(batch)
+
+    def filter(self, alerts, now):
+        """Remove the repeated alerts and the alerts of the flapping webs, and add the held alerts of the webs that
+        stopped flapping
+
+        Parameters
+        ----------
+        alerts : list
+            Alerts received, oldest first
+        now : float
+            Actual timestamp
+
+        Returns
+        -------
+        batch : list
+            Alerts that are sent
+        """
+        latest = {}
+        for alert in alerts:
+            if alert['status'] and alert['name'] not in self._sent_status and alert['name'] not in latest:
+                self._sent_status[alert['name']] = alert['status']  # First status of the web, it's not a recovery
+                continue
+            self.__add_change(alert['name'], alert['timestamp'])
+            latest.pop(alert['name'], None)  # The order of the batch is the order of the last alerts
+            latest[alert['name']] = alert
+        for name in list(self._held.keys()):  # Webs that stopped flapping
+            if name not in latest and not self.__flapping(name, now):
+                latest[name] = self._held.pop(name)
+
+        batch = []
+        duplicates = held = 0
+        for name, alert in latest.items():
+            if self.__flapping(name, now):
+                self._held[name] = alert
+                held += 1
+                continue
+            self._held.pop(name, None)
+            if self._sent_status.get(name) == alert['status']:  # It changed and went back, or it was already sent
+                duplicates += 1
+                continue
+            self._sent_status[name] = alert['status']
+            batch.append(alert)
+
+        with self._lock:
+            self._stats['alerts'] += len(alerts)
+            self._stats['duplicates'] += duplicates
+            self._stats['held'] += held
+            if batch:
+                self._stats['batches'] += 1
+        return batch
+
+    def __add_change(self, name, timestamp):
+        """Save a status change of a web
+
+        Parameters
+        ----------
+        name : str
+            Name of the web
+        timestamp : float
+            Time of the change
+        """
+        if self.flap_limit <= 0:
+            return
+        changes = self._changes.get(name)
+        if changes is None:
+            # Only the changes that can make the web flapping are kept
+            changes = self._changes[name] = deque(maxlen=self.flap_limit + 1)
+        changes.append(timestamp)
+
+    def __flapping(self, name, now):
+        """Check if a web changed its status more than flap_limit times in the last flap_window seconds
+
+        Parameters
+        ----------
+        name : str
+            Name of the web
+        now : float
+            Actual timestamp
+
+        Returns
+        -------
+        flapping : bool
+        """
+        changes = self._changes.get(name)
+        if changes is None:
+            return False
+        while changes and changes[0] <= now - self.flap_window:
+            changes.popleft()
+        if not changes:
+            del self._changes[name]
+        return len(changes) > self.flap_limit
+
+    def __deliver(self, sink, batches):
+        """Infinite loop that sends the batches to a sink, retrying the failed ones
+
+        Parameters
+        ----------
+        sink : object
+            Sink of the batches
+        batches : queue.Queue
+            Batches waiting to be sent to the sink
+        """
+        while True:
+            alerts = batches.get()
+            for attempt in range(self.retries + 1):
+                if attempt > 0:
+                    time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                    while not batches.empty():  # The batches that arrived meanwhile are sent together
+                        alerts = alerts + batches.get_nowait()
+                try:
+                    sink.send(alerts)
+                except ae.AlertSinkException:  # The exception already logged the error
+                    if attempt < self.retries:
+                        with self._lock:
+                            self._stats['retries'] += 1
+                        continue
+                    self.log.error("Dropped {} alerts after {} attempts to {}".format(len(alerts), attempt + 1, sink))
+                    with self._lock:
+                        self._stats['failed'] += len(alerts)
+                else:
+                    with self._lock:
+                        self._stats['sent'] += len(alerts)
+                break
+
+    def stats(self, reset=True):
+        """Stats of the alerts since the last call
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Alerts received, batches made, alerts sent (once for each sink), alerts dropped as duplicates, alerts held
+            from flapping webs, retries, alerts that could not be sent after all the retries, alerts waiting for their
+            batch and batches waiting for their sink
+        """
+        with self._lock:
+            stats = self._stats
+            if reset:
+                self._stats = self.__empty_stats()
+            else:
+                stats = dict(stats)
+        stats['queued'] = self._queue.qsize()
+        stats['pending_batches'] = sum(batches.qsize() for batches in self._sink_queues)
+        return stats
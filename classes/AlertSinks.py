@@ -0,0 +1,154 @@
+import json
+import subprocess
+
+import requests
+
+from exceptions import alert_exception as ae
+
+
+class FileSink(object):
+    """
+    A sink that appends the alerts to a file, one JSON object per line.
+
+    Attributes
+    ----------
+    path : str
+        File where the alerts are appended
+
+    Methods
+    -------
+    """
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str
+            File where the alerts are appended
+        """
+        self.path = path
+
+    def __str__(self):
+        return "file {}".format(self.path)
+
+    def send(self, alerts):
+        """Append a batch of alerts to the file
+
+        Parameters
+        ----------
+        alerts : list
+            Alerts of the batch
+
+        Raises
+        ------
+        AlertSinkException
+            If the file can't be written
+        """
+        try:
+            with open(self.path, 'a') as alerts_file:
+                alerts_file.write(''.join(json.dumps(alert) + '\n' for alert in alerts))
+        except OSError as error:
+            raise ae.AlertSinkException(self, error)
+
+
+class WebhookSink(object):
+    """
+    A sink that posts each batch of alerts to a url, as a JSON object with the list of alerts: {"alerts": [...]}.
+
+    Attributes
+    ----------
+    url : str
+        Url where the batches are posted
+    timeout : float
+        Max seconds waiting for the webhook
+    _session : requests.Session
+        Session that keeps the connection with the webhook alive
+
+    Methods
+    -------
+    """
+
+    def __init__(self, url, timeout=5.0):
+        """
+        Parameters
+        ----------
+        url : str
+            Url where the batches are posted
+        timeout : float
+            Max seconds waiting for the webhook
+        """
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def __str__(self):
+        return "webhook {}".format(self.url)
+
+    def send(self, alerts):
+        """Post a batch of alerts to the webhook
+
+        Parameters
+        ----------
+        alerts : list
+            Alerts of the batch
+
+        Raises
+        ------
+        AlertSinkException
+            If the webhook doesn't respond or responds with an error status
+        """
+        try:
+            response = self._session.post(self.url, json={'alerts': alerts}, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            raise ae.AlertSinkException(self, error)
+
+
+class CommandSink(object):
+    """
+    A sink that runs a command for each batch of alerts, with the alerts in its stdin, one JSON object per line.
+
+    Attributes
+    ----------
+    args : list
+        Command and its arguments
+    timeout : float
+        Max seconds the command runs
+
+    Methods
+    -------
+    """
+
+    def __init__(self, args, timeout=30.0):
+        """
+        Parameters
+        ----------
+        args : list
+            Command and its arguments
+        timeout : float
+            Max seconds the command runs
+        """
+        self.args = args
+        self.timeout = timeout
+
+    def __str__(self):
+        return "command {}".format(' '.join(self.args))
+
+    def send(self, alerts):
+        """Run the command with a batch of alerts
+
+        Parameters
+        ----------
+        alerts : list
+            Alerts of the batch
+
+        Raises
+        ------
+        AlertSinkException
+            If the command can't be run, fails or doesn't finish in time
+        """
+        data = ''.join(json.dumps(alert) + '\n' for alert in alerts).encode()
+        try:
+            subprocess.run(self.args, input=data, timeout=self.timeout, check=True, stdout=subprocess.DEVNULL)
+        except (OSError, subprocess.SubprocessError) as error:
+            raise ae.AlertSinkException(self, error)
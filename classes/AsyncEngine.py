@@ -0,0 +1,119 @@
+from threading import Thread, active_count
+import asyncio
+import time
+
+from classes import AsyncWebChecker as awc
+from classes import Engine as en
+
+
+class AsyncEngine(en.Engine):
+    """
+    A class that monitors all the webs in one asyncio event loop.
+
+    The event loop runs in its own thread, so the console input is not blocked. Each check is a task instead of a
+    thread, so thousands of webs can be monitored from one core. The time a check waits for a free slot of
+    max_in_flight and for the rate limit of its host is saved apart from the response time.
+
+    Attributes
+    ----------
+    loop : asyncio.AbstractEventLoop
+        Event loop where the checks run
+    _running : dict
+        Task of each web with a request running
+
+    Methods
+    -------
+    """
+
+    # Max seconds the loop sleeps, so the webs added from other threads are not delayed
+    MAX_WAIT = 0.5
+
+    def __init__(self, webs, max_in_flight, dns_ttl=60, host_rate=0.0, host_burst=1.0):
+        """
+        Parameters
+        ----------
+        webs : list
+            Web objects that will be monitored
+        max_in_flight : int
+            Max number of requests running at the same time
+        dns_ttl : float
+            Seconds a resolved host is cached
+        host_rate : float
+            Requests per second to each host. 0 = no limit
+        host_burst : float
+            Max requests sent to a host at the same moment
+        """
+        super().__init__(webs, awc.AsyncWebChecker(max_in_flight, dns_ttl), host_rate, host_burst)
+        self.loop = asyncio.new_event_loop()
+        self._running = {}
+
+    def start(self):
+        """Schedules all the webs and starts the thread of the event loop
+        """
+        for web in self.webs:  # Loop all the webs
+            self.scheduler.add(web)
+            self.log.info("Started monitoring for {}".format(web.name))
+        engine_thread = Thread(target=self.__run, daemon=True)
+        engine_thread.start()
+
+    def __run(self):
+        """Run the event loop until the program finishes
+        """
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.__monitor_webs())
+
+    async def __monitor_webs(self):
+        """Infinite loop that starts a task for each web when it has to be checked
+        """
+        await self.checker.open()
+        try:
+            while True:
+                # The checks run while the loop sleeps, so a profiled iteration includes all of them
+                with self.instrumentation.profiled():
+                    due_webs, wait = self.scheduler.pop_due()
+                    for web in due_webs:
+                        if web in self._running:  # The previous request didn't finish, skip this check
+                            self.log.debug("Skipped check for {}, previous request running".format(web.name))
+                            continue
+                        self._running[web] = self.loop.create_task(self.__monitor_web(web))
+                    await asyncio.sleep(self.MAX_WAIT if wait is None else min(wait, self.MAX_WAIT))
+        finally:
+            await self.checker.close()
+
+    def load_stats(self):
+        """Work running and waiting in the engine
+
+        Returns
+        -------
+        stats : dict
+            Threads of the process, requests in flight and checks waiting for a free slot of max_in_flight
+        """
+        in_flight = self.checker.in_flight
+        return {'threads': active_count(), 'in_flight': in_flight,
+                'queued': max(0, len(self._running) - in_flight)}
+
+    async def __monitor_web(self, web):
+        """Checks the response of the web and saves it
+
+        Parameters
+        ----------
+        web : Object
+            Web object that will be monitored
+        """
+        try:
+            queued_at = time.perf_counter()
+            interval = web.next_interval
+            wait = self.limiter.reserve(web.url)
+            if wait > 0:  # Too many requests to the host
+                await asyncio.sleep(wait)
+            with self.instrumentation.timer('site_status'):
+                response_data = await self.checker.site_status(web.url, web.probe, web.timeout, queued_at,
+                                                               web.content_check)
+            with self.instrumentation.timer('add_response'):
+                web.add_response(response_data)  # Add response data
+            self.adapt_schedule(web, interval)
+            self.log.debug("Added response data for {}".format(web.name))
+        except Exception:
+            self.log.exception("Error checking {}".format(web.name))
+        finally:
+            del self._running[web]
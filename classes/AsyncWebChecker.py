@@ -0,0 +1,263 @@
+import asyncio
+import time
+
+from classes import WebChecker as wc
+
+try:
+    import aiohttp
+except ImportError:  # Only needed by the asyncio engine
+    aiohttp = None
+
+
+class AsyncWebChecker(object):
+    """
+    A class that get the response from the url without blocking the event loop.
+
+    All the requests share one aiohttp session and the number of requests running at the same time is limited.
+
+    Attributes
+    ----------
+    _max_in_flight : int
+        Max number of requests running at the same time
+    _semaphore : asyncio.Semaphore
+        Semaphore that limits the requests running
+    _in_flight : int
+        Number of requests running
+    _session : aiohttp.ClientSession
+        Session used for all the requests
+    _hosts : set
+        Hosts that have been requested
+    _requests : int
+        Number of requests done
+    _connections : int
+        Number of new connections created
+    _dns_ttl : float
+        Seconds a resolved host is cached by the connector
+    _dns_hits : int
+        Number of resolutions answered from the DNS cache
+    _dns_misses : int
+        Number of resolutions that needed a DNS query
+    _dns_hosts : set
+        Hosts resolved by the connector
+
+    Methods
+    -------
+    """
+
+    def __init__(self, max_in_flight, dns_ttl=60):
+        """
+        Parameters
+        ----------
+        max_in_flight : int
+            Max number of requests running at the same time
+        dns_ttl : float
+            Seconds a resolved host is cached
+        """
+        self._max_in_flight = max_in_flight
+        self._semaphore = None
+        self._in_flight = 0
+        self._session = None
+        self._hosts = set()
+        self._requests = 0
+        self._connections = 0
+        self._dns_ttl = dns_ttl
+        self._dns_hits = 0
+        self._dns_misses = 0
+        self._dns_hosts = set()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    async def open(self):
+        """Create the session and the semaphore. Must be called inside the event loop
+        """
+        self._semaphore = asyncio.Semaphore(self._max_in_flight)
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self.__on_request_start)
+        trace_config.on_connection_create_start.append(self.__on_connection_create_start)
+        trace_config.on_connection_create_end.append(self.__on_connection_create_end)
+        trace_config.on_dns_resolvehost_start.append(self.__on_dns_resolvehost_start)
+        trace_config.on_dns_resolvehost_end.append(self.__on_dns_resolvehost_end)
+        trace_config.on_dns_cache_hit.append(self.__on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(self.__on_dns_cache_miss)
+        connector = aiohttp.TCPConnector(limit=self._max_in_flight, ttl_dns_cache=self._dns_ttl)
+        self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+
+    async def __on_request_start(self, session, context, params):
+        self._hosts.add((params.url.scheme, params.url.host, params.url.port))
+        self._requests += 1
+
+    # The phases of each request are saved in the dict passed as trace_request_ctx. aiohttp creates the connection
+    # and does the TLS handshake in the same step, so the TLS time is inside connect
+
+    async def __on_connection_create_start(self, session, context, params):
+        context.trace_request_ctx['connect_start'] = time.perf_counter()
+
+    async def __on_connection_create_end(self, session, context, params):
+        self._connections += 1
+        phases = context.trace_request_ctx
+        phases['connect'] = time.perf_counter() - phases.pop('connect_start') - phases['dns']
+
+    async def __on_dns_resolvehost_start(self, session, context, params):
+        context.trace_request_ctx['dns_start'] = time.perf_counter()
+
+    async def __on_dns_resolvehost_end(self, session, context, params):
+        phases = context.trace_request_ctx
+        phases['dns'] = time.perf_counter() - phases.pop('dns_start')
+
+    async def __on_dns_cache_hit(self, session, context, params):
+        self._dns_hits += 1
+
+    async def __on_dns_cache_miss(self, session, context, params):
+        self._dns_misses += 1
+        self._dns_hosts.add(params.host)
+
+    async def close(self):
+        """Close the session
+        """
+        await self._session.close()
+
+    def pool_stats(self):
+        """Stats of the connection pool
+
+        Returns
+        -------
+        stats : dict
+            Number of hosts, requests, new connections and percentage of requests that reused a connection
+        """
+        stats = {
+            'hosts': len(self._hosts),
+            'requests': self._requests,
+            'connections': self._connections,
+            'reuse_rate': 0.0
+        }
+        if self._requests > 0:
+            stats['reuse_rate'] = round((1 - self._connections / self._requests) * 100, 2)
+
+        return stats
+
+    def dns_stats(self):
+        """Stats of the DNS cache of the connector
+
+        Returns
+        -------
+        stats : dict
+            Number of hosts cached, hits, misses and percentage of hits
+        """
+        stats = {
+            'entries': len(self._dns_hosts),
+            'hits': self._dns_hits,
+            'misses': self._dns_misses,
+            'hit_rate': 0.0
+        }
+        if self._dns_hits + self._dns_misses > 0:
+            stats['hit_rate'] = round(self._dns_hits / (self._dns_hits + self._dns_misses) * 100, 2)
+
+        return stats
+
+    async def site_status(self, url, probe=wc.WebChecker.PROBE_GET, timeout=1.0, queued_at=None, content=None):
+        """Retrieve web response
+
+        Parameters
+        ----------
+        url : str
+            Url for doing the request
+        probe : str
+            Probe mode, one of WebChecker.PROBE_MODES
+        timeout : float
+            Max seconds of the whole request
+        queued_at : float
+            perf_counter time when the check was queued. If it's set the response has the seconds it waited, also
+            for a free slot of max_in_flight
+        content : ContentCheck
+            Content checks of the body. None if the body is not checked. Only with PROBE_GET
+
+        Returns
+        -------
+        extracted_data : dict
+            Availability, status code, response time, phases, queue wait, reason of a failed content check and actual
+            time
+        """
+        async with self._semaphore:
+            self._in_flight += 1
+            start = time.perf_counter()
+            reason = None
+            try:
+                method = 'HEAD' if probe == wc.WebChecker.PROBE_HEAD else 'GET'
+                connection_phases = {'dns': 0.0, 'connect': 0.0, 'tls': 0.0}
+                async with self._session.request(method, url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                                 trace_request_ctx=connection_phases) as web_response:
+                    response_time = time.perf_counter() - start  # Like requests, time until headers are parsed
+                    if content is not None:
+                        reason = await self.__check_content(web_response, content)
+                    elif probe == wc.WebChecker.PROBE_GET:
+                        await web_response.read()
+                    elif probe == wc.WebChecker.PROBE_HEADERS:
+                        await self.__release(web_response)
+                total_seconds = time.perf_counter() - start
+                extracted_data = wc.WebChecker.site_up_response(web_response.status, response_time, reason)
+                extracted_data['phases'] = wc.WebChecker.phases(connection_phases, response_time, total_seconds)
+            except asyncio.TimeoutError:
+                extracted_data = wc.WebChecker.site_down_response(timeout=True)
+            except aiohttp.ClientError:
+                extracted_data = wc.WebChecker.site_down_response()
+            finally:
+                self._in_flight -= 1
+        if queued_at is not None:
+            extracted_data['queue_wait'] = start - queued_at
+
+        return extracted_data
+
+    async def __release(self, response):
+        """Release the connection of a response without downloading a big body
+
+        Small bodies are read so the connection goes back to the pool, bigger ones close the connection
+
+        Parameters
+        ----------
+        response : aiohttp.ClientResponse
+            Response with the headers received
+        """
+        read = 0
+        async for chunk in response.content.iter_chunked(8192):
+            read += len(chunk)
+            if read > wc.WebChecker.DRAIN_LIMIT:
+                response.close()
+                return
+
+    async def __check_content(self, response, content):
+        """Check the body of a response in chunks, stopping as soon as the result is known
+
+        The rest of a small body is read so the connection goes back to the pool, a bigger one or a body that is too
+        large closes the connection
+
+        Parameters
+        ----------
+        response : aiohttp.ClientResponse
+            Response with the headers received
+        content : ContentCheck
+            Content checks of the body
+
+        Returns
+        -------
+        reason : str
+            Reason of the failed check, one of ContentCheck.REASONS. None if the body passed the checks or the status
+            is not 200
+        """
+        if response.status != 200:  # Not available anyway
+            await self.__release(response)
+            return None
+        if content.too_large(response.headers):
+            response.close()
+            return content.REASON_TOO_LARGE
+
+        match = content.start()
+        async for chunk in response.content.iter_chunked(content.CHUNK_SIZE):
+            if match.feed(chunk):
+                if match.reason == content.REASON_TOO_LARGE:
+                    response.close()
+                else:
+                    await self.__release(response)
+                break
+        return match.finish()
@@ -0,0 +1,96 @@
+from threading import Thread
+import logging
+import os
+import time
+
+
+class BatchFileHandler(logging.FileHandler):
+    """
+    A file handler that writes the records to the file buffer and flushes it in batches.
+
+    The file is flushed at most every flush_interval seconds, when a record of flush_level or higher is written and
+    when the handler is closed. A background thread flushes the records of the last batch when no more records come.
+
+    Attributes
+    ----------
+    flush_interval : float
+        Max seconds a record stays in the buffer
+    flush_level : int
+        Records of this level or higher are flushed immediately
+    _last_flush : float
+        Monotonic time of the last flush
+    _pending : bool
+        True if there are records in the buffer
+    _force : bool
+        True if the next flush must be done whatever the time
+
+    Methods
+    -------
+    """
+
+    def __init__(self, filename, flush_interval=1.0, flush_level=logging.WARNING, **kwargs):
+        """
+        Parameters
+        ----------
+        filename : str
+            Path of the log file
+        flush_interval : float
+            Max seconds a record stays in the buffer
+        flush_level : int
+            Records of this level or higher are flushed immediately
+        kwargs : dict
+            Arguments of logging.FileHandler
+        """
+        super().__init__(filename, **kwargs)
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self._last_flush = time.monotonic()
+        self._pending = False
+        self._force = False
+        self.__start_flusher()
+        if hasattr(os, 'register_at_fork'):  # The flusher thread doesn't exist in forked processes
+            os.register_at_fork(after_in_child=self.__start_flusher)
+
+    def __start_flusher(self):
+        """Starts the thread that flushes the last batch
+        """
+        Thread(target=self.__flush_pending, name="LogFlush", daemon=True).start()
+
+    def __flush_pending(self):
+        """Infinite loop that flushes the buffer when the records have waited flush_interval seconds
+        """
+        while True:
+            time.sleep(self.flush_interval)
+            if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+                self.force_flush()
+
+    def emit(self, record):
+        """Write the record to the buffer. StreamHandler.emit calls flush after each record
+        """
+        self._pending = True
+        self._force = record.levelno >= self.flush_level
+        super().emit(record)
+
+    def flush(self):
+        """Flush the buffer if the last flush is older than flush_interval or if it's forced
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self._force or now - self._last_flush >= self.flush_interval:
+                super().flush()
+                self._last_flush = now
+                self._pending = False
+                self._force = False
+
+    def force_flush(self):
+        """Flush the buffer now
+        """
+        with self.lock:
+            self._force = True
+        self.flush()
+
+    def close(self):
+        """Flush the buffer and close the file
+        """
+        self._force = True
+        super().close()
@@ -0,0 +1,79 @@
+from threading import Thread
+import logging
+import os
+import time
+
+
+class ConfigWatcher(object):
+    """
+    A class that watches the config file and calls a function when it changes.
+
+    The modification time and the size of the file are checked every interval seconds, so it works on any platform
+    without extra dependencies.
+
+    Attributes
+    ----------
+    path : str
+        Path of the config file
+    interval : float
+        Seconds between checks of the file
+    on_change : callable
+        Function called without parameters when the file changes
+    log : LogRecord
+        log object
+    _signature : tuple
+        Modification time and size of the file in the last check
+
+    Methods
+    -------
+    """
+
+    def __init__(self, path, interval, on_change):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the config file
+        interval : float
+            Seconds between checks of the file
+        on_change : callable
+            Function called without parameters when the file changes
+        """
+        self.path = path
+        self.interval = interval
+        self.on_change = on_change
+        self.log = logging.getLogger("Monitor")
+        self._signature = self.__signature()
+
+    def __signature(self):
+        """Modification time and size of the file
+
+        Returns
+        -------
+        signature : tuple
+            None if the file doesn't exist
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        """Starts the thread that watches the file
+        """
+        Thread(target=self.__watch, name="ConfigWatcher", daemon=True).start()
+
+    def __watch(self):
+        """Infinite loop that checks the file and calls on_change when it changed
+        """
+        while True:
+            time.sleep(self.interval)
+            signature = self.__signature()
+            if signature is None or signature == self._signature:
+                continue
+            self._signature = signature
+            try:
+                self.on_change()
+            except Exception:  # The old config keeps running
+                self.log.exception("Error reloading {}".format(self.path))
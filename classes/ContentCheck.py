@@ -0,0 +1,256 @@
+import hashlib
+import re
+
+
+class ContentCheck(object):
+    """
+    A class with the content checks of the body of a web: a text it must contain, a regular expression it must match,
+    a hash it must have or must keep, and a max size.
+
+    The body is checked while it's downloaded, in chunks, without keeping it in memory. Only the last bytes of each
+    chunk are kept, so a text or a match that is split between two chunks is found. The download stops as soon as the
+    result is known: when the text and the match are found and there is no hash or size to check, or when the body is
+    too large. A response with status 200 that fails a check is not available and has the reason of the failure.
+
+    Attributes
+    ----------
+    contains : bytes
+        Text the body must contain, encoded in UTF-8. None if it's not checked
+    pattern : re.Pattern
+        Regular expression the body must match. None if it's not checked
+    expected_hash : str
+        SHA-256 in hexadecimal the body must have, or HASH_CHANGE to detect changes. None if it's not checked
+    max_size : int
+        Max bytes of the decoded body. 0 = no limit
+    _last_hash : str
+        SHA-256 of the last body, to detect changes. None until the first body
+
+    Methods
+    -------
+    """
+
+    # Reasons why a response with status 200 is not available
+    REASON_MISSING = 'missing_text'
+    REASON_NO_MATCH = 'no_match'
+    REASON_HASH = 'hash_mismatch'
+    REASON_CHANGED = 'changed'
+    REASON_TOO_LARGE = 'too_large'
+    REASONS = (REASON_MISSING, REASON_NO_MATCH, REASON_HASH, REASON_CHANGED, REASON_TOO_LARGE)
+
+    # Value of content_hash that detects the changes of the body instead of comparing it with a known hash
+    HASH_CHANGE = 'change'
+
+    # Bytes read from the body in each step
+    CHUNK_SIZE = 16 * 1024
+    # Bytes of the previous chunks where the regular expression is searched again. A match must fit in them
+    PATTERN_OVERLAP = 4 * 1024
+
+    def __init__(self, contains=None, pattern=None, expected_hash=None, max_size=0):
+        """
+        Parameters
+        ----------
+        contains : str
+            Text the body must contain
+        pattern : str
+            Regular expression the body must match
+        expected_hash : str
+            SHA-256 in hexadecimal the body must have, or HASH_CHANGE to detect changes
+        max_size : int
+            Max bytes of the decoded body. 0 = no limit
+
+        Raises
+        ------
+        re.error
+            If the regular expression is not valid
+        """
+        self.contains = contains.encode() if contains else None
+        self.pattern = self.compile_pattern(pattern) if pattern else None
+        self.expected_hash = expected_hash.lower() if expected_hash else None
+        self.max_size = max_size
+        self._last_hash = None
+
+    @staticmethod
+    def valid_hash(expected_hash):
+        """Check a value of content_hash
+
+        Parameters
+        ----------
+        expected_hash : str
+
+        Returns
+        -------
+        valid : bool
+            True if it's HASH_CHANGE or a SHA-256 in hexadecimal
+        """
+        return expected_hash == ContentCheck.HASH_CHANGE or re.fullmatch(r'[0-9a-fA-F]{64}', expected_hash) is not None
+
+    @staticmethod
+    def compile_pattern(pattern):
+        """Compile a value of content_regex. The body is searched as bytes, so the classes like \\w only match ASCII
+
+        Parameters
+        ----------
+        pattern : str
+            Regular expression, encoded in UTF-8 to search the body
+
+        Returns
+        -------
+        pattern : re.Pattern
+
+        Raises
+        ------
+        re.error
+            If the regular expression is not valid
+        """
+        return re.compile(pattern.encode())
+
+    def too_large(self, headers):
+        """Check the size of the body announced in the headers, before downloading it
+
+        The chunks are counted decoded, so the Content-Length is only compared when the body is not compressed
+
+        Parameters
+        ----------
+        headers : Mapping
+            Headers of the response, case insensitive
+
+        Returns
+        -------
+        too_large : bool
+        """
+        content_length = headers.get('Content-Length')
+        if not self.max_size or content_length is None or not content_length.isdigit():
+            return False
+        if headers.get('Content-Encoding', 'identity').lower() != 'identity':  # Size of the compressed body
+            return False
+        return int(content_length) > self.max_size
+
+    def start(self):
+        """Start the checks of a new body
+
+        Returns
+        -------
+        match : ContentMatch
+            Checks of the body, that are fed with its chunks
+        """
+        return ContentMatch(self)
+
+    def save_hash(self, body_hash):
+        """Compare the hash of a body with the hash of the previous one and save it
+
+        Parameters
+        ----------
+        body_hash : str
+            SHA-256 of the body
+
+        Returns
+        -------
+        changed : bool
+            False for the first body
+        """
+        changed = self._last_hash is not None and body_hash != self._last_hash
+        self._last_hash = body_hash
+        return changed
+
+
+class ContentMatch(object):
+    """
+    A class with the state of the content checks of one body.
+
+    Attributes
+    ----------
+    check : ContentCheck
+        Checks of the web
+    size : int
+        Bytes of the body read
+    reason : str
+        Reason of the failure, one of ContentCheck.REASONS. None while the body didn't fail
+    _found_text : bool
+        True if the text was found or it's not checked
+    _found_pattern : bool
+        True if the regular expression matched or it's not checked
+    _tail : bytes
+        Last bytes read, where a text or a match split between chunks starts
+    _hash : hashlib.sha256
+        Hash of the bytes read. None if it's not checked
+
+    Methods
+    -------
+    """
+
+    def __init__(self, check):
+        """
+        Parameters
+        ----------
+        check : ContentCheck
+            Checks of the web
+        """
+        self.check = check
+        self.size = 0
+        self.reason = None
+        self._found_text = check.contains is None
+        self._found_pattern = check.pattern is None
+        self._tail = b''
+        self._hash = hashlib.sha256() if check.expected_hash else None
+
+    @property
+    def decided(self):
+        """True when the rest of the body can't change the result
+        """
+        if self.reason is not None:
+            return True
+        return self._found_text and self._found_pattern and self._hash is None and not self.check.max_size
+
+    def feed(self, chunk):
+        """Check the next chunk of the body
+
+        Parameters
+        ----------
+        chunk : bytes
+            Next bytes of the body
+
+        Returns
+        -------
+        decided : bool
+            True if the rest of the body doesn't need to be read
+        """
+        self.size += len(chunk)
+        if self.check.max_size and self.size > self.check.max_size:
+            self.reason = ContentCheck.REASON_TOO_LARGE
+            return True
+        if self._hash is not None:
+            self._hash.update(chunk)
+        if not (self._found_text and self._found_pattern):
+            data = self._tail + chunk
+            if not self._found_text:
+                self._found_text = self.check.contains in data
+            if not self._found_pattern:
+                self._found_pattern = self.check.pattern.search(data) is not None
+            keep = ContentCheck.PATTERN_OVERLAP if self.check.pattern is not None else 0
+            if self.check.contains is not None:
+                keep = max(keep, len(self.check.contains) - 1)
+            self._tail = data[-keep:] if keep else b''
+        return self.decided
+
+    def finish(self):
+        """Result of the checks when the whole body was read, or when the reading stopped because it was decided
+
+        Returns
+        -------
+        reason : str
+            Reason of the failure, one of ContentCheck.REASONS. None if the body passed all the checks
+        """
+        if self.reason is not None:
+            return self.reason
+        if not self._found_text:
+            return ContentCheck.REASON_MISSING
+        if not self._found_pattern:
+            return ContentCheck.REASON_NO_MATCH
+        if self._hash is not None:
+            body_hash = self._hash.hexdigest()
+            if self.check.expected_hash == ContentCheck.HASH_CHANGE:
+                if self.check.save_hash(body_hash):
+                    return ContentCheck.REASON_CHANGED
+            elif body_hash != self.check.expected_hash:
+                return ContentCheck.REASON_HASH
+        return None
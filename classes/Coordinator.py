@@ -0,0 +1,319 @@
+from threading import Lock, Thread, active_count
+import heapq
+import itertools
+import math
+import socket
+import time
+import zlib
+
+from classes import Engine as en
+from classes import NodeConnection as nc
+
+
+class Coordinator(en.Engine):
+    """
+    An engine that splits the checks of the webs between worker nodes connected over TCP.
+
+    The Web objects, their stats and their alerts are in the coordinator. Each web is assigned to replicas workers
+    with rendezvous hashing, so when a worker joins or leaves only the webs of that worker move. The workers check
+    their webs with their own engine and send the responses back in batches. With several replicas each worker checks
+    the web replicas times less often, so the web keeps its interval and is seen from several places. The responses
+    of the replicas of a web arrive from several workers, so they are held reorder_delay seconds and added to the web
+    in the order of their timestamps. The scheduler only runs the drains of the held responses, so they are added in
+    time even if no more results arrive.
+
+    Messages of the protocol, one JSON object per line:
+        worker -> coordinator: {"type": "hello", "name": NAME}
+        coordinator -> worker: {"type": "assign", "webs": {WEB_NAME: WEB_PARAMETERS}}, all the webs of the worker
+        worker -> coordinator: {"type": "results", "results": [[WEB_NAME, RESPONSE], ...]}, also as heartbeat
+        worker -> coordinator: {"type": "stats", "stats": ENGINE_STATS}
+
+    Attributes
+    ----------
+    host : str
+        Address where the coordinator listens
+    port : int
+        Port where the coordinator listens
+    replicas : int
+        Number of workers that check each web
+    worker_timeout : float
+        A worker that doesn't send anything in this seconds is removed
+    reorder_delay : float
+        Seconds the responses are held to be added in the order of their timestamps
+    _web_names : dict
+        Web object of each web name
+    _workers : dict
+        Connection of each worker name
+    _assignments : dict
+        Parameters of the webs assigned to each worker name
+    _worker_stats : dict
+        Last engine stats of each worker name
+    _lock : Lock
+        Lock for the webs, the workers and their stats, changed by the reloads and by the connection threads
+    _pending : list
+        Priority queue of the responses that are held [timestamp, order, web name, response]
+    _last_timestamps : dict
+        Timestamp of the last response added to each web
+    _order : itertools.count
+        Tie breaker for the responses with the same timestamp
+    _results_lock : Lock
+        Lock for the held responses, so the responses of all the workers are added in order
+    _drain_scheduled : bool
+        A drain of the held responses is waiting in the scheduler
+    _server : socket.socket
+        Listening socket
+
+    Methods
+    -------
+    """
+
+    def __init__(self, webs, host='127.0.0.1', port=7700, replicas=1, worker_timeout=30.0, reorder_delay=2.0):
+        """
+        Parameters
+        ----------
+        webs : list
+            Web objects that will be monitored
+        host : str
+            Address where the coordinator listens
+        port : int
+            Port where the coordinator listens. 0 = any free port
+        replicas : int
+            Number of workers that check each web
+        worker_timeout : float
+            A worker that doesn't send anything in this seconds is removed
+        reorder_delay : float
+            Seconds the responses are held to be added in the order of their timestamps
+        """
+        super().__init__(webs, None)
+        self.host = host
+        self.port = port
+        self.replicas = max(1, replicas)
+        self.worker_timeout = worker_timeout
+        self.reorder_delay = reorder_delay
+        self._web_names = {web.name: web for web in webs}
+        self._workers = {}
+        self._assignments = {}
+        self._worker_stats = {}
+        self._lock = Lock()
+        self._pending = []
+        self._last_timestamps = {}
+        self._order = itertools.count()
+        self._results_lock = Lock()
+        self._drain_scheduled = False
+        self._server = None
+
+    @staticmethod
+    def rank(web_name, worker_names, count):
+        """Preferred workers of a web. The order of two workers doesn't depend on the other workers
+
+        Parameters
+        ----------
+        web_name : str
+            Name of the web
+        worker_names : iterable
+            Names of the connected workers
+        count : int
+            Number of workers returned
+
+        Returns
+        -------
+        ranking : list
+            Worker names, the preferred first
+        """
+        return heapq.nlargest(count, worker_names,
+                              key=lambda worker: (zlib.crc32("{}:{}".format(worker, web_name).encode()), worker))
+
+    def start(self):
+        """Starts listening, the thread that accepts the workers and the scheduler of the drains
+        """
+        self._server = socket.create_server((self.host, self.port))
+        self.port = self._server.getsockname()[1]
+        self.scheduler.start(lambda web: None)  # The webs are checked by the workers, no web is scheduled here
+        Thread(target=self.__accept, name="Coordinator", daemon=True).start()
+        self.log.info("Coordinator listening on {}:{} for {} webs".format(self.host, self.port, len(self.webs)))
+
+    def __accept(self):
+        """Infinite loop that accepts the connections of the workers
+        """
+        while True:
+            sock, address = self._server.accept()
+            Thread(target=self.__serve, args=(sock, address), daemon=True).start()
+
+    def __serve(self, sock, address):
+        """Registers a worker, receives its messages until it leaves and removes it
+
+        Parameters
+        ----------
+        sock : socket.socket
+            Connection with the worker
+        address : tuple
+            Address of the worker
+        """
+        connection = nc.NodeConnection(sock, self.worker_timeout)
+        try:
+            hello = connection.receive()
+        except ValueError:
+            hello = None
+        if not hello or hello.get('type') != 'hello':
+            connection.close()
+            return
+
+        with self._lock:
+            name = str(hello.get('name') or "{}:{}".format(*address))
+            while name in self._workers:  # Two workers with the same name
+                name += "'"
+            self._workers[name] = connection
+            self.__rebalance()
+        self.log.info("Worker {} joined from {}:{}".format(name, *address))
+
+        try:
+            while True:
+                message = connection.receive()
+                if message is None:
+                    break
+                if message.get('type') == 'results':
+                    self.__add_results(message['results'])
+                elif message.get('type') == 'stats':
+                    with self._lock:
+                        self._worker_stats[name] = message['stats']
+        except (ValueError, KeyError, TypeError):
+            self.log.exception("Invalid message from worker {}".format(name))
+        finally:
+            connection.close()
+            with self._lock:
+                del self._workers[name]
+                self._assignments.pop(name, None)
+                self._worker_stats.pop(name, None)
+                self.__rebalance()
+            self.log.warning("Worker {} left".format(name))
+
+    def __add_results(self, results, now=None):
+        """Hold the responses sent by a worker and add the held ones older than reorder_delay to their webs
+
+        The responses are added in the order of their timestamps. A response older than the last one added to its web
+        arrived too late and is dropped, because the history of a web only grows forward
+
+        Parameters
+        ----------
+        results : list
+            Name of the web and response of each check
+        now : float
+            Actual time. Current time if it's not set
+        """
+        now = time.time() if now is None else now
+        with self._results_lock:
+            for web_name, response in results:
+                heapq.heappush(self._pending, (response['timestamp'], next(self._order), web_name, response))
+
+            with self.instrumentation.profiled():
+                while self._pending and self._pending[0][0] <= now - self.reorder_delay:
+                    timestamp, _, web_name, response = heapq.heappop(self._pending)
+                    web = self._web_names.get(web_name)
+                    if web is None:  # Removed while the response was on its way
+                        continue
+                    if timestamp < self._last_timestamps.get(web, -math.inf):
+                        self.log.debug("Dropped a response of {} that arrived too late".format(web_name))
+                        continue
+                    self._last_timestamps[web] = timestamp
+                    with self.instrumentation.timer('add_results'):
+                        web.add_response(response)
+
+            if self._pending and not self._drain_scheduled:  # Add the rest even if no more results arrive
+                self._drain_scheduled = True
+                self.scheduler.call_later(max(0.0, self._pending[0][0] + self.reorder_delay - now), self.__drain)
+
+    def __drain(self):
+        """Add the held responses that are older than reorder_delay, called by the scheduler
+        """
+        with self._results_lock:
+            self._drain_scheduled = False
+        self.__add_results([])
+
+    def __rebalance(self):
+        """Assign each web to its workers and send the new assignments to the workers whose webs changed
+
+        Must be called with the lock held
+        """
+        assignments = {name: {} for name in self._workers.keys()}
+        for web in self.webs:
+            parameters = web.parameters()
+            parameters['interval'] = web.interval * min(self.replicas, len(assignments))
+            for name in self.rank(web.name, assignments.keys(), self.replicas):
+                assignments[name][web.name] = parameters
+
+        for name, webs in assignments.items():
+            if webs == self._assignments.get(name):
+                continue
+            try:
+                self._workers[name].send({'type': 'assign', 'webs': webs})
+            except OSError:  # The thread of the worker will remove it
+                continue
+            self._assignments[name] = webs
+            self.log.info("Assigned {} webs to worker {}".format(len(webs), name))
+
+        if self.webs and not assignments:
+            self.log.warning("No workers connected, the webs are not checked")
+
+    def update_webs(self, added, removed):
+        """Start the monitoring of new webs and stop the monitoring of others in the workers
+
+        Parameters
+        ----------
+        added : list
+            Web objects that will be monitored
+        removed : list
+            Web objects that won't be monitored anymore
+        """
+        removed = set(removed)
+        with self._lock:
+            # A new list, so the threads iterating the old one are not affected
+            self.webs = [web for web in self.webs if web not in removed] + list(added)
+            self._web_names = {web.name: web for web in self.webs}
+            self.__rebalance()
+        with self._results_lock:
+            for web in removed:
+                self._last_timestamps.pop(web, None)
+
+    def __merged_worker_stats(self):
+        """Last stats sent by each worker added up, with the threads of the coordinator and the number of workers
+
+        Returns
+        -------
+        stats : dict
+        """
+        with self._lock:
+            worker_stats = list(self._worker_stats.values())
+            workers = len(self._workers)
+        stats = self.merge_stats(worker_stats)
+        stats['load']['threads'] += active_count()
+        stats['load']['workers'] = workers
+        return stats
+
+    def load_stats(self):
+        """Work running and waiting in the workers
+
+        Returns
+        -------
+        stats : dict
+            Workers connected and threads, requests in flight and checks waiting of all the workers
+        """
+        return self.__merged_worker_stats()['load']
+
+    def stats(self, reset=True):
+        """Stats of the engines of all the workers added up, from the last stats sent by each worker
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Stats of the connections, of the DNS cache, of the scheduler, of the load, the timings and the contention
+            of the reads of the webs
+        """
+        stats = self.__merged_worker_stats()
+        stats['timings'].update(self.instrumentation.timing_stats(reset))
+        stats['snapshots'] = self.snapshot_stats(reset)  # The webs with the stats are in the coordinator
+        return stats
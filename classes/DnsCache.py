@@ -0,0 +1,135 @@
+from threading import Lock
+import ipaddress
+import socket
+import time
+
+try:
+    import dns.resolver
+except ImportError:  # Without dnspython the records are cached the max ttl
+    dns = None
+
+
+class DnsCache(object):
+    """
+    A class that keeps the resolved addresses of the hosts, so the checks don't resolve the host on every request.
+
+    If dnspython is installed, each address is cached the TTL of its DNS record up to the max ttl. If not, the
+    addresses are resolved with the system resolver and cached the max ttl.
+
+    Attributes
+    ----------
+    max_ttl : float
+        Max seconds an address is cached
+    _entries : dict
+        Address and expiration time of each host and port
+    _lock : Lock
+        Lock for the entries, that are used by all the worker threads
+    hits : int
+        Number of resolutions answered from the cache
+    misses : int
+        Number of resolutions that needed a DNS query
+
+    Methods
+    -------
+    """
+
+    def __init__(self, max_ttl=60):
+        """
+        Parameters
+        ----------
+        max_ttl : float
+            Max seconds an address is cached
+        """
+        self.max_ttl = max_ttl
+        self._entries = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host, port):
+        """Get the address of a host
+
+        Parameters
+        ----------
+        host : str
+            Host name or address
+        port : int
+            Port of the connection
+
+        Returns
+        -------
+        address : str
+            IP address of the host
+
+        Raises
+        ------
+        socket.gaierror
+            If the host can't be resolved. Failures are not cached
+        """
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        address, ttl = self.__query(host, port)
+        with self._lock:
+            self._entries[key] = (address, now + min(ttl, self.max_ttl))
+
+        return address
+
+    def __query(self, host, port):
+        """Resolve a host
+
+        Parameters
+        ----------
+        host : str
+            Host name or address
+        port : int
+            Port of the connection
+
+        Returns
+        -------
+        address : str
+            IP address of the host
+        ttl : float
+            Seconds the address can be cached
+        """
+        try:
+            ipaddress.ip_address(host)
+            return host, self.max_ttl  # It's already an address
+        except ValueError:
+            pass
+
+        if dns is not None:
+            try:
+                answer = dns.resolver.resolve(host, 'A')
+                return answer[0].to_text(), answer.rrset.ttl
+            except dns.exception.DNSException:
+                pass  # Hosts file names, IP addresses or IPv6 only hosts
+
+        address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        return address, self.max_ttl
+
+    def stats(self):
+        """Stats of the cache
+
+        Returns
+        -------
+        stats : dict
+            Number of hosts cached, hits, misses and percentage of hits
+        """
+        with self._lock:
+            stats = {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': 0.0
+            }
+        if self.hits + self.misses > 0:
+            stats['hit_rate'] = round(self.hits / (self.hits + self.misses) * 100, 2)
+
+        return stats
@@ -0,0 +1,275 @@
+import logging
+
+from classes import HostRateLimiter as hrl
+from classes import Instrumentation as ins
+from classes import Scheduler as sc
+
+
+class Engine(object):
+    """
+    Base class of the engines that monitor a list of webs in this process.
+
+    Attributes
+    ----------
+    webs : list
+        Web objects that will be monitored
+    checker : Object
+        Checker used for all the requests
+    scheduler : Scheduler
+        Scheduler with the next check of each web
+    limiter : HostRateLimiter
+        Requests per second limit of each host
+    instrumentation : Instrumentation
+        Timings of the checks and of the stats, and the profiler of the checks
+    log : LogRecord
+        log object
+    _web_stats : dict
+        Version, period and stats of each web of the last web_stats, for each window of minutes
+
+    Methods
+    -------
+    """
+
+    # Seconds the stats of a web without new responses are reused. Its windows keep moving, so they get old
+    STATS_EXPIRY = 10
+
+    def __init__(self, webs, checker, host_rate=0.0, host_burst=1.0):
+        """
+        Parameters
+        ----------
+        webs : list
+            Web objects that will be monitored
+        checker : Object
+            Checker used for all the requests
+        host_rate : float
+            Requests per second to each host. 0 = no limit
+        host_burst : float
+            Max requests sent to a host at the same moment
+        """
+        self.webs = webs
+        self.checker = checker
+        self.scheduler = sc.Scheduler()
+        self.limiter = hrl.HostRateLimiter(host_rate, host_burst)
+        self.instrumentation = ins.Instrumentation()
+        self.log = logging.getLogger("Monitor")
+        self._web_stats = {}
+
+    def start(self):
+        """Starts the monitoring of the webs
+        """
+        raise NotImplementedError
+
+    def load_stats(self):
+        """Work running and waiting in the engine
+
+        Returns
+        -------
+        stats : dict
+            Threads of the process, requests in flight and checks waiting for a worker or a free slot
+        """
+        raise NotImplementedError
+
+    def start_profile(self, sample):
+        """Start profiling one of every sample checks
+
+        Parameters
+        ----------
+        sample : int
+            One of every sample checks is profiled
+        """
+        self.instrumentation.start_profile(sample)
+
+    def stop_profile(self, path):
+        """Stop profiling and save the profile in a file
+
+        Parameters
+        ----------
+        path : str
+            File where the profile is saved
+
+        Returns
+        -------
+        saved : bool
+            False if the profiler was not started or no check was profiled
+        """
+        return self.instrumentation.stop_profile(path)
+
+    def adapt_schedule(self, web, interval):
+        """Reschedule the next check of a web if its last response changed its interval
+
+        The next check was scheduled when the check started, with the interval of that moment
+
+        Parameters
+        ----------
+        web : Object
+            Web object that has been checked
+        interval : float
+            Interval of the web when the check started
+        """
+        if web.next_interval != interval:
+            self.scheduler.reschedule(web, web.next_interval)
+
+    def update_webs(self, added, removed):
+        """Start the monitoring of new webs and stop the monitoring of others, without touching the rest
+
+        Parameters
+        ----------
+        added : list
+            Web objects that will be monitored
+        removed : list
+            Web objects that won't be monitored anymore
+        """
+        removed = set(removed)
+        for web in removed:
+            self.scheduler.remove(web)
+            self.log.info("Stopped monitoring for {}".format(web.name))
+        # A new list, so the threads iterating the old one are not affected
+        self.webs = [web for web in self.webs if web not in removed] + list(added)
+        for web in added:
+            self.scheduler.add(web)
+            self.log.info("Started monitoring for {}".format(web.name))
+
+    def snapshot_stats(self, reset=True):
+        """Contention of the reads of the webs since the last call
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Reads of the webs, reads repeated because a response was added meanwhile and reads that took the lock
+        """
+        stats = {'reads': 0, 'retries': 0, 'locked': 0}
+        for web in self.webs:
+            for key, value in web.read_stats(reset).items():
+                stats[key] += value
+        return stats
+
+    def stats(self, reset=True):
+        """Stats of the engine
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Stats of the connections, of the DNS cache, of the scheduler, of the load, the timings and the contention
+            of the reads of the webs since the last stats
+        """
+        return {
+            'connections': self.checker.pool_stats(),
+            'dns': self.checker.dns_stats(),
+            'scheduler': self.scheduler.lag_stats(reset),
+            'load': self.load_stats(),
+            'timings': self.instrumentation.timing_stats(reset),
+            'snapshots': self.snapshot_stats(reset)
+        }
+
+    @staticmethod
+    def merge_stats(all_stats):
+        """Add up the stats of several engines
+
+        Parameters
+        ----------
+        all_stats : list
+            Stats of each engine
+
+        Returns
+        -------
+        stats : dict
+            Stats of the connections, of the DNS cache, of the scheduler, of the load, the timings and the contention
+            of the reads of the webs
+        """
+        connections = {'hosts': 0, 'requests': 0, 'connections': 0, 'reuse_rate': 0.0}
+        dns = {'entries': 0, 'hits': 0, 'misses': 0, 'hit_rate': 0.0}
+        scheduler = {'scheduled': 0, 'dispatched': 0, 'missed': 0, 'lag_avg': 0.0, 'lag_max': 0.0,
+                     'interval_avg': 0.0, 'target_avg': 0.0}
+        load = {'threads': 0, 'in_flight': 0, 'queued': 0}
+        timings = {}
+        snapshots = {'reads': 0, 'retries': 0, 'locked': 0}
+        lag_total = 0.0
+        interval_total = 0.0
+        target_total = 0.0
+        for engine_stats in all_stats:
+            for key in ('hosts', 'requests', 'connections'):
+                connections[key] += engine_stats['connections'][key]
+            for key in ('entries', 'hits', 'misses'):
+                dns[key] += engine_stats['dns'][key]
+            for key in ('scheduled', 'dispatched', 'missed'):
+                scheduler[key] += engine_stats['scheduler'][key]
+            lag_total += engine_stats['scheduler']['lag_avg'] * engine_stats['scheduler']['dispatched']
+            scheduler['lag_max'] = max(scheduler['lag_max'], engine_stats['scheduler']['lag_max'])
+            interval_total += engine_stats['scheduler']['interval_avg'] * engine_stats['scheduler']['dispatched']
+            target_total += engine_stats['scheduler']['target_avg'] * engine_stats['scheduler']['dispatched']
+            for key in ('threads', 'in_flight', 'queued'):
+                load[key] += engine_stats['load'][key]
+            for key in ('reads', 'retries', 'locked'):
+                snapshots[key] += engine_stats['snapshots'][key]
+            for name, timing in engine_stats['timings'].items():
+                total = timings.setdefault(name, {'count': 0, 'avg_ms': 0.0, 'max_ms': 0.0})
+                total['avg_ms'] = (total['avg_ms'] * total['count'] + timing['avg_ms'] * timing['count'])
+                total['count'] += timing['count']
+                total['avg_ms'] = round(total['avg_ms'] / total['count'], 3)
+                total['max_ms'] = max(total['max_ms'], timing['max_ms'])
+
+        if connections['requests'] > 0:
+            connections['reuse_rate'] = round((1 - connections['connections'] / connections['requests']) * 100, 2)
+        if dns['hits'] + dns['misses'] > 0:
+            dns['hit_rate'] = round(dns['hits'] / (dns['hits'] + dns['misses']) * 100, 2)
+        if scheduler['dispatched'] > 0:
+            scheduler['lag_avg'] = round(lag_total / scheduler['dispatched'], 4)
+            scheduler['interval_avg'] = round(interval_total / scheduler['dispatched'], 3)
+            scheduler['target_avg'] = round(target_total / scheduler['dispatched'], 3)
+
+        return {
+            'connections': connections,
+            'dns': dns,
+            'scheduler': scheduler,
+            'load': load,
+            'timings': timings,
+            'snapshots': snapshots
+        }
+
+    def web_stats(self, interval_minutes, now):
+        """Running stats of each web
+
+        The stats of a web are only calculated again if a response was added since the last call, that is when the
+        version of the web changed, or every STATS_EXPIRY seconds. The others are the same objects of the last call
+
+        Parameters
+        ----------
+        interval_minutes : int
+            Minutes of history of the stats
+        now : float
+            Actual timestamp
+
+        Returns
+        -------
+        all_stats : list
+            Name, stats, stats of the long windows from the rollups and status of each web
+        """
+        last_stats = self._web_stats.get(interval_minutes, {})
+        web_stats = {}
+        period = int(now // self.STATS_EXPIRY)
+        for web in self.webs:  # Loop all the webs
+            version = (web.version, period)
+            cached = last_stats.get(web)
+            if cached is None or cached[0] != version:
+                self.log.debug("Calculating stats for {}".format(web.name))
+                with self.instrumentation.timer('calculate_stats'):
+                    cached = (version, {
+                        'name': web.name,
+                        'stats': web.window_stats(interval_minutes, now),
+                        'rollups': {minutes: web.rollup_stats(minutes, now) for minutes in web.ROLLUP_WINDOWS},
+                        'status': web.status
+                    })
+            web_stats[web] = cached
+        self._web_stats[interval_minutes] = web_stats  # Removed webs are dropped
+
+        return [stats for _, stats in web_stats.values()]
@@ -0,0 +1,34 @@
+from classes import AsyncEngine as ae
+from classes import Coordinator as co
+from classes import ThreadEngine as te
+
+
+def create_engine(webs, settings):
+    """Create the engine set in the settings for the webs
+
+    Parameters
+    ----------
+    webs : list
+        Web objects that will be monitored
+    settings : dict
+        default section of the app configuration
+
+    Returns
+    -------
+    engine : Engine
+        ThreadEngine, AsyncEngine or Coordinator
+    """
+    dns_ttl = float(settings.get('dns_ttl', 60))
+    host_rate = float(settings.get('host_rate', 0))
+    host_burst = float(settings.get('host_burst', 1))
+    if settings.get('engine', 'thread') == 'coordinator':
+        # The webs are checked by the worker nodes
+        return co.Coordinator(webs, settings.get('coordinator_host', '127.0.0.1'),
+                              int(settings.get('coordinator_port', 7700)), int(settings.get('replicas', 1)),
+                              float(settings.get('worker_timeout', 30)), float(settings.get('reorder_delay', 2)))
+    if settings.get('engine', 'thread') == 'asyncio':
+        # All the webs in one event loop
+        return ae.AsyncEngine(webs, int(settings.get('max_in_flight', 100)), dns_ttl, host_rate, host_burst)
+
+    # Pool of worker threads
+    return te.ThreadEngine(webs, int(settings.get('workers', 50)), dns_ttl, host_rate, host_burst)
@@ -0,0 +1,154 @@
+import heapq
+
+try:
+    import numpy
+except ImportError:  # Without NumPy the fleet stats are calculated in Python
+    numpy = None
+
+
+class FleetStats(object):
+    """
+    A class that calculates the stats of all the webs together from the stats of each web.
+
+    The stats of the webs are put in columns, one value of each web, and the fleet stats are calculated with a few
+    operations over the columns. If NumPy is installed the operations are vectorized, if not they are done in Python.
+
+    Attributes
+    ----------
+    worst : int
+        Number of webs in the lists of worst webs
+    use_numpy : bool
+        True if the operations are done with NumPy
+
+    Methods
+    -------
+    """
+
+    def __init__(self, worst=5, use_numpy=True):
+        """
+        Parameters
+        ----------
+        worst : int
+            Number of webs in the lists of worst webs
+        use_numpy : bool
+            Use NumPy if it's installed
+        """
+        self.worst = worst
+        self.use_numpy = use_numpy and numpy is not None
+
+    @staticmethod
+    def columns(web_stats):
+        """Put the stats of the webs in columns
+
+        Parameters
+        ----------
+        web_stats : list
+            Name, stats and status of each web
+
+        Returns
+        -------
+        names : list
+            Name of each web
+        status : list
+            True if the web is up
+        availability : list
+            Availability of each web
+        response_avg : list
+            Response time avg of each web. -1 if it had no available responses
+        response_p95 : list
+            Percentile 95 of the response time of each web. -1 if it had no available responses
+        """
+        names = [web['name'] for web in web_stats]
+        status = [web['status'] for web in web_stats]
+        availability = [web['stats']['availability'] for web in web_stats]
+        response_avg = [web['stats']['response_avg'] for web in web_stats]
+        response_p95 = [web['stats']['response_p95'] for web in web_stats]
+        return names, status, availability, response_avg, response_p95
+
+    def calculate(self, web_stats):
+        """Calculate the stats of all the webs
+
+        Parameters
+        ----------
+        web_stats : list
+            Name, stats and status of each web
+
+        Returns
+        -------
+        stats : dict
+            Number of webs, webs down, availability avg, response time avg, worst webs by availability (lowest
+            first) and worst webs by percentile 95 of the response time (slowest first)
+        """
+        if not web_stats:
+            return {'webs': 0, 'down': 0, 'availability_avg': 0.0, 'response_avg': -1,
+                    'worst_availability': [], 'worst_latency': []}
+
+        names, status, availability, response_avg, response_p95 = self.columns(web_stats)
+        if self.use_numpy:
+            return self.__calculate_numpy(names, status, availability, response_avg, response_p95)
+        return self.__calculate_python(names, status, availability, response_avg, response_p95)
+
+    def __calculate_numpy(self, names, status, availability, response_avg, response_p95):
+        """Fleet stats with vectorized operations
+
+        Parameters
+        ----------
+        names, status, availability, response_avg, response_p95 : list
+            Columns of the stats of the webs
+
+        Returns
+        -------
+        stats : dict
+        """
+        status = numpy.array(status, dtype=bool)
+        availability = numpy.array(availability, dtype=float)
+        response_avg = numpy.array(response_avg, dtype=float)
+        response_p95 = numpy.array(response_p95, dtype=float)
+
+        responded = response_avg >= 0
+        worst = min(self.worst, len(names))
+        lowest = numpy.argpartition(availability, worst - 1)[:worst] if worst else []
+        lowest = sorted(lowest, key=lambda index: (availability[index], index))
+        slow = numpy.flatnonzero(response_p95 >= 0)
+        slow_worst = min(self.worst, len(slow))
+        if slow_worst:
+            slow = slow[numpy.argpartition(-response_p95[slow], slow_worst - 1)[:slow_worst]]
+            slow = sorted(slow, key=lambda index: (-response_p95[index], index))
+        else:
+            slow = []
+
+        return {
+            'webs': len(names),
+            'down': int(numpy.count_nonzero(~status)),
+            'availability_avg': round(float(availability.mean()), 2),
+            'response_avg': round(float(response_avg[responded].mean()), 4) if responded.any() else -1,
+            'worst_availability': [(names[index], float(availability[index])) for index in lowest],
+            'worst_latency': [(names[index], float(response_p95[index])) for index in slow]
+        }
+
+    def __calculate_python(self, names, status, availability, response_avg, response_p95):
+        """Fleet stats in Python
+
+        Parameters
+        ----------
+        names, status, availability, response_avg, response_p95 : list
+            Columns of the stats of the webs
+
+        Returns
+        -------
+        stats : dict
+        """
+        responded = [value for value in response_avg if value >= 0]
+        indexes = range(len(names))
+        lowest = heapq.nsmallest(self.worst, indexes, key=lambda index: availability[index])
+        slow = heapq.nlargest(self.worst, (index for index in indexes if response_p95[index] >= 0),
+                              key=lambda index: response_p95[index])
+
+        return {
+            'webs': len(names),
+            'down': status.count(False),
+            'availability_avg': round(sum(availability) / len(availability), 2),
+            'response_avg': round(sum(responded) / len(responded), 4) if responded else -1,
+            'worst_availability': [(names[index], availability[index]) for index in lowest],
+            'worst_latency': [(names[index], response_p95[index]) for index in slow]
+        }
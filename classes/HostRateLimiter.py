@@ -0,0 +1,70 @@
+from threading import Lock
+from urllib.parse import urlsplit
+import time
+
+
+class HostRateLimiter(object):
+    """
+    A class that limits the requests per second sent to each host with a token bucket.
+
+    Each host has a bucket of burst tokens that is refilled at rate tokens per second. A request takes a token, and if
+    the bucket is empty it reserves the next one and gets the seconds it has to wait for it. So the callers can wait
+    in the event loop or schedule the request for later.
+
+    Attributes
+    ----------
+    rate : float
+        Requests per second to each host. 0 = no limit
+    burst : float
+        Max requests sent to a host at the same moment
+    _buckets : dict
+        Tokens and time of the last refill of each host
+    _lock : Lock
+        Lock for the buckets, that are used by all the worker threads
+
+    Methods
+    -------
+    """
+
+    def __init__(self, rate=0.0, burst=1.0):
+        """
+        Parameters
+        ----------
+        rate : float
+            Requests per second to each host. 0 = no limit
+        burst : float
+            Max requests sent to a host at the same moment
+        """
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._buckets = {}
+        self._lock = Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def reserve(self, url):
+        """Take a token of the bucket of the host of the url
+
+        Parameters
+        ----------
+        url : str
+            Url of the request
+
+        Returns
+        -------
+        wait : float
+            Seconds to wait before sending the request. 0 if there was a token
+        """
+        if not self.enabled:
+            return 0.0
+
+        host = urlsplit(url).hostname
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate) - 1
+            self._buckets[host] = (tokens, now)
+
+        return 0.0 if tokens >= 0 else -tokens / self.rate
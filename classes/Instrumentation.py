@@ -0,0 +1,160 @@
+from contextlib import contextmanager
+from threading import Lock
+import cProfile
+import itertools
+import time
+
+
+class Instrumentation(object):
+    """
+    A class that measures the time spent in the hot paths of the monitor and profiles a sample of them.
+
+    Each timer adds the number of calls, the total and the max seconds since the last stats. The profiler is off by
+    default. When it's on, one of every sample sections runs with cProfile, so the overhead under load is small. Only
+    one section is profiled at a time, because the profiler can't be enabled in several threads at once.
+
+    Attributes
+    ----------
+    _timings : dict
+        Calls, total seconds and max seconds of each timer since the last stats
+    _lock : Lock
+        Lock for the timings, that are updated by all the worker threads
+    _sample : int
+        One of every sample sections is profiled. 0 = profiler off
+    _sections : itertools.count
+        Counter of the sections, to choose the profiled ones
+    _profile : cProfile.Profile
+        Profile with the profiled sections. None if the profiler was never started
+    _profiled : int
+        Number of sections in the profile
+    _profile_lock : Lock
+        Held while a section is profiled
+
+    Methods
+    -------
+    """
+
+    def __init__(self):
+        self._timings = {}
+        self._lock = Lock()
+        self._sample = 0
+        self._sections = itertools.count()
+        self._profile = None
+        self._profiled = 0
+        self._profile_lock = Lock()
+
+    @property
+    def profiling(self):
+        return self._sample > 0
+
+    def record(self, name, seconds):
+        """Add the duration of a call to a timer
+
+        Parameters
+        ----------
+        name : str
+            Name of the timer
+        seconds : float
+            Duration of the call
+        """
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                self._timings[name] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """Measure the duration of the code inside the with statement
+
+        Parameters
+        ----------
+        name : str
+            Name of the timer
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timing_stats(self, reset=True):
+        """Timings since the last call
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Calls, average and max milliseconds of each timer
+        """
+        with self._lock:
+            timings = self._timings
+            if reset:
+                self._timings = {}
+            else:
+                timings = {name: list(timing) for name, timing in timings.items()}
+
+        return {name: {'count': count, 'avg_ms': round(total / count * 1000, 3), 'max_ms': round(maximum * 1000, 3)}
+                for name, (count, total, maximum) in sorted(timings.items())}
+
+    @contextmanager
+    def profiled(self):
+        """Profile the code inside the with statement if it's one of the sampled sections
+        """
+        if not self._sample or next(self._sections) % self._sample or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            profile = self._profile
+            if profile is None:  # Profile stopped while the lock was waited for
+                yield
+                return
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                self._profiled += 1
+        finally:
+            self._profile_lock.release()
+
+    def start_profile(self, sample):
+        """Start profiling one of every sample sections, discarding the previous profile
+
+        Parameters
+        ----------
+        sample : int
+            One of every sample sections is profiled
+        """
+        with self._profile_lock:
+            self._profile = cProfile.Profile()
+            self._profiled = 0
+            self._sample = max(1, int(sample))
+
+    def stop_profile(self, path):
+        """Stop profiling and save the profile in a file that can be read with pstats
+
+        Parameters
+        ----------
+        path : str
+            File where the profile is saved
+
+        Returns
+        -------
+        saved : bool
+            False if the profiler was not started or no section was profiled
+        """
+        with self._profile_lock:  # Wait for the section that is being profiled
+            self._sample = 0
+            profile, self._profile = self._profile, None
+            if profile is None or not self._profiled:
+                return False
+            profile.dump_stats(path)
+        return True
@@ -0,0 +1,153 @@
+from array import array
+import math
+
+
+class LatencyHistogram(object):
+    """
+    A histogram of response times with logarithmic buckets.
+
+    Each bucket is a PRECISION percentage wider than the previous one, so the percentiles have that relative error
+    and the memory is fixed whatever the number of responses. Two histograms can be merged adding their counts.
+
+    Attributes
+    ----------
+    _counts : array
+        Number of responses of each bucket
+    _total : int
+        Number of responses
+
+    Methods
+    -------
+    """
+
+    # Values smaller than MIN_VALUE go to the first bucket and values greater than MAX_VALUE to the last one
+    MIN_VALUE = 0.0001
+    MAX_VALUE = 60.0
+    PRECISION = 0.02
+    _LOG_BASE = math.log(1 + PRECISION)
+    BUCKETS = int(math.log(MAX_VALUE / MIN_VALUE) / _LOG_BASE) + 2
+
+    def __init__(self):
+        self._counts = array('I', [0]) * self.BUCKETS
+        self._total = 0
+
+    def __len__(self):
+        return self._total
+
+    @classmethod
+    def bucket(cls, value):
+        """Index of the bucket of a value
+
+        Parameters
+        ----------
+        value : float
+            Response time in seconds
+
+        Returns
+        -------
+        index : int
+        """
+        if value <= cls.MIN_VALUE:
+            return 0
+        return min(int(math.log(value / cls.MIN_VALUE) / cls._LOG_BASE) + 1, cls.BUCKETS - 1)
+
+    @classmethod
+    def bucket_value(cls, index):
+        """Value that represents a bucket, the middle of the bucket
+
+        Parameters
+        ----------
+        index : int
+            Index of the bucket
+
+        Returns
+        -------
+        value : float
+        """
+        if index == 0:
+            return cls.MIN_VALUE
+        return cls.MIN_VALUE * (1 + cls.PRECISION) ** (index - 0.5)
+
+    def add(self, value, count=1):
+        """Add a value. A negative count removes it
+
+        Parameters
+        ----------
+        value : float
+            Response time in seconds
+        count : int
+            Number of times the value is added
+        """
+        self._counts[self.bucket(value)] += count
+        self._total += count
+
+    def extend(self, values):
+        """Add many values at once
+
+        Parameters
+        ----------
+        values : list
+            Response times in seconds
+        """
+        counts = self._counts
+        log = math.log
+        minimum = self.MIN_VALUE
+        last = self.BUCKETS - 1
+        for value in values:  # Same as bucket, without a call for each value
+            counts[min(int(log(value / minimum) / self._LOG_BASE) + 1, last) if value > minimum else 0] += 1
+        self._total += len(values)
+
+    def copy(self):
+        """Copy of the histogram
+
+        Returns
+        -------
+        histogram : LatencyHistogram
+        """
+        histogram = LatencyHistogram()
+        histogram._counts = self._counts[:]
+        histogram._total = self._total
+        return histogram
+
+    def merge(self, histogram):
+        """Add the counts of other histogram
+
+        Parameters
+        ----------
+        histogram : LatencyHistogram
+            Histogram that is added to this one
+        """
+        for index, count in enumerate(histogram._counts):
+            if count:
+                self._counts[index] += count
+        self._total += histogram._total
+
+    def percentiles(self, percents):
+        """Calculate the percentiles in one pass
+
+        Parameters
+        ----------
+        percents : tuple
+            Percentiles to calculate, from 0 to 100 ordered
+
+        Returns
+        -------
+        values : list
+            Value of each percentile rounded to 4 decimals. -1 if the histogram is empty
+        """
+        if self._total == 0:
+            return [-1] * len(percents)
+
+        values = []
+        ranks = [max(1, math.ceil(percent / 100 * self._total)) for percent in percents]
+        accumulated = 0
+        for index, count in enumerate(self._counts):
+            if not count:
+                continue
+            accumulated += count
+            while ranks[len(values)] <= accumulated:
+                values.append(round(self.bucket_value(index), 4))
+                if len(values) == len(ranks):
+                    return values
+
+        return values
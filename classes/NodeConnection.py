@@ -0,0 +1,86 @@
+from threading import Lock
+import json
+import socket
+
+
+class NodeConnection(object):
+    """
+    A class that sends and receives the messages between the coordinator and the workers.
+
+    Each message is a dict sent as one line of compact JSON, so the protocol can be read and tested with any TCP
+    client. The messages can be sent from several threads.
+
+    Attributes
+    ----------
+    sock : socket.socket
+        Connected socket
+    _reader : io.BufferedReader
+        Reader of the lines of the socket
+    _lock : Lock
+        Lock for the sends, so the lines of two messages are not mixed
+
+    Methods
+    -------
+    """
+
+    def __init__(self, sock, timeout=None):
+        """
+        Parameters
+        ----------
+        sock : socket.socket
+            Connected socket
+        timeout : float
+            Max seconds waiting for a message. None = no limit
+        """
+        self.sock = sock
+        self.sock.settimeout(timeout)
+        self._reader = sock.makefile('rb')
+        self._lock = Lock()
+
+    def send(self, message):
+        """Send a message
+
+        Parameters
+        ----------
+        message : dict
+            Message with its type and data. Must be serializable to JSON
+
+        Raises
+        ------
+        OSError
+            If the connection is closed
+        """
+        data = json.dumps(message, separators=(',', ':')).encode() + b'\n'
+        with self._lock:
+            self.sock.sendall(data)
+
+    def receive(self):
+        """Wait for the next message
+
+        Returns
+        -------
+        message : dict
+            None if the connection was closed or the timeout expired
+
+        Raises
+        ------
+        ValueError
+            If the message is not valid JSON
+        """
+        try:
+            line = self._reader.readline()
+        except (OSError, ValueError):  # Timeout, connection reset or closed by other thread
+            return None
+        if not line:
+            return None
+        return json.loads(line)
+
+    def close(self):
+        """Close the connection
+        """
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # Wakes up the thread waiting for a message
+        except OSError:  # Already closed
+            pass
+        self._reader.close()
+        self.sock.close()
@@ -0,0 +1,182 @@
+from threading import Lock, local
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.poolmanager import PoolManager
+
+
+class ConnectionStats(object):
+    """
+    A class that counts the requests and the connections opened by the pooled adapters.
+
+    Also records the seconds of the connection phases (DNS, connect and TLS) of the request of each thread, because
+    the connection is opened in the thread that does the request.
+
+    Attributes
+    ----------
+    requests : int
+        Number of requests sent
+    connections : int
+        Number of connections opened. Includes reconnections of pooled connections closed by the server
+    _lock : Lock
+        Lock for updating the counters from different threads
+    _phases : threading.local
+        Seconds of the connection phases of the request of each thread
+
+    Methods
+    -------
+    """
+
+    CONNECTION_PHASES = ('dns', 'connect', 'tls')
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self._lock = Lock()
+        self._phases = local()
+
+    def start_request(self):
+        """Reset the connection phases of the thread before a request
+        """
+        self._phases.seconds = dict.fromkeys(self.CONNECTION_PHASES, 0.0)
+
+    def add_phase(self, phase, seconds):
+        """Add the seconds of a connection phase to the request of the thread
+
+        Parameters
+        ----------
+        phase : str
+            One of CONNECTION_PHASES
+        seconds : float
+            Seconds of the phase
+        """
+        phases = getattr(self._phases, 'seconds', None)
+        if phases is not None:
+            phases[phase] += seconds
+
+    def request_phases(self):
+        """Seconds of the connection phases of the last request of the thread
+
+        Returns
+        -------
+        phases : dict
+            Seconds of each phase. 0 if the request reused a connection
+        """
+        return dict(getattr(self._phases, 'seconds', dict.fromkeys(self.CONNECTION_PHASES, 0.0)))
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self):
+        with self._lock:
+            self.connections += 1
+
+
+class StatsConnectionMixin(object):
+    """
+    Connection that reports to a ConnectionStats each time it opens a socket and the time of its phases.
+
+    The host is resolved with the DnsCache if it's set.
+    """
+
+    tls = False  # The connection does a TLS handshake after opening the socket
+
+    def __init__(self, *args, stats=None, dns_cache=None, **kwargs):
+        self.stats = stats
+        self.dns_cache = dns_cache
+        self._socket_seconds = 0.0
+        super().__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        dns_host = self._dns_host
+        if self.dns_cache is not None:
+            try:
+                self._dns_host = self.dns_cache.resolve(dns_host, self.port)
+            except OSError:
+                pass  # The connection will fail resolving the host again and raise the urllib3 error
+        resolved = time.perf_counter()
+        try:
+            conn = super()._new_conn()
+        finally:
+            self._dns_host = dns_host
+        connected = time.perf_counter()
+
+        self._socket_seconds = connected - start
+        if self.stats is not None:
+            self.stats.add_phase('dns', resolved - start)
+            self.stats.add_phase('connect', connected - resolved)
+        return conn
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        if self.stats is not None:
+            self.stats.add_connection()
+            if self.tls:  # Time of connect that was not used to open the socket
+                self.stats.add_phase('tls', time.perf_counter() - start - self._socket_seconds)
+
+
+class StatsHTTPConnection(StatsConnectionMixin, HTTPConnection):
+    pass
+
+
+class StatsHTTPSConnection(StatsConnectionMixin, HTTPSConnection):
+    tls = True
+
+
+class StatsPoolManager(PoolManager):
+    """
+    PoolManager whose connection pools create connections that report to a ConnectionStats and use a DnsCache.
+    """
+
+    connection_classes = {
+        'http': StatsHTTPConnection,
+        'https': StatsHTTPSConnection
+    }
+
+    def __init__(self, stats, dns_cache, *args, **kwargs):
+        self.stats = stats
+        self.dns_cache = dns_cache
+        super().__init__(*args, **kwargs)
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.ConnectionCls = self.connection_classes[scheme]
+        pool.conn_kw['stats'] = self.stats
+        pool.conn_kw['dns_cache'] = self.dns_cache
+        return pool
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that keeps the connections alive in a pool and counts the requests and the connections opened.
+
+    Attributes
+    ----------
+    stats : ConnectionStats
+        Counters shared by all the adapters of a WebChecker
+    dns_cache : DnsCache
+        Cache of resolved hosts shared by all the adapters of a WebChecker. None to resolve on every connection
+
+    Methods
+    -------
+    """
+
+    def __init__(self, stats, dns_cache=None, **kwargs):
+        self.stats = stats
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = StatsPoolManager(self.stats, self.dns_cache, num_pools=connections, maxsize=maxsize,
+                                            block=block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        self.stats.add_request()
+        return super().send(request, **kwargs)
@@ -0,0 +1,386 @@
+from multiprocessing import Pipe, Process
+from threading import Lock, Thread, active_count
+import logging
+import os
+import pstats
+import queue
+import time
+import zlib
+
+from classes import Engine as en
+from classes import Engines
+
+
+def run_shard(model, webs_data, settings, connection):
+    """Entry point of a shard process
+
+    Creates the webs of the shard, monitors them with the engine set in the settings and answers the requests of the
+    parent process until the connection is closed
+
+    Parameters
+    ----------
+    model : callable
+        Creates the model objects from the web data
+    webs_data : dict
+        Data of the webs of the shard
+    settings : dict
+        default section of the app configuration
+    connection : multiprocessing.connection.Connection
+        Connection with the parent process
+    """
+    send_lock = Lock()
+
+    def send(message):
+        with send_lock:  # Alerts and replies are sent from different threads
+            connection.send(message)
+
+    def forward_alerts():
+        while True:
+            send(('alert', alerts.get()))
+
+    def create_web(web_data):
+        web = model(**web_data)
+        web.alerts = alerts
+        return web
+
+    alerts = queue.Queue()
+    webs = {web_name: create_web(webs_data[web_name]) for web_name in webs_data.keys()}
+
+    engine = Engines.create_engine(list(webs.values()), settings)
+    engine.start()
+    Thread(target=forward_alerts, daemon=True).start()
+
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:  # Parent process finished
+            break
+        if request[0] == 'web_stats':
+            send(('web_stats', engine.web_stats(request[1], request[2])))
+        elif request[0] == 'stats':
+            send(('stats', engine.stats(request[1])))
+        elif request[0] == 'profile':
+            engine.start_profile(request[1])
+            send(('profile', True))
+        elif request[0] == 'profile_stop':
+            send(('profile_stop', engine.stop_profile(request[1])))
+        elif request[0] == 'update':
+            added = {web_name: create_web(web_data) for web_name, web_data in request[1].items()}
+            removed = [webs.pop(web_name) for web_name in request[2]]
+            webs.update(added)
+            engine.update_webs(list(added.values()), removed)
+            send(('update', len(webs)))
+
+
+class ProcessEngine(object):
+    """
+    A class that splits the webs between several processes.
+
+    Each process (shard) has its own engine and Web objects, so the checks and the stats of the webs don't share the
+    GIL. The parent process talks with each shard through a pipe: the shards send the alerts as soon as they happen
+    and answer the stats requests.
+
+    Attributes
+    ----------
+    model : callable
+        Creates the model objects from the web data
+    settings : dict
+        default section of the app configuration
+    alerts : queue.Queue
+        Queue where the alerts of the shards are put
+    log : LogRecord
+        log object
+    _shards_data : list
+        Data of the webs of each shard
+    _web_shards : dict
+        Shard of each web
+    _processes : list
+        Process of each shard
+    _connections : list
+        Connection with each shard
+    _replies : list
+        Queue with the name of the request and the reply of each reply of each shard
+    _locks : list
+        Lock of each shard, so only one request is waiting for a reply
+
+    Methods
+    -------
+    """
+
+    # Max seconds waiting for the reply of a shard
+    REPLY_TIMEOUT = 30
+    # Seconds between the checks of the shard process while its reply is waited
+    REPLY_POLL = 1
+
+    def __init__(self, model, webs_data, settings, alerts, processes):
+        """
+        Parameters
+        ----------
+        model : callable
+            Creates the model objects from the web data
+        webs_data : dict
+            All the data of the webs
+        settings : dict
+            default section of the app configuration
+        alerts : queue.Queue
+            Queue where the alerts of the shards are put
+        processes : int
+            Number of shards
+        """
+        self.model = model
+        self.settings = settings
+        self.alerts = alerts
+        self.log = logging.getLogger("Monitor")
+        self._shards_data = [{} for _ in range(processes)]
+        self._web_shards = {}
+        for web_name in webs_data.keys():
+            self._web_shards[web_name] = self.shard(webs_data[web_name]['name'], processes)
+            self._shards_data[self._web_shards[web_name]][web_name] = webs_data[web_name]
+        self._processes = []
+        self._connections = []
+        self._replies = []
+        self._locks = []
+
+    @staticmethod
+    def shard(web_name, processes):
+        """Shard of a web. It's always the same for the same name
+
+        Parameters
+        ----------
+        web_name : str
+            Name of the web
+        processes : int
+            Number of shards
+
+        Returns
+        -------
+        shard : int
+        """
+        return zlib.crc32(web_name.encode()) % processes
+
+    def start(self):
+        """Starts a process for each shard and the threads that receive their messages
+        """
+        # The webs of a host are split between the shards, so each one gets a part of the rate limit
+        settings = dict(self.settings)
+        settings['host_rate'] = float(self.settings.get('host_rate', 0)) / len(self._shards_data)
+        for shard, webs_data in enumerate(self._shards_data):
+            parent_connection, child_connection = Pipe()
+            process = Process(target=run_shard, args=(self.model, webs_data, settings, child_connection),
+                              name="Shard-{}".format(shard), daemon=True)
+            process.start()
+            self._processes.append(process)
+            self._connections.append(parent_connection)
+            self._replies.append(queue.Queue())
+            self._locks.append(Lock())
+            Thread(target=self.__receive, args=(shard,), daemon=True).start()
+            self.log.info("Started shard {} with {} webs".format(shard, len(webs_data)))
+
+    def __receive(self, shard):
+        """Infinite loop that receives the messages of a shard
+
+        Parameters
+        ----------
+        shard : int
+            Index of the shard
+        """
+        while True:
+            try:
+                message = self._connections[shard].recv()
+            except EOFError:
+                self.log.error("Shard {} finished".format(shard))
+                return
+            if message[0] == 'alert':
+                self.alerts.put(message[1])
+            else:
+                self._replies[shard].put(message)
+
+    def __request(self, *request):
+        """Send a request to all the shards and wait for their replies
+
+        Parameters
+        ----------
+        request : tuple
+            Request name and parameters
+
+        Returns
+        -------
+        replies : list
+            Reply of each shard
+        """
+        return self.__request_each([request] * len(self._connections))
+
+    def __request_each(self, requests):
+        """Send a request to each shard and wait for their replies
+
+        The shards work on the requests at the same time. A shard whose process finished or that doesn't reply in
+        REPLY_TIMEOUT seconds is skipped, so the other shards are still answered
+
+        Parameters
+        ----------
+        requests : list
+            Request name and parameters of each shard
+
+        Returns
+        -------
+        replies : list
+            Reply of each shard. None if the shard didn't reply
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            sent = [self.__send(shard, request) for shard, request in enumerate(requests)]
+            deadline = time.monotonic() + self.REPLY_TIMEOUT
+            return [self.__reply(shard, request[0], deadline) if shard_sent else None
+                    for shard, (request, shard_sent) in enumerate(zip(requests, sent))]
+        finally:
+            for lock in self._locks:
+                lock.release()
+
+    def __send(self, shard, request):
+        """Send a request to a shard whose process is running
+
+        Parameters
+        ----------
+        shard : int
+            Index of the shard
+        request : tuple
+            Request name and parameters
+
+        Returns
+        -------
+        sent : bool
+        """
+        while not self._replies[shard].empty():  # Late replies of a request that timed out
+            self._replies[shard].get_nowait()
+        if not self._processes[shard].is_alive():  # Already logged by the receiving thread
+            return False
+        try:
+            self._connections[shard].send(request)
+        except OSError:  # Finished meanwhile
+            return False
+        return True
+
+    def __reply(self, shard, name, deadline):
+        """Wait for the reply of a shard while its process is running
+
+        Parameters
+        ----------
+        shard : int
+            Index of the shard
+        name : str
+            Name of the request
+        deadline : float
+            Monotonic time when the waiting stops
+
+        Returns
+        -------
+        reply : object
+            None if the process finished or the time is over
+        """
+        while True:
+            try:
+                reply_name, reply = self._replies[shard].get(
+                    timeout=max(0.0, min(self.REPLY_POLL, deadline - time.monotonic())))
+            except queue.Empty:
+                if not self._processes[shard].is_alive():
+                    return None
+                if time.monotonic() >= deadline:
+                    self.log.error("Shard {} didn't reply to {} in {} seconds".format(shard, name, self.REPLY_TIMEOUT))
+                    return None
+                continue
+            if reply_name == name:  # Not a late reply of other request
+                return reply
+
+    def update_webs(self, added, removed):
+        """Start the monitoring of new webs and stop the monitoring of others in their shards
+
+        Parameters
+        ----------
+        added : dict
+            Data of the webs that will be monitored
+        removed : list
+            Names of the webs that won't be monitored anymore
+        """
+        processes = len(self._shards_data)
+        requests = [('update', {}, []) for _ in range(processes)]
+        for web_name in removed:
+            requests[self._web_shards.pop(web_name)][2].append(web_name)
+        for web_name in added.keys():
+            self._web_shards[web_name] = self.shard(added[web_name]['name'], processes)
+            requests[self._web_shards[web_name]][1][web_name] = added[web_name]
+        self.__request_each(requests)
+
+    def web_stats(self, interval_minutes, now):
+        """Running stats of each web of all the shards
+
+        Parameters
+        ----------
+        interval_minutes : int
+            Minutes of history of the stats
+        now : float
+            Actual timestamp
+
+        Returns
+        -------
+        all_stats : list
+            Name, stats and status of each web
+        """
+        all_stats = []
+        for shard_stats in self.__request('web_stats', interval_minutes, now):
+            if shard_stats is not None:
+                all_stats.extend(shard_stats)
+
+        return all_stats
+
+    def stats(self, reset=True):
+        """Stats of the engines of all the shards added up
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Stats of the connections, of the DNS cache, of the scheduler, of the load and the timings since the last
+            stats
+        """
+        all_stats = [shard_stats for shard_stats in self.__request('stats', reset) if shard_stats is not None]
+        stats = en.Engine.merge_stats(all_stats)
+        stats['load']['threads'] += active_count()
+        return stats
+
+    def start_profile(self, sample):
+        """Start profiling one of every sample checks in all the shards
+
+        Parameters
+        ----------
+        sample : int
+            One of every sample checks is profiled
+        """
+        self.__request('profile', sample)
+
+    def stop_profile(self, path):
+        """Stop profiling and save the profiles of all the shards together in a file
+
+        Parameters
+        ----------
+        path : str
+            File where the profile is saved
+
+        Returns
+        -------
+        saved : bool
+            False if the profiler was not started or no check was profiled
+        """
+        paths = ["{}.{}".format(path, shard) for shard in range(len(self._connections))]
+        replies = self.__request_each([('profile_stop', shard_path) for shard_path in paths])
+        saved = [shard_path for shard_path, shard_saved in zip(paths, replies) if shard_saved]
+        if not saved:
+            return False
+        pstats.Stats(*saved).dump_stats(path)
+        for shard_path in saved:
+            os.remove(shard_path)
+        return True
@@ -0,0 +1,74 @@
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import os
+import queue
+
+
+class QueuedLog(object):
+    """
+    A class that moves the output of a logger to a background thread.
+
+    The logger only puts the records in a queue, and a listener thread writes them with the handlers. So the threads
+    that log never wait for the disk or the terminal. The pending records are written when the program finishes.
+
+    Attributes
+    ----------
+    logger : Logger
+        Logger whose records are queued
+    handlers : tuple
+        Handlers that write the records in the listener thread
+    _queue : queue.SimpleQueue
+        Records waiting to be written
+    _handler : QueueHandler
+        Handler of the logger that puts the records in the queue
+    _listener : QueueListener
+        Thread that writes the records
+
+    Methods
+    -------
+    """
+
+    def __init__(self, logger, *handlers):
+        """
+        Parameters
+        ----------
+        logger : Logger
+            Logger whose records are queued
+        handlers : Handler
+            Handlers that write the records
+        """
+        self.logger = logger
+        self.handlers = handlers
+        self._queue = None
+        self._handler = None
+        self._listener = None
+
+    def start(self):
+        """Adds the queue handler to the logger and starts the listener thread
+        """
+        self.__listen()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):  # The listener thread doesn't exist in forked processes
+            os.register_at_fork(after_in_child=self.__listen)
+
+    def __listen(self):
+        """Replaces the queue handler of the logger and starts a new listener thread
+        """
+        if self._handler is not None:
+            self.logger.removeHandler(self._handler)
+        self._queue = queue.SimpleQueue()
+        self._handler = QueueHandler(self._queue)
+        self.logger.addHandler(self._handler)
+        self._listener = QueueListener(self._queue, *self.handlers, respect_handler_level=True)
+        self._listener.start()
+
+    def stop(self):
+        """Writes the pending records, stops the listener thread and closes the handlers
+        """
+        if self._listener is None:
+            return
+        self.logger.removeHandler(self._handler)
+        self._listener.stop()
+        self._listener = None
+        for handler in self.handlers:
+            handler.close()
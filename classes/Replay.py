@@ -0,0 +1,347 @@
+import json
+import os
+import queue
+import sqlite3
+import time
+
+from classes import AlertDispatcher as ad
+
+
+class Replay(object):
+    """
+    A class that runs recorded check results through the Web objects and the alert logic with a virtual clock.
+
+    The clock is the timestamp of each recorded response, so nothing waits and the same recording with the same
+    settings always gives the same report. Every stats_interval seconds of the recording the stats of the window of
+    each web are saved. The alerts fired by the webs are also passed through the deduplication and the flapping
+    detection of AlertDispatcher, grouped in batches of batch_window seconds of the recording, to know which ones the
+    sinks would have received.
+
+    Attributes
+    ----------
+    model : class
+        Web class of the webs
+    webs_data : dict
+        Parameters of each web name. The responses of other webs are skipped
+    window : int
+        Minutes of the stats saved, one of the STATS_WINDOWS of the model
+    stats_interval : float
+        Seconds of the recording between stats
+    dispatcher : AlertDispatcher
+        Dispatcher without sinks whose filter decides the alerts that are sent
+    webs : dict
+        Web object of each web name with responses
+    alerts : list
+        Alerts fired by the webs, oldest first
+    sent : list
+        Alerts that the sinks would have received
+    stats : list
+        Time, status, availability and window stats of each web, every stats_interval seconds
+    _fired : queue.SimpleQueue
+        Alerts fired by the webs that are not batched yet
+    _pending : list
+        Alerts of the batch that is being grouped
+    _batch_end : float
+        Time of the recording when the batch is closed
+    _counts : dict
+        Responses replayed and skipped
+
+    Methods
+    -------
+    """
+
+    FORMATS = ('.jsonl', '.db')
+
+    def __init__(self, model, webs_data, window=10, stats_interval=600.0, batch_window=1.0, flap_window=600.0,
+                 flap_limit=4):
+        """
+        Parameters
+        ----------
+        model : class
+            Web class of the webs
+        webs_data : dict
+            Parameters of each web, like in the webs of the configuration
+        window : int
+            Minutes of the stats saved, one of the STATS_WINDOWS of the model
+        stats_interval : float
+            Seconds of the recording between stats
+        batch_window : float
+            Seconds of the recording of each batch of alerts
+        flap_window : float
+            Seconds of the status changes counted to know if a web is flapping
+        flap_limit : int
+            Max status changes in flap_window seconds of a web that is not flapping
+        """
+        self.model = model
+        self.webs_data = {parameters.get('name'): parameters for parameters in webs_data.values()}  # As recorded
+        self.window = window
+        self.stats_interval = stats_interval
+        self.dispatcher = ad.AlertDispatcher([], batch_window, flap_window=flap_window, flap_limit=flap_limit)
+        self.webs = {}
+        self.alerts = []
+        self.sent = []
+        self.stats = []
+        self._fired = queue.SimpleQueue()
+        self._pending = []
+        self._batch_end = None
+        self._counts = {'replayed': 0, 'unknown_web': 0, 'out_of_order': 0}
+
+    @staticmethod
+    def with_availability_window(model, minutes):
+        """Web class whose status is calculated with the availability of other window of minutes
+
+        Parameters
+        ----------
+        model : class
+            Web class
+        minutes : int
+            Minutes of the availability window
+
+        Returns
+        -------
+        model : class
+            Subclass of the model with the availability window, that also has running stats for it
+        """
+        if minutes == model.AVAILABILITY_WINDOW:
+            return model
+        return type(model.__name__, (model,), {
+            'AVAILABILITY_WINDOW': minutes,
+            'STATS_WINDOWS': tuple(sorted(set(model.STATS_WINDOWS) | {minutes}))
+        })
+
+    @staticmethod
+    def read(path):
+        """Read the responses of a recording, oldest first
+
+        The recording is a JSON Lines file with an object per response, the name of the web in name and the fields of
+        the response, or the database of the sqlite model. Each line is checked when it's read, so a wrong line stops
+        the replay with its number instead of failing inside the webs
+
+        Parameters
+        ----------
+        path : str
+            Path of the recording
+
+        Yields
+        ------
+        name : str
+            Name of the web
+        response : dict
+            Web data response
+
+        Raises
+        ------
+        ValueError
+            If the format of the recording is not one of FORMATS or a line is not valid JSON or not a valid response
+        OSError
+            If the recording can't be read
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.jsonl':
+            with open(path) as recording:
+                for number, line in enumerate(recording, 1):
+                    if line.strip():
+                        try:
+                            response = json.loads(line)
+                        except json.JSONDecodeError as error:
+                            raise ValueError("Line {} is not valid JSON: {} at column {}".format(
+                                number, error.msg, error.pos + 1))
+                        error = Replay.__response_error(response)
+                        if error is not None:
+                            raise ValueError("Line {} is not a valid response: {}".format(number, error))
+                        yield response.pop('name'), response
+        elif extension == '.db':
+            if not os.path.exists(path):  # sqlite would create an empty database
+                raise FileNotFoundError("No such file: {}".format(path))
+            connection = sqlite3.connect(path)
+            try:
+                rows = connection.execute("SELECT web, timestamp, available, status_code, response_time "
+                                          "FROM responses ORDER BY timestamp")
+                for name, timestamp, available, status_code, response_time in rows:
+                    response = {'available': available == 1, 'timestamp': timestamp}
+                    if status_code is not None:
+                        response['status_code'] = status_code
+                        response['response_time'] = response_time
+                    yield name, response
+            finally:
+                connection.close()
+        else:
+            raise ValueError("Unknown recording format {}, must be one of {}".format(extension,
+                                                                                     ', '.join(Replay.FORMATS)))
+
+    @staticmethod
+    def __response_error(response):
+        """Check the fields of a recorded response that are used by the webs
+
+        Parameters
+        ----------
+        response : dict
+            Name of the web and fields of the response
+
+        Returns
+        -------
+        error : str
+            Description of the first wrong field, None if the response is valid
+        """
+        def is_number(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        if not isinstance(response, dict):
+            return "it must be an object"
+        if not isinstance(response.get('name'), str):
+            return "name must be a string"
+        if not is_number(response.get('timestamp')):
+            return "timestamp must be a number"
+        if not isinstance(response.get('available'), bool):
+            return "available must be true or false"
+        if response['available'] and not is_number(response.get('response_time')):
+            return "response_time must be a number if the web is available"
+        if 'status_code' in response and not isinstance(response['status_code'], int):
+            return "status_code must be an integer"
+        return None
+
+    def run(self, responses):
+        """Replay the responses and build the report
+
+        Parameters
+        ----------
+        responses : iterable
+            Name of the web and response of each check, oldest first
+
+        Returns
+        -------
+        report : dict
+            Counts of responses, replay speed, alerts fired and sent, stats every stats_interval seconds and a summary
+            of each web
+        """
+        start = time.perf_counter()
+        last_timestamps = {}
+        next_stats = None
+        now = None
+        for name, response in responses:
+            web = self.webs.get(name)
+            if web is None:
+                if name not in self.webs_data:
+                    self._counts['unknown_web'] += 1
+                    continue
+                web = self.webs[name] = self.model(**self.webs_data[name])
+                web.alerts = self._fired
+                last_timestamps[name] = float('-inf')
+
+            timestamp = response['timestamp']
+            if timestamp < last_timestamps[name]:  # The history of a web must be in time order
+                self._counts['out_of_order'] += 1
+                continue
+            last_timestamps[name] = timestamp
+            if now is None or timestamp > now:  # Virtual clock
+                now = timestamp
+                if next_stats is None:
+                    next_stats = (now // self.stats_interval + 1) * self.stats_interval
+                while now >= next_stats:
+                    self.__dispatch(next_stats)
+                    self.__save_stats(next_stats)
+                    next_stats += self.stats_interval
+                self.__dispatch(now)
+
+            web.add_response(response)
+            self._counts['replayed'] += 1
+
+        if now is not None:
+            self.__dispatch(float('inf'))  # Close the last batch
+            self.__save_stats(now)
+        seconds = time.perf_counter() - start
+        return {
+            'responses': dict(self._counts),
+            'webs': len(self.webs),
+            'seconds': round(seconds, 3),
+            'responses_per_minute': round(self._counts['replayed'] / seconds * 60) if seconds > 0 else None,
+            'alerts': self.alerts,
+            'sent_alerts': self.sent,
+            'stats': self.stats,
+            'summary': self.summary(now)
+        }
+
+    def __dispatch(self, now):
+        """Group the fired alerts in batches and filter the batches that are closed at a time of the recording
+
+        Parameters
+        ----------
+        now : float
+            Time of the recording
+        """
+        while not self._fired.empty():
+            alert = self._fired.get()
+            self.alerts.append(alert)
+            if not self._pending:
+                self._batch_end = alert['timestamp'] + self.dispatcher.batch_window
+            self._pending.append(alert)
+
+        if self._pending and now >= self._batch_end:
+            self.sent.extend(self.dispatcher.filter(self._pending, min(now, self._batch_end)))
+            self._pending = []
+        elif not self._pending and self.dispatcher.holding:  # Webs that may have stopped flapping
+            self.sent.extend(self.dispatcher.filter([], now if now != float('inf') else self.__last_time()))
+
+    def __last_time(self):
+        """Time of the newest alert
+
+        Returns
+        -------
+        timestamp : float
+        """
+        return self.alerts[-1]['timestamp'] if self.alerts else 0.0
+
+    def __save_stats(self, now):
+        """Save the stats of the window of each web at a time of the recording
+
+        Parameters
+        ----------
+        now : float
+            Time of the recording
+        """
+        webs = {}
+        for name, web in self.webs.items():
+            snapshot = web.snapshot(now, (self.window,))
+            webs[name] = {
+                'status': snapshot.status,
+                'availability': snapshot.availability,
+                'stats': snapshot.windows[self.window]
+            }
+        self.stats.append({'timestamp': now, 'webs': webs})
+
+    def summary(self, now):
+        """Alerts, seconds down and long window availability of each web at the end of the recording
+
+        Parameters
+        ----------
+        now : float
+            Time of the end of the recording
+
+        Returns
+        -------
+        summary : dict
+            Summary of each web name
+        """
+        summary = {name: {'down_alerts': 0, 'up_alerts': 0, 'sent_alerts': 0, 'down_seconds': 0.0}
+                   for name in self.webs.keys()}
+        down_since = {}
+        for alert in self.alerts:
+            web_summary = summary[alert['name']]
+            if alert['status']:
+                web_summary['up_alerts'] += 1
+                if alert['name'] in down_since:
+                    web_summary['down_seconds'] += alert['timestamp'] - down_since.pop(alert['name'])
+            else:
+                web_summary['down_alerts'] += 1
+                down_since.setdefault(alert['name'], alert['timestamp'])
+        for name, since in down_since.items():  # Still down at the end
+            summary[name]['down_seconds'] += now - since
+        for alert in self.sent:
+            summary[alert['name']]['sent_alerts'] += 1
+
+        for name, web in self.webs.items():
+            summary[name]['down_seconds'] = round(summary[name]['down_seconds'], 3)
+            summary[name]['status'] = web.status
+            summary[name]['availability'] = {minutes: web.rollup_stats(minutes, now)['availability']
+                                             for minutes in web.ROLLUP_WINDOWS}
+        return summary
@@ -0,0 +1,377 @@
+from array import array
+import math
+
+from classes import ContentCheck as cc
+from classes import WebChecker as wc
+
+
+class ResponseHistory(object):
+    """
+    A fixed size ring buffer that stores the responses of a web in typed arrays.
+
+    Each response is stored in columns (timestamp, status code, response time, availability, reason of a failed
+    content check and optionally seconds of each phase and queue wait) so the memory used by one web is allocated once
+    and never grows. When the buffer is full the oldest response is overwritten. The timings columns take more memory
+    than the rest together, so they are only allocated if they are requested.
+
+    Every stored response gets a sequence number that increases with each insert, so other objects can keep a
+    reference to a response and know if it was already overwritten.
+
+    Attributes
+    ----------
+    _capacity : int
+        Max number of responses stored
+    _timestamps : array
+        Timestamp of each response
+    _status_codes : array
+        Status code of each response. 0 if the web didn't respond
+    _response_times : array
+        Response time in seconds of each response
+    _available : array
+        1 if the web was available, 0 if not
+    _phases : list
+        Seconds of each phase of WebChecker.PHASES, one array per phase. NaN if the response has no phases. None if
+        the timings are not stored
+    _queue_waits : array
+        Seconds the check waited before the request was sent. NaN if it's unknown. None if the timings are not stored
+    _reasons : array
+        Position in ContentCheck.REASONS plus one of the reason of each response. 0 if it has no reason
+    _next_sequence : int
+        Sequence number that the next response will get
+    _first_sequence : int
+        Sequence number of the first response stored. Not 0 if older responses were not loaded
+
+    Methods
+    -------
+    """
+
+    NO_STATUS_CODE = 0
+
+    # Code stored for each reason of ContentCheck.REASONS. 0 = no reason
+    REASON_CODES = {reason: code for code, reason in enumerate(cc.ContentCheck.REASONS, 1)}
+
+    def __init__(self, capacity, timings=False):
+        """
+        Parameters
+        ----------
+        capacity : int
+            Max number of responses stored
+        timings : bool
+            Store the seconds of the phases and the queue wait of each response
+        """
+        self._capacity = max(1, int(capacity))
+        self._timestamps = array('d', [0.0]) * self._capacity
+        self._status_codes = array('H', [0]) * self._capacity
+        self._response_times = array('d', [0.0]) * self._capacity
+        self._available = array('b', [0]) * self._capacity
+        self._phases = None
+        self._queue_waits = None
+        if timings:
+            self._phases = [array('f', [math.nan]) * self._capacity for _ in wc.WebChecker.PHASES]
+            self._queue_waits = array('f', [math.nan]) * self._capacity
+        self._reasons = array('B', [0]) * self._capacity
+        self._next_sequence = 0
+        self._first_sequence = 0
+
+    def __len__(self):
+        return min(self._next_sequence - self._first_sequence, self._capacity)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def next_sequence(self):
+        return self._next_sequence
+
+    @property
+    def oldest_sequence(self):
+        return self._next_sequence - len(self)
+
+    def append(self, response):
+        """Store a response overwriting the oldest one if the buffer is full
+
+        Parameters
+        ----------
+        response : dict
+            Web data response
+
+        Returns
+        -------
+        sequence : int
+            Sequence number of the stored response
+        """
+        sequence = self._next_sequence
+        position = sequence % self._capacity
+        self._timestamps[position] = response['timestamp']
+        self._status_codes[position] = response.get('status_code', self.NO_STATUS_CODE)
+        self._response_times[position] = response.get('response_time', 0.0)
+        self._available[position] = 1 if response['available'] else 0
+        if self._phases is not None:
+            phases = response.get('phases')
+            for index, phase in enumerate(wc.WebChecker.PHASES):
+                self._phases[index][position] = phases[phase] if phases else math.nan
+            self._queue_waits[position] = response.get('queue_wait', math.nan)
+        self._reasons[position] = self.REASON_CODES.get(response.get('reason'), 0)
+        self._next_sequence += 1
+
+        return sequence
+
+    def load(self, timestamps, status_codes, response_times, available, skipped=0):
+        """Store many responses at once in an empty buffer, from the columns of the fields saved by ResultStore
+
+        If there are more responses than the capacity only the newest ones are kept. The sequence numbers start
+        after the responses that were not loaded, so the history is not seen as complete
+
+        Parameters
+        ----------
+        timestamps : list
+            Timestamp of each response, ordered by time
+        status_codes : list
+            Status code of each response. NO_STATUS_CODE if the web didn't respond
+        response_times : list
+            Response time of each response
+        available : list
+            1 if the web was available, 0 if not
+        skipped : int
+            Number of older responses of the web that are not loaded
+
+        Returns
+        -------
+        sequences : range
+            Sequence numbers of the stored responses
+
+        Raises
+        ------
+        ValueError
+            If the buffer is not empty
+        """
+        if self._next_sequence:
+            raise ValueError("The responses can only be loaded in an empty buffer")
+        total = skipped + len(timestamps)
+        count = min(len(timestamps), self._capacity)
+        first = len(timestamps) - count
+        start = (total - count) % self._capacity
+        head = min(count, self._capacity - start)  # The rest goes around the end of the buffer
+        for column, values in ((self._timestamps, timestamps), (self._status_codes, status_codes),
+                               (self._response_times, response_times), (self._available, available)):
+            column[start:start + head] = array(column.typecode, values[first:first + head])
+            column[:count - head] = array(column.typecode, values[first + head:])
+        self._first_sequence = total - count
+        self._next_sequence = total
+
+        return range(total - count, total)
+
+    def columns(self, sequences):
+        """Status codes, response times and availability of consecutive responses
+
+        Parameters
+        ----------
+        sequences : range
+            Consecutive sequence numbers of stored responses, older first
+
+        Returns
+        -------
+        columns : tuple
+            List of the status codes, list of the response times and list of the availability (1 or 0)
+        """
+        return tuple(self.__slice(column, sequences)
+                     for column in (self._status_codes, self._response_times, self._available))
+
+    def __slice(self, column, sequences):
+        """Values of a column for consecutive responses, that can go around the end of the buffer
+
+        Parameters
+        ----------
+        column : array
+            Column of the buffer
+        sequences : range
+            Consecutive sequence numbers, older first
+
+        Returns
+        -------
+        values : list
+        """
+        if not sequences:
+            return []
+        start = sequences.start % self._capacity
+        end = start + len(sequences)
+        if end <= self._capacity:
+            return column[start:end].tolist()
+        return column[start:].tolist() + column[:end - self._capacity].tolist()
+
+    def contains(self, sequence):
+        """Check if the response with the sequence number is still stored
+
+        Parameters
+        ----------
+        sequence : int
+            Sequence number of the response
+
+        Returns
+        -------
+        contains : bool
+        """
+        return self.oldest_sequence <= sequence < self._next_sequence
+
+    def timestamp(self, sequence):
+        return self._timestamps[sequence % self._capacity]
+
+    def status_code(self, sequence):
+        return self._status_codes[sequence % self._capacity]
+
+    def response_time(self, sequence):
+        return self._response_times[sequence % self._capacity]
+
+    def available(self, sequence):
+        return self._available[sequence % self._capacity] == 1
+
+    def queue_wait(self, sequence):
+        """Seconds the check of a response waited before the request was sent
+
+        Parameters
+        ----------
+        sequence : int
+            Sequence number of the response
+
+        Returns
+        -------
+        queue_wait : float
+            None if it's unknown or the timings are not stored
+        """
+        if self._queue_waits is None:
+            return None
+        queue_wait = self._queue_waits[sequence % self._capacity]
+        return None if math.isnan(queue_wait) else queue_wait
+
+    def reason(self, sequence):
+        """Reason of the failed content check of a response
+
+        Parameters
+        ----------
+        sequence : int
+            Sequence number of the response
+
+        Returns
+        -------
+        reason : str
+            One of ContentCheck.REASONS. None if the response has no reason
+        """
+        code = self._reasons[sequence % self._capacity]
+        return cc.ContentCheck.REASONS[code - 1] if code else None
+
+    def phases(self, sequence):
+        """Seconds of each phase of a response
+
+        Parameters
+        ----------
+        sequence : int
+            Sequence number of the response
+
+        Returns
+        -------
+        phases : tuple
+            Seconds of each phase of WebChecker.PHASES. None if the response has no phases or the timings are not stored
+        """
+        position = sequence % self._capacity
+        if self._phases is None or math.isnan(self._phases[0][position]):
+            return None
+        return tuple(column[position] for column in self._phases)
+
+    def get(self, sequence):
+        """Rebuild the response dict with the same format that WebChecker returns
+
+        Parameters
+        ----------
+        sequence : int
+            Sequence number of the response
+
+        Returns
+        -------
+        response : dict
+            Web data response
+        """
+        position = sequence % self._capacity
+        response = {
+            'available': self._available[position] == 1,
+            'timestamp': self._timestamps[position]
+        }
+        queue_wait = self.queue_wait(sequence)
+        if queue_wait is not None:
+            response['queue_wait'] = queue_wait
+        if self._status_codes[position] != self.NO_STATUS_CODE:  # Web responded
+            response['status_code'] = self._status_codes[position]
+            response['response_time'] = self._response_times[position]
+            phases = self.phases(sequence)
+            if phases is not None:
+                response['phases'] = dict(zip(wc.WebChecker.PHASES, phases))
+            reason = self.reason(sequence)
+            if reason is not None:
+                response['reason'] = reason
+
+        return response
+
+    def sequences_from_time(self, from_timestamp):
+        """Sequence numbers of the responses newer than the timestamp, newer first
+
+        Parameters
+        ----------
+        from_timestamp : float
+            Responses older time
+
+        Returns
+        -------
+        sequences : range
+            Sequence numbers ordered by newer response
+        """
+        oldest = self.oldest_sequence
+        sequence = self._next_sequence - 1
+        # Responses are inserted in time order, so we stop at the first response older than the time
+        while sequence >= oldest and self._timestamps[sequence % self._capacity] > from_timestamp:
+            sequence -= 1
+
+        return range(self._next_sequence - 1, sequence, -1)
+
+    def sequences_between(self, from_timestamp, until):
+        """Sequence numbers of the responses newer than a timestamp and older than other, older first
+
+        The first and the last ones are found with binary searches, so the other responses are not visited
+
+        Parameters
+        ----------
+        from_timestamp : float
+            Responses older time, not included
+        until : float
+            Responses newer time, not included
+
+        Returns
+        -------
+        sequences : range
+            Sequence numbers ordered by older response
+        """
+        first = self.__search(self.oldest_sequence, lambda timestamp: timestamp > from_timestamp)
+        return range(first, self.__search(first, lambda timestamp: timestamp >= until))
+
+    def __search(self, low, after):
+        """Binary search of the first response whose timestamp is after a time. Responses are inserted in time order
+
+        Parameters
+        ----------
+        low : int
+            Sequence number where the search starts
+        after : callable
+            Returns if a timestamp is after the time
+
+        Returns
+        -------
+        sequence : int
+            Sequence number of the first response after the time. next_sequence if there is none
+        """
+        high = self._next_sequence
+        while low < high:
+            middle = (low + high) // 2
+            if after(self._timestamps[middle % self._capacity]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
@@ -0,0 +1,256 @@
+from threading import Lock, Thread
+import logging
+import math
+import queue
+import sqlite3
+import time
+
+from classes import LatencyHistogram as lh
+
+
+class ResultStore(object):
+    """
+    A class that saves the responses of all the webs in a SQLite database.
+
+    The responses are put in a queue and a writer thread saves them in batches, so the checks never wait for the
+    disk. The database uses WAL mode, so the reads are not blocked by the writer.
+
+    Attributes
+    ----------
+    path : str
+        Path of the database file
+    retention_days : float
+        Days of responses kept in the database
+    log : LogRecord
+        log object
+    _queue : queue.Queue
+        Responses waiting to be saved
+    _read_connection : sqlite3.Connection
+        Connection used for the queries
+    _read_lock : Lock
+        Lock for the read connection, that is shared by all the threads
+    _writer : Thread
+        Thread that saves the responses
+
+    Methods
+    -------
+    """
+
+    # Max responses saved in one transaction
+    BATCH_SIZE = 1000
+    # Max seconds a response waits in the queue
+    FLUSH_INTERVAL = 0.5
+    # Seconds between the deletions of the old responses
+    COMPACT_INTERVAL = 3600
+
+    def __init__(self, path, retention_days=7):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the database file
+        retention_days : float
+            Days of responses kept in the database
+        """
+        self.path = path
+        self.retention_days = retention_days
+        self.log = logging.getLogger("Monitor")
+        self._queue = queue.Queue()
+        self.__create_schema()
+        self._read_connection = self.__connect()
+        self._read_lock = Lock()
+        self._writer = Thread(target=self.__write, daemon=True)
+        self._writer.start()
+
+    def __connect(self):
+        """Open a connection to the database
+
+        Returns
+        -------
+        connection : sqlite3.Connection
+        """
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def __create_schema(self):
+        """Create the responses table and its index if they don't exist
+        """
+        connection = self.__connect()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS responses ("
+                               "web TEXT NOT NULL, "
+                               "timestamp REAL NOT NULL, "
+                               "available INTEGER NOT NULL, "
+                               "status_code INTEGER, "
+                               "response_time REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_web_timestamp ON responses (web, timestamp)")
+        connection.close()
+
+    def add(self, web_name, response):
+        """Queue a response to be saved
+
+        Parameters
+        ----------
+        web_name : str
+            Name of the web
+        response : dict
+            Web data response
+        """
+        self._queue.put((web_name, response['timestamp'], 1 if response['available'] else 0,
+                         response.get('status_code'), response.get('response_time')))
+
+    def close(self):
+        """Save the queued responses and stop the writer thread
+        """
+        self._queue.put(None)
+        self._writer.join()
+        self._read_connection.close()
+
+    def __write(self):
+        """Infinite loop that saves the queued responses in batches and deletes the old ones
+        """
+        connection = self.__connect()
+        last_compact = 0.0
+        finished = False
+        while not finished:
+            batch = [self._queue.get()]  # Wait for the first response
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:  # Collect responses until the batch is full or the time is over
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            if None in batch:  # Close requested
+                finished = True
+                batch = [row for row in batch if row is not None]
+
+            try:
+                with connection:
+                    connection.executemany("INSERT INTO responses VALUES (?, ?, ?, ?, ?)", batch)
+                    if time.monotonic() - last_compact > self.COMPACT_INTERVAL:
+                        connection.execute("DELETE FROM responses WHERE timestamp < ?",
+                                           (time.time() - self.retention_days * 86400,))
+                        last_compact = time.monotonic()
+            except sqlite3.Error:
+                self.log.exception("Could not save {} responses".format(len(batch)))
+
+        connection.close()
+
+    def load(self, web_name, from_timestamp):
+        """Get the responses of a web newer than the timestamp, as columns so they can be loaded in bulk
+
+        Parameters
+        ----------
+        web_name : str
+            Name of the web
+        from_timestamp : float
+            Responses older time
+
+        Returns
+        -------
+        columns : tuple
+            Lists of the timestamps, the status codes (0 if the web didn't respond), the response times and the
+            availability (1 or 0) of the responses ordered by time. Empty lists if there are no responses
+        """
+        with self._read_lock:
+            rows = self._read_connection.execute("SELECT timestamp, COALESCE(status_code, 0), "
+                                                 "COALESCE(response_time, 0.0), available "
+                                                 "FROM responses WHERE web = ? AND timestamp > ? ORDER BY timestamp",
+                                                 (web_name, from_timestamp)).fetchall()
+
+        return tuple(list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+
+    def count(self, web_name, until):
+        """Number of responses of a web older than the timestamp
+
+        Parameters
+        ----------
+        web_name : str
+            Name of the web
+        until : float
+            Responses newer time, included
+
+        Returns
+        -------
+        count : int
+        """
+        with self._read_lock:
+            return self._read_connection.execute("SELECT COUNT(*) FROM responses WHERE web = ? AND timestamp <= ?",
+                                                 (web_name, until)).fetchone()[0]
+
+    def rollups(self, web_name, from_timestamp, seconds):
+        """Summary of the responses of a web in time buckets, to fill a RollupTier
+
+        Parameters
+        ----------
+        web_name : str
+            Name of the web
+        from_timestamp : float
+            Start of the first bucket, included
+        seconds : int
+            Size of each bucket in seconds
+
+        Returns
+        -------
+        buckets : list
+            Start, count, not available count, sum, min and max of the response times of the available responses and
+            dict with the count of the status codes of the not available responses of each bucket, ordered by start
+        """
+        with self._read_lock:
+            rows = self._read_connection.execute(
+                "SELECT CAST(timestamp / ? AS INTEGER) AS bucket, COUNT(*), COUNT(*) - SUM(available), "
+                "TOTAL(CASE WHEN available = 1 THEN response_time END), "
+                "MIN(CASE WHEN available = 1 THEN response_time END), "
+                "MAX(CASE WHEN available = 1 THEN response_time END) "
+                "FROM responses WHERE web = ? AND timestamp >= ? GROUP BY bucket ORDER BY bucket",
+                (seconds, web_name, from_timestamp)).fetchall()
+            codes = {}
+            for bucket, status_code, codes_count in self._read_connection.execute(
+                    "SELECT CAST(timestamp / ? AS INTEGER) AS bucket, status_code, COUNT(*) FROM responses "
+                    "WHERE web = ? AND timestamp >= ? AND available = 0 AND status_code IS NOT NULL "
+                    "GROUP BY bucket, status_code",
+                    (seconds, web_name, from_timestamp)):
+                codes.setdefault(bucket, {})[status_code] = codes_count
+
+        return [(bucket * seconds, count, failures, total_seconds, math.inf if minimum is None else minimum,
+                 0.0 if maximum is None else maximum, codes.get(bucket, {}))
+                for bucket, count, failures, total_seconds, minimum, maximum in rows]
+
+    def stats(self, web_name, from_timestamp):
+        """Count of responses, not available responses, response times and response codes of a web
+
+        Parameters
+        ----------
+        web_name : str
+            Name of the web
+        from_timestamp : float
+            Responses older time
+
+        Returns
+        -------
+        stats : tuple
+            Number of responses, number of not available responses, sum of the response times of the available
+            responses, dict with the count of each status code of the available responses and LatencyHistogram of
+            the response times of the available responses
+        """
+        histogram = lh.LatencyHistogram()
+        with self._read_lock:
+            count, not_available = self._read_connection.execute(
+                "SELECT COUNT(*), COUNT(*) - COALESCE(SUM(available), 0) FROM responses "
+                "WHERE web = ? AND timestamp > ?",
+                (web_name, from_timestamp)).fetchone()
+            rows = self._read_connection.execute(
+                "SELECT status_code, COUNT(*), SUM(response_time) FROM responses "
+                "WHERE web = ? AND timestamp > ? AND available = 1 GROUP BY status_code",
+                (web_name, from_timestamp)).fetchall()
+            for response_time, in self._read_connection.execute(
+                    "SELECT response_time FROM responses WHERE web = ? AND timestamp > ? AND available = 1",
+                    (web_name, from_timestamp)):
+                histogram.add(response_time)
+
+        response_codes = {status_code: codes_count for status_code, codes_count, _ in rows}
+        total_seconds = sum(seconds for _, _, seconds in rows)
+        return count, not_available, total_seconds, response_codes, histogram
@@ -0,0 +1,227 @@
+from array import array
+import bisect
+import itertools
+import math
+
+
+class RollupTier(object):
+    """
+    A fixed size ring of time buckets with the summary of the responses of each bucket.
+
+    Each bucket keeps the number of responses, the not available ones, the sum, min and max of the response times of
+    the available responses and the count of the other status codes. The available responses are the 200 ones, so
+    their code is not counted again. Old buckets are overwritten, so the memory is fixed.
+
+    Attributes
+    ----------
+    seconds : int
+        Size of each bucket in seconds
+    capacity : int
+        Number of buckets kept
+    _starts : array
+        Start timestamp of each bucket. -1 if the bucket was never used
+    _counts : array
+        Number of responses of each bucket
+    _failures : array
+        Number of not available responses of each bucket
+    _sums : array
+        Sum of the response times of the available responses of each bucket
+    _mins : array
+        Min response time of each bucket
+    _maxs : array
+        Max response time of each bucket
+    _codes : list
+        Count of the status codes that are not 200 of each bucket. None if there are none
+    _first : float
+        Start of the first bucket ever used. None if there are no responses
+
+    Methods
+    -------
+    """
+
+    def __init__(self, seconds, capacity):
+        """
+        Parameters
+        ----------
+        seconds : int
+            Size of each bucket in seconds
+        capacity : int
+            Number of buckets kept
+        """
+        self.seconds = seconds
+        self.capacity = capacity
+        self._starts = array('d', [-1.0]) * capacity
+        self._counts = array('I', [0]) * capacity
+        self._failures = array('I', [0]) * capacity
+        self._sums = array('d', [0.0]) * capacity
+        self._mins = array('f', [math.inf]) * capacity
+        self._maxs = array('f', [0.0]) * capacity
+        self._codes = [None] * capacity
+        self._first = None
+
+    def align(self, timestamp):
+        """Start of the bucket of a timestamp
+
+        Parameters
+        ----------
+        timestamp : float
+
+        Returns
+        -------
+        start : float
+        """
+        return math.floor(timestamp / self.seconds) * self.seconds
+
+    def add(self, response):
+        """Add a response to its bucket
+
+        Parameters
+        ----------
+        response : dict
+            Web data response
+        """
+        start = self.align(response['timestamp'])
+        position = int(start // self.seconds) % self.capacity
+        if self._starts[position] != start:
+            if self._starts[position] > start:  # Older than the bucket that took its place
+                return
+            self._starts[position] = start
+            self._counts[position] = 0
+            self._failures[position] = 0
+            self._sums[position] = 0.0
+            self._mins[position] = math.inf
+            self._maxs[position] = 0.0
+            self._codes[position] = None
+            if self._first is None:
+                self._first = start
+
+        self._counts[position] += 1
+        if response['available']:
+            response_time = response['response_time']
+            self._sums[position] += response_time
+            self._mins[position] = min(self._mins[position], response_time)
+            self._maxs[position] = max(self._maxs[position], response_time)
+        else:
+            self._failures[position] += 1
+            status_code = response.get('status_code')
+            if status_code is not None:
+                if self._codes[position] is None:
+                    self._codes[position] = {}
+                self._codes[position][status_code] = self._codes[position].get(status_code, 0) + 1
+
+    def load(self, timestamps, status_codes, response_times, available):
+        """Add many responses at once, from the columns of the fields saved by ResultStore, to a tier with no
+        responses
+
+        Each bucket is summarized from its slice of the columns, so the work is done once per bucket
+
+        Parameters
+        ----------
+        timestamps : list
+            Timestamp of each response, ordered by time
+        status_codes : list
+            Status code of each response. 0 if the web didn't respond
+        response_times : list
+            Response time of each response
+        available : list
+            1 if the web was available, 0 if not
+        """
+        first = 0
+        while first < len(timestamps):
+            start = self.align(timestamps[first])
+            end = bisect.bisect_left(timestamps, start + self.seconds, first)
+            times = list(itertools.compress(response_times[first:end], available[first:end]))
+            codes = {}
+            for status_code, is_available in zip(status_codes[first:end], available[first:end]):
+                if not is_available and status_code:
+                    codes[status_code] = codes.get(status_code, 0) + 1
+            self.__set_bucket(start, end - first, end - first - len(times), sum(times), min(times, default=math.inf),
+                              max(times, default=0.0), codes)
+            first = end
+
+    def load_buckets(self, buckets):
+        """Fill a tier with no responses with the summary of each bucket, calculated by ResultStore
+
+        Parameters
+        ----------
+        buckets : list
+            Start, count, not available count, sum, min and max of the response times of the available responses and
+            dict with the count of the status codes of the not available responses of each bucket, ordered by start
+        """
+        for start, count, failures, total_seconds, minimum, maximum, codes in buckets:
+            self.__set_bucket(start, count, failures, total_seconds, minimum, maximum, codes)
+
+    def __set_bucket(self, start, count, failures, total_seconds, minimum, maximum, codes):
+        """Replace the summary of the bucket of a start
+
+        Parameters
+        ----------
+        start : float
+            Start of the bucket
+        count : int
+            Number of responses
+        failures : int
+            Number of not available responses
+        total_seconds : float
+            Sum of the response times of the available responses
+        minimum : float
+            Min response time. inf if there are no available responses
+        maximum : float
+            Max response time. 0 if there are no available responses
+        codes : dict
+            Count of the status codes of the not available responses
+        """
+        position = int(start // self.seconds) % self.capacity
+        self._starts[position] = start
+        self._counts[position] = count
+        self._failures[position] = failures
+        self._sums[position] = total_seconds
+        self._mins[position] = minimum
+        self._maxs[position] = maximum
+        self._codes[position] = codes or None
+        if self._first is None:
+            self._first = start
+
+    def covers(self, timestamp, now):
+        """Check if the buckets still have all the responses since the timestamp
+
+        Parameters
+        ----------
+        timestamp : float
+        now : float
+            Actual timestamp
+
+        Returns
+        -------
+        covers : bool
+        """
+        oldest = self.align(now) - (self.capacity - 1) * self.seconds
+        return self.align(timestamp) >= oldest or (self._first is not None and self._first >= oldest)
+
+    def collect(self, totals, from_start, until, now):
+        """Add the buckets that start between two timestamps to the totals
+
+        Parameters
+        ----------
+        totals : dict
+            count, failures, total_seconds, min, max and codes that are updated
+        from_start : float
+            Start of the first bucket, included
+        until : float
+            Buckets that start at this timestamp or later are not added
+        now : float
+            Actual timestamp
+        """
+        start = max(from_start, self.align(now) - (self.capacity - 1) * self.seconds)
+        while start < until and start <= now:
+            position = int(start // self.seconds) % self.capacity
+            if self._starts[position] == start:
+                totals['count'] += self._counts[position]
+                totals['failures'] += self._failures[position]
+                totals['total_seconds'] += self._sums[position]
+                if self._counts[position] > self._failures[position]:
+                    totals['min'] = min(totals['min'], self._mins[position])
+                    totals['max'] = max(totals['max'], self._maxs[position])
+                for status_code, count in (self._codes[position] or {}).items():
+                    totals['codes'][status_code] = totals['codes'].get(status_code, 0) + count
+            start += self.seconds
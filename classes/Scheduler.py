@@ -0,0 +1,318 @@
+from threading import Condition, Thread
+import heapq
+import itertools
+import random
+import time
+
+
+class Scheduler(object):
+    """
+    A class that knows when each web has to be checked.
+
+    Keeps a priority queue with the next due time of each web. The next due time is calculated from the previous due
+    time and not from the end of the request, so the checks don't drift with the response time of the webs.
+
+    Attributes
+    ----------
+    _heap : list
+        Priority queue of entries [due time, order, web, active]
+    _entries : dict
+        Active entry of each web
+    _calls : list
+        Priority queue of the calls that are done once [due time, order, function, arguments]
+    _condition : Condition
+        Condition used to wake up the scheduler thread when the queue changes
+    _jitter : bool
+        If true, the first check of each web is delayed a random time up to its interval
+    _order : itertools.count
+        Tie breaker for the entries with the same due time
+    _lag_total : float
+        Sum of the seconds between the due time and the dispatch time since the last stats
+    _lag_max : float
+        Max seconds between the due time and the dispatch time since the last stats
+    _dispatched : int
+        Checks dispatched since the last stats
+    _missed : int
+        Checks that were not dispatched because the scheduler was late more than an interval
+    _last_dispatch : dict
+        Monotonic time of the last dispatch of each web and the interval it was scheduled with
+    _intervals : int
+        Intervals between two dispatches of the same web since the last stats
+    _interval_total : float
+        Sum of the seconds between two dispatches of the same web since the last stats
+    _target_total : float
+        Sum of the intervals the same dispatches were scheduled with, adapted by the webs to their responses
+
+    Methods
+    -------
+    """
+
+    def __init__(self, jitter=True):
+        """
+        Parameters
+        ----------
+        jitter : bool
+            If true, the first check of each web is delayed a random time up to its interval
+        """
+        self._heap = []
+        self._entries = {}
+        self._calls = []
+        self._condition = Condition()
+        self._jitter = jitter
+        self._order = itertools.count()
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._dispatched = 0
+        self._missed = 0
+        self._last_dispatch = {}
+        self._intervals = 0
+        self._interval_total = 0.0
+        self._target_total = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, web):
+        return web in self._entries
+
+    @staticmethod
+    def interval(web):
+        """Seconds between two checks of the web, adapted by the web to its last responses
+
+        Parameters
+        ----------
+        web : Object
+            Web object
+
+        Returns
+        -------
+        interval : float
+        """
+        return max(web.next_interval, 0.001)
+
+    def add(self, web, delay=None):
+        """Add a web to the queue
+
+        Parameters
+        ----------
+        web : Object
+            Web object that will be checked
+        delay : float
+            Seconds until the first check. If it's not set, the interval with the jitter
+        """
+        if delay is None:
+            interval = self.interval(web)
+            delay = random.uniform(0, interval) if self._jitter else interval
+
+        with self._condition:
+            self.__push(web, delay)
+
+    def __push(self, web, delay):
+        """Replace the entry of the web with a new one and wake up the scheduler thread
+
+        Parameters
+        ----------
+        web : Object
+            Web object
+        delay : float
+            Seconds until the next check
+        """
+        self.__remove(web)
+        entry = [time.monotonic() + delay, next(self._order), web, True]
+        self._entries[web] = entry
+        heapq.heappush(self._heap, entry)
+        self._condition.notify()
+
+    def reschedule(self, web, delay):
+        """Change the next check of a web, if it's still in the queue
+
+        Parameters
+        ----------
+        web : Object
+            Web object
+        delay : float
+            Seconds until the next check
+        """
+        with self._condition:
+            if web in self._entries:  # Not removed while it was checked
+                self.__push(web, delay)
+
+    def call_later(self, delay, function, *args):
+        """Call a function once from the scheduler thread, after the checks that are due before it
+
+        Parameters
+        ----------
+        delay : float
+            Seconds until the call
+        function : callable
+            Function that is called. Must not block
+        args : tuple
+            Arguments of the function
+        """
+        with self._condition:
+            heapq.heappush(self._calls, [time.monotonic() + delay, next(self._order), function, args])
+            self._condition.notify()
+
+    def __pop_calls(self, now):
+        """Get the calls that have to be done
+
+        Parameters
+        ----------
+        now : float
+            Actual monotonic time
+
+        Returns
+        -------
+        calls : list
+            Function and arguments of each call
+        """
+        calls = []
+        with self._condition:
+            while self._calls and self._calls[0][0] <= now:
+                _, _, function, args = heapq.heappop(self._calls)
+                calls.append((function, args))
+        return calls
+
+    def remove(self, web):
+        """Remove a web from the queue
+
+        Parameters
+        ----------
+        web : Object
+            Web object that won't be checked anymore
+        """
+        with self._condition:
+            self.__remove(web)
+
+    def __remove(self, web):
+        """Mark the entry of the web as not active, it will be discarded when it arrives to the top of the queue
+
+        Parameters
+        ----------
+        web : Object
+            Web object
+        """
+        entry = self._entries.pop(web, None)
+        if entry is not None:
+            entry[-1] = False
+        self._last_dispatch.pop(web, None)
+
+    def pop_due(self, now=None):
+        """Get the webs that have to be checked and schedule their next check
+
+        Parameters
+        ----------
+        now : float
+            Actual monotonic time. Current time if it's not set
+
+        Returns
+        -------
+        due_webs : list
+            Webs that have to be checked now
+        wait : float
+            Seconds until the next check. None if the queue is empty
+        """
+        now = time.monotonic() if now is None else now
+        due_webs = []
+        with self._condition:
+            while self._heap and (not self._heap[0][-1] or self._heap[0][0] <= now):
+                entry = heapq.heappop(self._heap)
+                due, _, web, active = entry
+                if not active:  # Removed web
+                    continue
+
+                lag = now - due
+                self._lag_total += lag
+                self._lag_max = max(self._lag_max, lag)
+                self._dispatched += 1
+                due_webs.append(web)
+                last = self._last_dispatch.get(web)
+                if last is not None:  # Interval achieved, to compare with the one it was scheduled with
+                    self._intervals += 1
+                    self._interval_total += now - last[0]
+                    self._target_total += last[1]
+                interval = self.interval(web)
+                self._last_dispatch[web] = (now, interval)
+
+                # Next due time from the previous one, skipping the checks that we are late for
+                missed = int(lag // interval)
+                self._missed += missed
+                entry[0] = due + (missed + 1) * interval
+                entry[1] = next(self._order)
+                heapq.heappush(self._heap, entry)
+
+            wait = None
+            if self._heap:
+                wait = max(0.0, self._heap[0][0] - now)
+
+        return due_webs, wait
+
+    def lag_stats(self, reset=True):
+        """Scheduling lag since the last call
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Number of webs scheduled, checks dispatched, missed checks, average and max lag in seconds and average of
+            the intervals achieved and of the target ones
+        """
+        with self._condition:
+            stats = {
+                'scheduled': len(self._entries),
+                'dispatched': self._dispatched,
+                'missed': self._missed,
+                'lag_avg': round(self._lag_total / self._dispatched, 4) if self._dispatched else 0.0,
+                'lag_max': round(self._lag_max, 4),
+                'interval_avg': round(self._interval_total / self._intervals, 3) if self._intervals else 0.0,
+                'target_avg': round(self._target_total / self._intervals, 3) if self._intervals else 0.0
+            }
+            if reset:
+                self._lag_total = 0.0
+                self._lag_max = 0.0
+                self._dispatched = 0
+                self._missed = 0
+                self._intervals = 0
+                self._interval_total = 0.0
+                self._target_total = 0.0
+
+        return stats
+
+    def start(self, dispatch):
+        """Starts the thread that dispatches the checks
+
+        Parameters
+        ----------
+        dispatch : callable
+            Function called with each web when it has to be checked. Must not block
+        """
+        scheduler_thread = Thread(target=self.__run, args=(dispatch,), daemon=True)
+        scheduler_thread.start()
+
+    def __run(self, dispatch):
+        """Infinite loop that waits for the next due time and dispatches the checks
+
+        Parameters
+        ----------
+        dispatch : callable
+            Function called with each web when it has to be checked
+        """
+        while True:
+            now = time.monotonic()
+            due_webs, _ = self.pop_due(now)
+            for web in due_webs:
+                dispatch(web)
+            for function, args in self.__pop_calls(now):
+                function(*args)
+            with self._condition:  # Sleep until the next check or call, or until a web or a call is added
+                due = [queue[0][0] for queue in (self._heap, self._calls) if queue]
+                if not due:
+                    self._condition.wait()
+                else:
+                    wait = min(due) - time.monotonic()
+                    if wait > 0:
+                        self._condition.wait(wait)
@@ -0,0 +1,151 @@
+import csv
+import json
+import logging
+import os
+
+from exceptions import config_exceptions
+from model import Web as web
+
+
+class TargetLoader(object):
+    """
+    A class that loads the webs of a targets file, for inventories too big for a section of the config file per web.
+
+    The file is a CSV with a header with the names of the parameters, or a JSON Lines file with an object per web.
+    The empty values of the CSV are not set, so the web takes the default value. The file is read as a stream and the
+    webs are validated in batches of batch_size, so only the valid parameters are kept in memory and a bad file is
+    known before the monitor starts. All the errors of the file are reported together, with the line of each one.
+
+    Attributes
+    ----------
+    path : str
+        Path of the targets file
+    batch_size : int
+        Webs validated in each batch
+    log : LogRecord
+        log object
+
+    Methods
+    -------
+    """
+
+    FORMATS = ('.csv', '.jsonl')
+
+    def __init__(self, path, batch_size=1000):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the targets file. Its extension is its format, one of FORMATS
+        batch_size : int
+            Webs validated in each batch
+        """
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.log = logging.getLogger("Monitor")
+
+    def rows(self):
+        """Read the webs of the file one by one
+
+        Yields
+        ------
+        line : int
+            Line of the web in the file
+        data : dict
+            Parameters of the web. None if the line is not a JSON object
+
+        Raises
+        ------
+        OSError
+            If the file can't be read
+        """
+        extension = os.path.splitext(self.path)[1].lower()
+        with open(self.path, newline='', encoding='utf-8') as targets:
+            if extension == '.csv':
+                reader = csv.DictReader(targets, skipinitialspace=True)
+                for row in reader:
+                    data = {key: value.strip() for key, value in row.items()
+                            if isinstance(value, str) and value.strip()}
+                    if row.get(None):  # Values without a column in the header
+                        data[None] = row[None]
+                    yield reader.line_num, data
+            else:
+                for line, text in enumerate(targets, 1):
+                    if not text.strip():
+                        continue
+                    try:
+                        data = json.loads(text)
+                    except ValueError:
+                        data = None
+                    yield line, data if isinstance(data, dict) else None
+
+    def load(self, known_names=()):
+        """Read and validate all the webs of the file
+
+        Parameters
+        ----------
+        known_names : iterable
+            Names and sections of the webs of the config file, that can't be names of the targets file
+
+        Returns
+        -------
+        webs_data : dict
+            Parameters of each web name, in the order of the file
+
+        Raises
+        ------
+        TargetsConfigError
+            If the file can't be read or any web is not valid, with all the errors of the file
+        """
+        if os.path.splitext(self.path)[1].lower() not in self.FORMATS:
+            raise config_exceptions.TargetsConfigError(
+                self.path, ["unknown format, the extension must be one of {}".format(', '.join(self.FORMATS))])
+
+        webs_data = {}
+        lines = dict.fromkeys(known_names, 0)  # Line of each name, 0 = config file
+        errors = []
+        batch = []
+        try:
+            for row in self.rows():
+                batch.append(row)
+                if len(batch) == self.batch_size:
+                    self.__validate(batch, webs_data, lines, errors)
+                    batch = []
+            self.__validate(batch, webs_data, lines, errors)
+        except (OSError, UnicodeDecodeError, csv.Error) as error:
+            errors.append(str(error))
+
+        if errors:
+            raise config_exceptions.TargetsConfigError(self.path, errors)
+        self.log.info("Loaded {} webs from {}".format(len(webs_data), self.path))
+        return webs_data
+
+    @staticmethod
+    def __validate(batch, webs_data, lines, errors):
+        """Validate a batch of webs and save the valid ones
+
+        Parameters
+        ----------
+        batch : list
+            Line and parameters of each web
+        webs_data : dict
+            Parameters of the valid webs, where the webs of the batch are added
+        lines : dict
+            Line of each name already read
+        errors : list
+            Errors of the file, where the errors of the batch are added
+        """
+        for line, data in batch:
+            if data is None:
+                errors.append("line {}: not a JSON object".format(line))
+                continue
+            web_errors = web.Web.validate(data)
+            name = data.get('name')
+            if isinstance(name, str) and name in lines:
+                where = "line {}".format(lines[name]) if lines[name] else "the config file"
+                web_errors.append("name {} is also in {}".format(name, where))
+            if web_errors:
+                errors.extend("line {}: {}".format(line, error) for error in web_errors)
+                continue
+            lines[name] = line
+            webs_data[name] = data
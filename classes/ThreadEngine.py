@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, active_count
+import time
+
+from classes import WebChecker as wc
+from classes import Engine as en
+
+
+class ThreadEngine(en.Engine):
+    """
+    A class that monitors all the webs with a pool of worker threads.
+
+    The scheduler dispatches each check at its due time to the pool, so the number of threads doesn't depend on the
+    number of webs. The workers are the max number of requests in flight. A check whose host is over its rate limit
+    waits in the scheduler until its turn and not in a worker, so the checks of the other hosts are not blocked. The
+    time a check waits for a worker and for the rate limit of its host is saved apart from the response time.
+
+    Attributes
+    ----------
+    _executor : ThreadPoolExecutor
+        Pool of threads that do the requests
+    _running : set
+        Webs with a request running or waiting
+    _limited : int
+        Checks waiting in the scheduler for the rate limit of their host
+    _lock : Lock
+        Lock for the running webs and the limited checks
+
+    Methods
+    -------
+    """
+
+    def __init__(self, webs, workers, dns_ttl=60, host_rate=0.0, host_burst=1.0):
+        """
+        Parameters
+        ----------
+        webs : list
+            Web objects that will be monitored
+        workers : int
+            Number of threads of the pool
+        dns_ttl : float
+            Max seconds a resolved host is cached
+        host_rate : float
+            Requests per second to each host. 0 = no limit
+        host_burst : float
+            Max requests sent to a host at the same moment
+        """
+        super().__init__(webs, wc.WebChecker(workers, dns_ttl), host_rate, host_burst)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Worker")
+        self._running = set()
+        self._limited = 0
+        self._lock = Lock()
+
+    def start(self):
+        """Schedules all the webs and starts the scheduler thread
+        """
+        for web in self.webs:  # Loop all the webs
+            self.scheduler.add(web)
+            self.log.info("Started monitoring for {}".format(web.name))
+        self.scheduler.start(self.__dispatch)
+
+    def __dispatch(self, web):
+        """Send the check of the web to the pool, if the previous one finished
+
+        If the host of the web is over its rate limit, the check is sent when its turn comes
+
+        Parameters
+        ----------
+        web : Object
+            Web object that will be checked
+        """
+        with self._lock:
+            if web in self._running:  # The previous request didn't finish, skip this check
+                self.log.debug("Skipped check for {}, previous request running".format(web.name))
+                return
+            self._running.add(web)
+        queued_at = time.perf_counter()
+        wait = self.limiter.reserve(web.url)
+        if wait > 0:  # Too many requests to the host
+            with self._lock:
+                self._limited += 1
+            self.scheduler.call_later(wait, self.__submit_limited, web, queued_at)
+        else:
+            self._executor.submit(self.__monitor_web, web, queued_at)
+
+    def __submit_limited(self, web, queued_at):
+        """Send to the pool a check that waited for the rate limit of its host
+
+        Parameters
+        ----------
+        web : Object
+            Web object that will be checked
+        queued_at : float
+            perf_counter time when the check was dispatched
+        """
+        with self._lock:
+            self._limited -= 1
+            if web not in self.scheduler:  # Removed while it waited
+                self._running.discard(web)
+                return
+        self._executor.submit(self.__monitor_web, web, queued_at)
+
+    def load_stats(self):
+        """Work running and waiting in the engine
+
+        Returns
+        -------
+        stats : dict
+            Threads of the process, requests in flight and checks waiting for a worker or for the rate limit
+        """
+        with self._lock:
+            running = len(self._running)
+            limited = self._limited
+        queued = min(running, self._executor._work_queue.qsize() + limited)
+        return {'threads': active_count(), 'in_flight': running - queued, 'queued': queued}
+
+    def __monitor_web(self, web, queued_at):
+        """Checks the response of the web and saves it
+
+        Parameters
+        ----------
+        web : Object
+            Web object that will be monitored
+        queued_at : float
+            perf_counter time when the check was dispatched
+        """
+        try:
+            with self.instrumentation.profiled():
+                interval = web.next_interval
+                with self.instrumentation.timer('site_status'):
+                    response_data = self.checker.site_status(web.url, web.probe, web.timeout, queued_at,
+                                                             web.content_check)
+                with self.instrumentation.timer('add_response'):
+                    web.add_response(response_data)  # Add response data
+                self.adapt_schedule(web, interval)
+                self.log.debug("Added response data for {}".format(web.name))
+        except Exception:
+            self.log.exception("Error checking {}".format(web.name))
+        finally:
+            with self._lock:
+                self._running.discard(web)
@@ -1,72 +1,329 @@
+from threading import Lock
+from urllib.parse import urlsplit
 import requests
 import datetime
+import time
+
+from classes import PooledAdapter as pa
+from classes import DnsCache as dc
 
 
 class WebChecker(object):
     """
     A class that get the response from the url.
 
+    Keeps a pooled session for each host, so the connections are reused between checks (keep-alive) and we don't pay
+    a new TCP and TLS handshake on every request. The hosts are resolved with a DNS cache.
+
+    Each response has the seconds of its phases: DNS, connect and TLS (0 if the connection was reused), TTFB (from
+    sending the request until the headers were received) and transfer (reading the body).
+
+    The body of a web with content checks is streamed and checked in chunks, so it's never kept in memory.
+
+    Attributes
+    ----------
+    _sessions : dict
+        Session for each host (scheme and netloc of the url)
+    _lock : Lock
+        Lock for creating the sessions from different threads
+    _connection_stats : ConnectionStats
+        Requests and connections opened by all the sessions
+    _pool_size : int
+        Max connections kept in the pool of each host
+    _dns_cache : DnsCache
+        Resolved hosts shared by all the sessions
+
     Methods
     -------
     """
 
-    @staticmethod
-    def site_status(url):
+    # Probe modes
+    PROBE_GET = 'get'  # Download the whole response
+    PROBE_HEAD = 'head'  # HEAD request, there is no body
+    PROBE_HEADERS = 'headers'  # GET request that stops after the headers
+    PROBE_MODES = (PROBE_GET, PROBE_HEAD, PROBE_HEADERS)
+
+    # Max bytes read from the body in headers mode to keep the connection alive. Bigger bodies close the connection
+    DRAIN_LIMIT = 64 * 1024
+
+    # Default max connections kept in the pool of each host
+    POOL_SIZE = 4
+
+    # Phases of a request
+    PHASES = ('dns', 'connect', 'tls', 'ttfb', 'transfer')
+
+    def __init__(self, pool_size=POOL_SIZE, dns_ttl=60):
+        """
+        Parameters
+        ----------
+        pool_size : int
+            Max connections kept in the pool of each host. Should be the number of requests that can run at the same
+            time, if not the connections of webs that share the host are discarded
+        dns_ttl : float
+            Max seconds a resolved host is cached
+        """
+        self._pool_size = pool_size
+        self._sessions = {}
+        self._lock = Lock()
+        self._connection_stats = pa.ConnectionStats()
+        self._dns_cache = dc.DnsCache(dns_ttl)
+
+    def __session(self, url):
+        """Get the session of the host of the url, creating it if it doesn't exist
+
+        Parameters
+        ----------
+        url : str
+            Url for doing the request
+
+        Returns
+        -------
+        session : requests.Session
+        """
+        parts = urlsplit(url)
+        host = "{}://{}".format(parts.scheme, parts.netloc)
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = pa.PooledAdapter(self._connection_stats, self._dns_cache, pool_connections=1,
+                                               pool_maxsize=self._pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._sessions[host] = session
+
+        return session
+
+    def site_status(self, url, probe=PROBE_GET, timeout=1.0, queued_at=None, content=None):
         """Retrieve web response
 
         Parameters
         ----------
         url : str
             Url for doing the request
+        probe : str
+            Probe mode, one of PROBE_MODES
+        timeout : float
+            Max seconds waiting for the connection and for each read
+        queued_at : float
+            perf_counter time when the check was queued. If it's set the response has the seconds it waited
+        content : ContentCheck
+            Content checks of the body. None if the body is not checked. Only with PROBE_GET
 
         Returns
         -------
         extracted_data : dict
-            Availability, status code, response time and actual time
+            Availability, status code, response time, phases, queue wait, reason of a failed content check and actual
+            time
         """
+        session = self.__session(url)
+        self._connection_stats.start_request()
+        start = time.perf_counter()
+        reason = None
         try:
-            web_response = requests.get(url, timeout=1)
-            extracted_data = WebChecker.__transform_response(web_response)
-        except (requests.ConnectionError, requests.Timeout):
-            extracted_data = WebChecker.__site_down_response()
+            if content is not None:
+                web_response = session.get(url, timeout=timeout, stream=True)
+                reason = self.__check_content(web_response, content)
+            elif probe == self.PROBE_HEAD:
+                web_response = session.head(url, timeout=timeout, allow_redirects=True)
+            elif probe == self.PROBE_HEADERS:
+                web_response = session.get(url, timeout=timeout, stream=True)
+                self.__release(web_response)
+            else:
+                web_response = session.get(url, timeout=timeout)
+            total_seconds = time.perf_counter() - start
+            extracted_data = WebChecker.__transform_response(web_response, reason)
+            extracted_data['phases'] = self.phases(self._connection_stats.request_phases(),
+                                                   extracted_data['response_time'], total_seconds)
+        except requests.Timeout:
+            extracted_data = WebChecker.site_down_response(timeout=True)
+        except requests.ConnectionError:
+            extracted_data = WebChecker.site_down_response()
+        except requests.RequestException:  # The body was cut or can't be decoded
+            extracted_data = WebChecker.site_down_response()
+        if queued_at is not None:
+            extracted_data['queue_wait'] = start - queued_at
 
         return extracted_data
 
     @staticmethod
-    def __transform_response(response):
+    def phases(connection_phases, response_time, total_seconds):
+        """Seconds of each phase of a request
+
+        Parameters
+        ----------
+        connection_phases : dict
+            Seconds of DNS, connect and TLS
+        response_time : float
+            Seconds from the start of the request until the headers were received
+        total_seconds : float
+            Seconds from the start of the request until the body was read
+
+        Returns
+        -------
+        phases : dict
+            Seconds of each phase of PHASES
+        """
+        phases = dict(connection_phases)
+        phases['ttfb'] = max(0.0, response_time - sum(connection_phases.values()))
+        phases['transfer'] = max(0.0, total_seconds - response_time)
+        return phases
+
+    def __release(self, response):
+        """Release the connection of a streamed response without downloading a big body
+
+        Small bodies are read so the connection goes back to the pool, bigger ones close the connection
+
+        Parameters
+        ----------
+        response : requests.Response
+            Streamed response
+        """
+        read = 0
+        for chunk in response.iter_content(chunk_size=8192):
+            read += len(chunk)
+            if read > self.DRAIN_LIMIT:
+                response.close()
+                return
+
+    def __check_content(self, response, content):
+        """Check the body of a streamed response in chunks, stopping as soon as the result is known
+
+        The rest of a small body is read so the connection goes back to the pool, a bigger one or a body that is too
+        large closes the connection
+
+        Parameters
+        ----------
+        response : requests.Response
+            Streamed response
+        content : ContentCheck
+            Content checks of the body
+
+        Returns
+        -------
+        reason : str
+            Reason of the failed check, one of ContentCheck.REASONS. None if the body passed the checks or the status
+            is not 200
+        """
+        if response.status_code != 200:  # Not available anyway
+            self.__release(response)
+            return None
+        if content.too_large(response.headers):
+            response.close()
+            return content.REASON_TOO_LARGE
+
+        match = content.start()
+        for chunk in response.iter_content(chunk_size=content.CHUNK_SIZE):
+            if match.feed(chunk):
+                if match.reason == content.REASON_TOO_LARGE:
+                    response.close()
+                else:
+                    self.__release(response)
+                break
+        return match.finish()
+
+    def pool_stats(self):
+        """Stats of the connection pools of all the hosts
+
+        Returns
+        -------
+        stats : dict
+            Number of hosts, requests, new connections and percentage of requests that reused a connection
+        """
+        stats = {
+            'hosts': len(self._sessions),
+            'requests': self._connection_stats.requests,
+            'connections': self._connection_stats.connections,
+            'reuse_rate': 0.0
+        }
+        if stats['requests'] > 0:
+            stats['reuse_rate'] = round((1 - stats['connections'] / stats['requests']) * 100, 2)
+
+        return stats
+
+    def dns_stats(self):
+        """Stats of the DNS cache
+
+        Returns
+        -------
+        stats : dict
+            Number of hosts cached, hits, misses and percentage of hits
+        """
+        return self._dns_cache.stats()
+
+    @staticmethod
+    def __transform_response(response, reason=None):
         """Transform url response data
 
         Parameters
         ----------
         response : request
             Url request result
+        reason : str
+            Reason of a failed content check. None if the body passed the checks or it was not checked
+
+        Returns
+        -------
+        extracted_data : dict
+            Availability, status code, response time, reason and actual time
+        """
+        return WebChecker.site_up_response(response.status_code, response.elapsed.total_seconds(), reason)
+
+    @staticmethod
+    def site_up_response(status_code, response_time, reason=None):
+        """Url with response data
+
+        Parameters
+        ----------
+        status_code : int
+            Status code of the response
+        response_time : float
+            Seconds until the response headers were received
+        reason : str
+            Reason of a failed content check. None if the body passed the checks or it was not checked
 
         Returns
         -------
         extracted_data : dict
-            Availability, status code, response time and actual time
+            Availability, status code, response time, reason if a content check failed and actual time
         """
         available = True
-        if response.status_code != 200:  # Available is set to false if the response code is not 200
+        if status_code != 200:  # Available is set to false if the response code is not 200
             available = False
 
-        return {
+        extracted_data = {
             'available': available,
-            'status_code': response.status_code,
-            'response_time': response.elapsed.total_seconds(),
+            'status_code': status_code,
+            'response_time': response_time,
             'timestamp': datetime.datetime.now().timestamp()
         }
+        if reason is not None:  # The status is 200 but the body is not the expected one
+            extracted_data['available'] = False
+            extracted_data['reason'] = reason
+
+        return extracted_data
 
     @staticmethod
-    def __site_down_response():
+    def site_down_response(timeout=False):
         """Url without response data
 
+        Parameters
+        ----------
+        timeout : bool
+            True if the web didn't respond before the timeout
+
         Returns
         -------
         extracted_data : dict
-            Availability = False and actual time
+            Availability = False, actual time and if it was a timeout
         """
-        return {
+        extracted_data = {
             'available': False,
             'timestamp': datetime.datetime.now().timestamp()
         }
+        if timeout:
+            extracted_data['timeout'] = True
+
+        return extracted_data
@@ -0,0 +1,291 @@
+import collections
+import copy
+import itertools
+import math
+
+from classes import LatencyHistogram as lh
+from classes import WebChecker as wc
+
+
+class WindowAggregate(object):
+    """
+    A class that keeps running stats of the responses of the last minutes of a web.
+
+    The stats are updated when a response is added and when a response gets older than the window, so reading them
+    doesn't need to walk the responses.
+
+    Attributes
+    ----------
+    _history : ResponseHistory
+        Ring buffer where the responses are stored
+    _seconds : float
+        Size of the window in seconds
+    _tail : int
+        Sequence number of the oldest response inside the window
+    _count : int
+        Number of responses inside the window
+    _not_available : int
+        Number of not available responses inside the window
+    _total_seconds : float
+        Sum of the response times of the available responses
+    _response_codes : dict
+        Count of the status codes of the available responses
+    _reasons : dict
+        Count of the reasons of the not available responses that failed a content check
+    _histogram : LatencyHistogram
+        Response times of the available responses
+    _phase_count : int
+        Number of available responses that have the seconds of their phases
+    _phase_seconds : list
+        Sum of the seconds of each phase of WebChecker.PHASES of the available responses
+    _queue_wait_count : int
+        Number of responses with the seconds their check waited
+    _queue_wait_total : float
+        Sum of the seconds the checks waited before the request was sent
+
+    Methods
+    -------
+    """
+
+    # Percentiles of the response time added to the stats
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, history, minutes):
+        """
+        Parameters
+        ----------
+        history : ResponseHistory
+            Ring buffer where the responses are stored
+        minutes : int
+            Size of the window in minutes
+        """
+        self._history = history
+        self._seconds = minutes * 60
+        self._tail = history.next_sequence
+        self._count = 0
+        self._not_available = 0
+        self._total_seconds = 0.0
+        self._response_codes = {}
+        self._reasons = {}
+        self._histogram = lh.LatencyHistogram()
+        self._phase_count = 0
+        self._phase_seconds = [0.0] * len(wc.WebChecker.PHASES)
+        self._queue_wait_count = 0
+        self._queue_wait_total = 0.0
+
+    @classmethod
+    def percentile_stats(cls, histogram):
+        """Percentiles of the response time with the stats format
+
+        Parameters
+        ----------
+        histogram : LatencyHistogram
+            Response times
+
+        Returns
+        -------
+        stats : dict
+            response_p50, response_p95 and response_p99. -1 if there are no response times
+        """
+        values = histogram.percentiles(cls.PERCENTILES)
+        return {'response_p{}'.format(percent): value for percent, value in zip(cls.PERCENTILES, values)}
+
+    @staticmethod
+    def phase_stats(count, phase_seconds):
+        """Average seconds of each phase with the stats format
+
+        Parameters
+        ----------
+        count : int
+            Number of responses with phases
+        phase_seconds : list
+            Sum of the seconds of each phase of WebChecker.PHASES
+
+        Returns
+        -------
+        stats : dict
+            Average of each phase. Empty if there are no responses with phases
+        """
+        if count == 0:
+            return {}
+        return {phase: round(seconds / count, 4) for phase, seconds in zip(wc.WebChecker.PHASES, phase_seconds)}
+
+    @staticmethod
+    def queue_wait_avg(count, total):
+        """Average seconds the checks waited before the request was sent
+
+        Parameters
+        ----------
+        count : int
+            Number of responses with queue wait
+        total : float
+            Sum of the queue waits
+
+        Returns
+        -------
+        queue_wait_avg : float
+            -1 if there are no responses with queue wait
+        """
+        return round(total / count, 4) if count > 0 else -1
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def not_available(self):
+        return self._not_available
+
+    def __update(self, sequence, sign):
+        """Add (sign=1) or remove (sign=-1) a response from the stats
+
+        Parameters
+        ----------
+        sequence : int
+            Sequence number of the response
+        sign : int
+            1 to add the response, -1 to remove it
+        """
+        self._count += sign
+        queue_wait = self._history.queue_wait(sequence)
+        if queue_wait is not None:
+            self._queue_wait_count += sign
+            self._queue_wait_total += sign * queue_wait
+            if self._queue_wait_count == 0:  # Avoid float error accumulation
+                self._queue_wait_total = 0.0
+        if self._history.available(sequence):
+            response_time = self._history.response_time(sequence)
+            self._total_seconds += sign * response_time
+            self._histogram.add(response_time, sign)
+            phases = self._history.phases(sequence)
+            if phases is not None:
+                self._phase_count += sign
+                for index, seconds in enumerate(phases):
+                    self._phase_seconds[index] += sign * seconds
+                if self._phase_count == 0:  # Avoid float error accumulation
+                    self._phase_seconds = [0.0] * len(phases)
+            status_code = self._history.status_code(sequence)
+            count = self._response_codes.get(status_code, 0) + sign
+            if count > 0:
+                self._response_codes[status_code] = count
+            else:
+                del self._response_codes[status_code]
+        else:
+            self._not_available += sign
+            reason = self._history.reason(sequence)
+            if reason is not None:
+                count = self._reasons.get(reason, 0) + sign
+                if count > 0:
+                    self._reasons[reason] = count
+                else:
+                    del self._reasons[reason]
+
+        if self._count == self._not_available:  # Avoid float error accumulation when there are no times
+            self._total_seconds = 0.0
+
+    def copy(self):
+        """Copy of the running stats, that can be expired without changing these ones
+
+        Returns
+        -------
+        window : WindowAggregate
+            Window of the same history with a copy of the stats
+        """
+        window = copy.copy(self)
+        window._response_codes = dict(self._response_codes)
+        window._reasons = dict(self._reasons)
+        window._histogram = self._histogram.copy()
+        window._phase_seconds = list(self._phase_seconds)
+        return window
+
+    def before_append(self):
+        """Remove from the stats the response that the history is going to overwrite
+
+        Must be called before adding a response to the history
+        """
+        history = self._history
+        if len(history) == history.capacity and self._tail == history.oldest_sequence:
+            self.__update(self._tail, -1)
+            self._tail += 1
+
+    def add(self, sequence):
+        """Add a response to the stats
+
+        Parameters
+        ----------
+        sequence : int
+            Sequence number of the response that has been appended to the history
+        """
+        self.__update(sequence, 1)
+
+    def load(self, now):
+        """Add to the stats the responses of the history inside the window, for a window that has no responses yet
+
+        Used with the responses loaded at once in the history, that only have the fields saved by ResultStore, so
+        the stats are calculated from the columns of the history and not updated for each response
+
+        Parameters
+        ----------
+        now : float
+            Timestamp of the newest response
+        """
+        sequences = self._history.sequences_between(now - self._seconds, math.inf)
+        self._tail = sequences.start
+        status_codes, response_times, available = self._history.columns(sequences)
+        times = list(itertools.compress(response_times, available))
+        self._count = len(sequences)
+        self._not_available = self._count - len(times)
+        self._total_seconds = sum(times)
+        self._response_codes = dict(collections.Counter(itertools.compress(status_codes, available)))
+        self._histogram.extend(times)
+
+    def expire(self, now):
+        """Remove from the stats the responses older than the window
+
+        Parameters
+        ----------
+        now : float
+            Actual timestamp
+        """
+        history = self._history
+        from_timestamp = now - self._seconds
+        while self._tail < history.next_sequence and history.timestamp(self._tail) <= from_timestamp:
+            self.__update(self._tail, -1)
+            self._tail += 1
+
+    def availability(self):
+        """Percentage of available responses inside the window
+
+        Returns
+        -------
+        availability : float
+            0.0 if there are no responses
+        """
+        if self._count == 0:
+            return 0.0
+        return round(((self._count - self._not_available) / self._count) * 100, 2)
+
+    def stats(self):
+        """Response avg, response time percentiles, phases avg, queue wait avg, response codes count, reasons count and
+        availability
+
+        Returns
+        -------
+        stats : dict
+            Same format as Web.calculate_stats
+        """
+        stats = {
+            'response_avg': -1,
+            'response_codes': dict(self._response_codes),
+            'reasons': dict(self._reasons),
+            'availability': 0.0,
+            'phases': self.phase_stats(self._phase_count, self._phase_seconds),
+            'queue_wait_avg': self.queue_wait_avg(self._queue_wait_count, self._queue_wait_total)
+        }
+        stats.update(self.percentile_stats(self._histogram))
+        available = self._count - self._not_available
+        if available > 0:
+            stats['response_avg'] = round(self._total_seconds / available, 4)
+            stats['availability'] = self.availability()
+
+        return stats
@@ -0,0 +1,173 @@
+from threading import Event, Thread
+import logging
+import os
+import queue
+import socket
+import time
+
+from classes import Engines
+from classes import NodeConnection as nc
+from exceptions import generic_exception as ge
+from model import RemoteWeb as rw
+
+
+class Worker(object):
+    """
+    A worker node that checks the webs assigned by a coordinator and sends it the responses.
+
+    The webs are checked with the engine set in worker_engine (thread or asyncio). The responses are sent in a batch
+    every batch_interval seconds, an empty batch if there are none so the coordinator knows the worker is alive. If the
+    connection is lost the worker stops its checks and connects again, and the coordinator gives its webs to the
+    other workers meanwhile.
+
+    Attributes
+    ----------
+    host : str
+        Address of the coordinator
+    port : int
+        Port of the coordinator
+    name : str
+        Name of the worker in the coordinator
+    batch_interval : float
+        Seconds between batches of responses
+    stats_interval : float
+        Seconds between the stats of the engine sent to the coordinator
+    reconnect_interval : float
+        Seconds between connection attempts
+    outbox : queue.Queue
+        Responses waiting to be sent
+    engine : Object
+        ThreadEngine or AsyncEngine that checks the webs
+    log : LogRecord
+        log object
+    _webs : dict
+        Parameters and Web object of each web assigned
+
+    Methods
+    -------
+    """
+
+    def __init__(self, host, port, settings, name=None):
+        """
+        Parameters
+        ----------
+        host : str
+            Address of the coordinator
+        port : int
+            Port of the coordinator
+        settings : dict
+            default section of the app configuration
+        name : str
+            Name of the worker in the coordinator. Host name and process id if it's not set
+        """
+        self.host = host
+        self.port = port
+        self.name = name or "{}:{}".format(socket.gethostname(), os.getpid())
+        self.batch_interval = float(settings.get('worker_batch_interval', 1))
+        self.stats_interval = float(settings.get('worker_stats_interval', 10))
+        self.reconnect_interval = float(settings.get('worker_reconnect_interval', 5))
+        self.outbox = queue.Queue()
+        engine_settings = dict(settings)
+        engine_settings['engine'] = settings.get('worker_engine', 'thread')
+        self.engine = Engines.create_engine([], engine_settings)
+        self.log = logging.getLogger("Monitor")
+        self._webs = {}
+
+    def run(self):
+        """Infinite loop that connects to the coordinator and checks its webs until the connection is lost
+        """
+        self.engine.start()
+        while True:
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=self.reconnect_interval)
+            except OSError as error:
+                self.log.warning("Can't connect to the coordinator {}:{}: {}".format(self.host, self.port, error))
+                time.sleep(self.reconnect_interval)
+                continue
+
+            connection = nc.NodeConnection(sock)
+            self.log.info("Connected to the coordinator {}:{} as {}".format(self.host, self.port, self.name))
+            try:
+                self.__work(connection)
+            finally:
+                connection.close()
+                self.__assign({})  # The coordinator gives the webs to other workers
+            self.log.warning("Connection with the coordinator lost")
+            time.sleep(self.reconnect_interval)
+
+    def __work(self, connection):
+        """Receives the assignments of the coordinator until the connection is lost
+
+        Parameters
+        ----------
+        connection : NodeConnection
+            Connection with the coordinator
+        """
+        stop = Event()
+        try:
+            connection.send({'type': 'hello', 'name': self.name})
+        except OSError:
+            return
+        Thread(target=self.__send, args=(connection, stop), name="WorkerSender", daemon=True).start()
+        try:
+            while True:
+                message = connection.receive()
+                if message is None:
+                    break
+                if message.get('type') == 'assign':
+                    self.__assign(message['webs'])
+        except (ValueError, KeyError):
+            self.log.exception("Invalid message from the coordinator")
+        finally:
+            stop.set()
+
+    def __send(self, connection, stop):
+        """Loop that sends the batches of responses and the stats until the connection is lost
+
+        Parameters
+        ----------
+        connection : NodeConnection
+            Connection with the coordinator
+        stop : Event
+            Set when the connection is lost
+        """
+        last_stats = time.monotonic()
+        while not stop.wait(self.batch_interval):
+            results = []
+            while True:
+                try:
+                    results.append(self.outbox.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                connection.send({'type': 'results', 'results': results})
+                if time.monotonic() - last_stats >= self.stats_interval:
+                    last_stats = time.monotonic()
+                    connection.send({'type': 'stats', 'stats': self.engine.stats()})
+            except OSError:
+                connection.close()  # Wakes up the receiving loop
+                return
+
+    def __assign(self, webs_data):
+        """Check the webs assigned by the coordinator. Only the new, removed or changed webs are touched
+
+        Parameters
+        ----------
+        webs_data : dict
+            Parameters of all the webs of the worker
+        """
+        removed = [web_name for web_name, (parameters, _) in self._webs.items()
+                   if webs_data.get(web_name) != parameters]
+        old_webs = [self._webs.pop(web_name)[1] for web_name in removed]
+        new_webs = []
+        for web_name, parameters in webs_data.items():
+            if web_name in self._webs:
+                continue
+            try:
+                web = rw.RemoteWeb(self.outbox, **parameters)
+            except ge.Error:  # The exception already logged the error
+                continue
+            self._webs[web_name] = (parameters, web)
+            new_webs.append(web)
+        self.engine.update_webs(new_webs, old_webs)
+        self.log.info("Checking {} webs".format(len(self._webs)))
@@ -1,9 +1,18 @@
-from threading import Thread
+from threading import Lock, Thread
 import logging
+import queue
+import shlex
 import time
 import datetime
 
-from classes import WebChecker as wc
+from classes import AlertDispatcher as ad
+from classes import AlertSinks as sk
+from classes import Engines
+from classes import FleetStats as fs
+from classes import Instrumentation as ins
+from classes import ProcessEngine as pe
+from exceptions import generic_exception as ge
+from view import MetricsView as mv
 
 
 class Controller(object):
@@ -20,14 +29,38 @@ class Controller(object):
         object of the view that we will use
     webs : list
         a list of all the Web objects that we will use to monitor
+    webs_data : dict
+        data of the webs that are monitored
     log : LogRecord
         log object
     start_time : Time
         variable that we will use to know the start time to show the stats in the output
+    settings : dict
+        default section of the app configuration
+    engine : Object
+        ThreadEngine, AsyncEngine or ProcessEngine that does the requests
+    alerts : queue.Queue
+        status changes of the webs that will be shown as alerts
+    engine_stats : dict
+        last stats of the engine shown, None until the first stats are shown
+    fleet : FleetStats
+        calculates the stats of all the webs together and the worst webs
+    instrumentation : Instrumentation
+        timings of the stats of the webs and of the view
+    metrics : MetricsView
+        view that serves the stats over HTTP. None if it's disabled
+    dispatcher : AlertDispatcher
+        sends the alerts to the file, webhook and command sinks. None if there are no sinks
+    _web_objects : dict
+        Web object of each web name. Empty if the webs are in shard processes
+    _reload_lock : Lock
+        lock for the reloads, that can be done from the console and from the config watcher
+    _pending : list
+        names of the webs that are waiting for their start wave
 
     """
 
-    def __init__(self, model, view, webs_data):
+    def __init__(self, model, view, webs_data, settings=None):
         """
         Parameters
         ----------
@@ -37,15 +70,28 @@ class Controller(object):
             object of the view that we will use
         webs_data : dict
             All the data of the webs
+        settings : dict
+            default section of the app configuration
         """
+        self.settings = settings or {}
         self.model = model
         self.view = view()
-        self.__init_web_objects(webs_data)  # Set all the parameters to the object
+        self.alerts = queue.Queue()
         self.log = logging.getLogger("Monitor")
         self.start_time = time.time()
-        self.__start_web_monitoring()
+        self.engine_stats = None
+        self.metrics = None
+        self.dispatcher = None
+        self.fleet = fs.FleetStats(int(self.settings.get('worst_webs', 5)))
+        self.instrumentation = ins.Instrumentation()
+        self.webs_data = dict(webs_data)
+        self._web_objects = {}
+        self._reload_lock = Lock()
+        self._pending = []
+        self.__start_web_monitoring(webs_data)
         self.__start_stats_monitor()
-        self.__start_downtime_check()
+        self.__start_alerts_monitor()
+        self.__start_metrics()
 
     def __init_web_objects(self, webs_data):
         """Creates model objects and saves them in the list of webs
@@ -55,9 +101,116 @@ class Controller(object):
         webs_data : dict
             All the data of the webs
         """
-        self.webs = []
-        for web_name in webs_data.keys():
-            self.webs.append(self.model(**webs_data[web_name]))
+        self._web_objects = {web_name: self.__create_web(webs_data[web_name]) for web_name in webs_data.keys()}
+        self.webs = list(self._web_objects.values())
+
+    def __create_web(self, web_data):
+        """Creates a model object
+
+        Parameters
+        ----------
+        web_data : dict
+            Data of the web
+
+        Returns
+        -------
+        web : Object
+            Model object
+        """
+        web = self.model(**web_data)
+        web.alerts = self.alerts  # The web notifies its status changes
+        return web
+
+    def reload(self, webs_data):
+        """Applies a new list of webs to the running monitor
+
+        Only the webs that are new, removed or whose data changed are started, stopped or replaced. The rest keep their
+        history and their status. If any new web is not valid nothing is changed
+
+        Parameters
+        ----------
+        webs_data : dict
+            All the data of the webs
+
+        Returns
+        -------
+        changes : tuple
+            Names of the added, removed and changed webs
+
+        Raises
+        ------
+        WebObjectCreateException
+            If the parameters of a new web are missing or unknown
+        WebParameterException
+            If the value of a parameter of a new web is not valid
+        """
+        with self._reload_lock:
+            added = [web_name for web_name in webs_data.keys() if web_name not in self.webs_data]
+            removed = [web_name for web_name in self.webs_data.keys() if web_name not in webs_data]
+            changed = [web_name for web_name in webs_data.keys()
+                       if web_name in self.webs_data and webs_data[web_name] != self.webs_data[web_name]]
+
+            # The removed or changed webs that are waiting for their wave are not in the engine
+            pending = set(self._pending)
+            self.__update_engine({web_name: webs_data[web_name] for web_name in added + changed},
+                                 [web_name for web_name in removed + changed if web_name not in pending])
+            changed_names = set(changed)
+            self._pending = [web_name for web_name in self._pending
+                             if web_name in webs_data and web_name not in changed_names]
+            self.webs_data = dict(webs_data)
+
+        self.log.info("Reloaded webs: {} added, {} removed, {} changed".format(len(added), len(removed), len(changed)))
+        return added, removed, changed
+
+    def __update_engine(self, webs_data, removed):
+        """Starts and stops the monitoring of webs in the engine
+
+        Parameters
+        ----------
+        webs_data : dict
+            All the data of the webs that are started
+        removed : list
+            Names of the webs that are stopped
+
+        Raises
+        ------
+        WebObjectCreateException
+            If the parameters of a new web are missing or unknown
+        WebParameterException
+            If the value of a parameter of a new web is not valid
+        """
+        # Create the new objects before changing anything, so an invalid web doesn't leave a half reload
+        new_webs = {web_name: self.__create_web(webs_data[web_name]) for web_name in webs_data.keys()}
+        if isinstance(self.engine, pe.ProcessEngine):  # The webs are created in the shard processes
+            self.engine.update_webs(webs_data, removed)
+        else:
+            old_webs = [self._web_objects.pop(web_name) for web_name in removed]
+            self._web_objects.update(new_webs)
+            self.engine.update_webs(list(new_webs.values()), old_webs)
+            self.webs = list(self._web_objects.values())
+
+    def __start_waves(self, wave, interval):
+        """Starts the webs that are waiting, wave webs every interval seconds, until all are started
+
+        Parameters
+        ----------
+        wave : int
+            Number of webs started in each wave
+        interval : float
+            Seconds between waves
+        """
+        while True:
+            time.sleep(interval)
+            with self._reload_lock:
+                started, self._pending = self._pending[:wave], self._pending[wave:]
+                try:
+                    self.__update_engine({web_name: self.webs_data[web_name] for web_name in started}, [])
+                except ge.Error:
+                    pass  # The exception already logged the error, the next waves are started
+                waiting = len(self._pending)
+            self.log.info("Started {} webs, {} waiting".format(len(started), waiting))
+            if not waiting:
+                return
 
     def __show_stats(self, start_time):
         """Infinite loop to show stats of the webs
@@ -81,57 +234,110 @@ class Controller(object):
                 # Set 10 minutes history
                 interval_minutes = 10
 
-            # Calculate the time from we need to get the responses
-            time_from = datetime.datetime.now() - datetime.timedelta(minutes=interval_minutes)
             # Show stats for each web
-            self.__show_web_stats(time_from)
+            self.__show_web_stats(interval_minutes)
 
             count += 1
 
-    def __check_downtimes(self):
-        """Infinite loop that check the availability of the webs and shows alerts
+    def __show_alerts(self):
+        """Infinite loop that waits for status changes of the webs and shows the alerts
         """
         while True:
-            time.sleep(1)  # Run each second
-            for web in self.webs:  # Loop all the webs
-                if web.availability != 0.0:  # Avoid calculating for the webs that the availability is 0
-                    if web.availability > 80 and not web.status:
-                        # Web was down and now is available again
-                        self.view.web_available(web.name, datetime.datetime.now())
-                        web.set_up()
-                    elif web.availability < 80 and web.status:
-                        # Web was up and now is down
-                        self.view.web_not_available(web.name, web.availability, datetime.datetime.now())
-                        web.set_down()
-
-    def __monitor_web(self, web):
-        """Inifnite loop thath checks the response of the web in the interval set and saves it
+            alert = self.alerts.get()  # Wait until a web changes its status
+            if self.dispatcher is not None:  # Sent in background, in batches
+                self.dispatcher.put(alert)
+            alert_time = datetime.datetime.fromtimestamp(alert['timestamp'])
+            if alert['status']:
+                # Web was down and now is available again
+                self.view.web_available(alert['name'], alert_time)
+            else:
+                # Web was up and now is down
+                self.view.web_not_available(alert['name'], alert['availability'], alert_time)
+
+    def __start_web_monitoring(self, webs_data):
+        """Starts the monitoring of the webs with the engine set in the settings
 
         Parameters
         ----------
-        web : Object
-            Web object that will be monitored
+        webs_data : dict
+            All the data of the webs. If there are more than start_wave webs, the rest are started in waves
+        """
+        wave = int(self.settings.get('start_wave', 0))
+        if 0 < wave < len(webs_data):
+            self._pending = list(webs_data.keys())[wave:]
+            webs_data = {web_name: webs_data[web_name] for web_name in list(webs_data.keys())[:wave]}
+        processes = int(self.settings.get('processes', 1))
+        if processes > 1:
+            # The webs are created and monitored in the shard processes
+            self.webs = []
+            self.engine = pe.ProcessEngine(self.model, webs_data, self.settings, self.alerts, processes)
+        else:
+            self.__init_web_objects(webs_data)  # Set all the parameters to the object
+            self.engine = Engines.create_engine(self.webs, self.settings)
+        self.engine.start()
+        if self._pending:
+            Thread(target=self.__start_waves, name="StartWaves", daemon=True,
+                   args=(wave, float(self.settings.get('start_wave_interval', 1)))).start()
+
+    def __update_metrics(self, window_minutes, refresh_seconds):
+        """Infinite loop that renders the metrics with the running stats of the webs
+
+        Parameters
+        ----------
+        window_minutes : int
+            Minutes of history of the stats
+        refresh_seconds : float
+            Seconds between updates
         """
         while True:
-            time.sleep(web.interval)  # Do the requests with the interval set for the Web
-            response_data = wc.WebChecker().site_status(web.url)  # Do the request
-            web.add_response(response_data)  # Add response data
-            self.log.debug("Added response data for {}".format(web.name))
+            all_stats = self.engine.web_stats(window_minutes, time.time())
+            self.metrics.update(all_stats, self.engine_stats)
+            time.sleep(refresh_seconds)
 
-    def __start_web_monitoring(self):
-        """Starts threads to monitor each web
+    def __start_metrics(self):
+        """Starts the metrics server and the thread that updates it, if a metrics port is set
         """
-        for web in self.webs:  # Loop all the webs
-            # Create and start the thread
-            web_monitor_thread = Thread(target=self.__monitor_web, args=(web,), daemon=True)
-            web_monitor_thread.start()
-            self.log.info("Started monitoring for {}".format(web.name))
+        port = int(self.settings.get('metrics_port', 0))
+        if port <= 0:
+            return
+        self.metrics = mv.MetricsView(self.settings.get('metrics_host', '127.0.0.1'), port)
+        self.metrics.start()
+        metrics_thread = Thread(target=self.__update_metrics, name="MetricsUpdater", daemon=True,
+                                args=(int(self.settings.get('metrics_window', 10)),
+                                      float(self.settings.get('metrics_refresh', 5))))
+        metrics_thread.start()
 
-    def __start_downtime_check(self):
-        """Starts web downtime check thread
+    def __alert_sinks(self):
+        """Creates the sinks of the alerts set in the settings
+
+        Returns
+        -------
+        sinks : list
+            File, webhook and command sinks. Empty if none is set
         """
-        downtime_thread = Thread(target=self.__check_downtimes, daemon=True)
-        downtime_thread.start()
+        sinks = []
+        if self.settings.get('alert_file'):
+            sinks.append(sk.FileSink(self.settings['alert_file']))
+        if self.settings.get('alert_webhook'):
+            sinks.append(sk.WebhookSink(self.settings['alert_webhook']))
+        if self.settings.get('alert_command'):
+            sinks.append(sk.CommandSink(shlex.split(self.settings['alert_command'])))
+        return sinks
+
+    def __start_alerts_monitor(self):
+        """Starts the thread for showing the alerts and the dispatcher that sends them to the sinks, if there are sinks
+        """
+        sinks = self.__alert_sinks()
+        if sinks:
+            self.dispatcher = ad.AlertDispatcher(sinks, float(self.settings.get('alert_batch_window', 1)),
+                                                 int(self.settings.get('alert_max_batch', 100)),
+                                                 float(self.settings.get('alert_flap_window', 600)),
+                                                 int(self.settings.get('alert_flap_limit', 4)),
+                                                 int(self.settings.get('alert_retries', 3)),
+                                                 float(self.settings.get('alert_retry_backoff', 1)))
+            self.dispatcher.start()
+        alerts_thread = Thread(target=self.__show_alerts, daemon=True)
+        alerts_thread.start()
 
     def __start_stats_monitor(self):
         """Starts the thread for showing the stats
@@ -139,23 +345,71 @@ class Controller(object):
         stats_thread = Thread(target=self.__show_stats, args=(time.time(),), daemon=True)
         stats_thread.start()
 
-    def __show_web_stats(self, time_from):
-        """Calculates the stats of each website and calls to the view to print them
+    def __show_web_stats(self, interval_minutes):
+        """Gets the running stats of each website and calls to the view to print them
 
         Parameters
         ----------
-        time_from : datetime.datetime
-        """
-        all_stats = []
-        for web in self.webs:  # Loop all the webs
-            self.log.debug("Calculating stats for {}".format(web.name))
-            web_stats = web.calculate_stats(time_from)  # Calculate stats
-            # Append stats to the list for the view
-            all_stats.append({
-                'name': web.name,
-                'stats': web_stats,
-                'status': web.status
-            })
+        interval_minutes : int
+            Minutes of history of the stats
+        """
+        # Calculate the time from we need to get the responses
+        now = datetime.datetime.now()
+        time_from = now - datetime.timedelta(minutes=interval_minutes)
+        with self.instrumentation.timer('web_stats'):
+            all_stats = self.engine.web_stats(interval_minutes, now.timestamp())  # Get stats of all the webs
 
         # Call the view
-        self.view.show_response(all_stats, time_from)
+        self.engine_stats = self.monitor_stats()
+        with self.instrumentation.timer('render'):
+            self.view.show_response(all_stats, time_from, self.engine_stats, self.fleet.calculate(all_stats))
+
+    def monitor_stats(self, reset=True):
+        """Stats of the engine with the load and the timings of the controller added
+
+        The counters of the scheduler and the timings start again after each call, unless reset is false
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Stats of the connections, of the DNS cache, of the scheduler, of the load, the timings and the delivery of
+            the alerts
+        """
+        stats = self.engine.stats(reset)
+        stats['load']['alerts'] = self.alerts.qsize()
+        stats['load']['pending'] = len(self._pending)
+        stats['timings'].update(self.instrumentation.timing_stats(reset))
+        if self.dispatcher is not None:
+            stats['alert_delivery'] = self.dispatcher.stats(reset)
+        return stats
+
+    def show_monitor_stats(self):
+        """Shows the stats of the monitor since the last stats, without taking them out of the next stats
+        """
+        self.view.show_monitor_stats(self.monitor_stats(reset=False))
+
+    def start_profile(self, sample=None):
+        """Starts profiling the checks
+
+        Parameters
+        ----------
+        sample : int
+            One of every sample checks is profiled. The profile_sample setting if it's not set
+        """
+        sample = int(self.settings.get('profile_sample', 10)) if sample is None else sample
+        self.engine.start_profile(sample)
+        self.log.info("Profiling one of every {} checks".format(sample))
+
+    def stop_profile(self):
+        """Stops profiling the checks, saves the profile in the profile_file setting and shows the slowest functions
+        """
+        path = self.settings.get('profile_file', 'monitor.prof')
+        if self.engine.stop_profile(path):
+            self.view.show_profile(path)
+        else:
+            self.log.error("The profiler is not running or no check was profiled")
@@ -0,0 +1,15 @@
+from exceptions import generic_exception as ge
+
+
+class AlertSinkException(ge.Error):
+    """Exception raised when a batch of alerts could not be delivered to a sink
+
+    Parameters
+    ----------
+    sink : object
+        Sink that failed
+    error : Exception
+        Error of the delivery
+    """
+    def __init__(self, sink, error):
+        super().__init__('Could not send the alerts to {}: {}'.format(sink, error))
@@ -13,3 +13,68 @@ class DefaultConfigPathError(ge.Error):
     """
     def __init__(self):
         super().__init__('Error with default config paths')
+
+
+class EngineConfigError(ge.Error):
+    """Exception raised for errors in config file: Engine does not exist or can't be used
+
+    Parameters
+    ----------
+    engine : str
+        Engine set in the config file
+    """
+    def __init__(self, engine):
+        super().__init__('Engine {} is not valid or its dependencies are not installed'.format(engine))
+
+
+class ModelConfigError(ge.Error):
+    """Exception raised for errors in config file: Model does not exist
+
+    Parameters
+    ----------
+    model : str
+        Model set in the config file
+    """
+    def __init__(self, model):
+        super().__init__('Model {} is not valid'.format(model))
+
+
+class MetricsConfigError(ge.Error):
+    """Exception raised for errors in config file: Metrics window does not have running stats
+
+    Parameters
+    ----------
+    window : str
+        Metrics window set in the config file
+    """
+    def __init__(self, window):
+        super().__init__('Metrics window {} is not valid'.format(window))
+
+
+class ProcessesConfigError(ge.Error):
+    """Exception raised for errors in config file: Several processes with a model or an engine that can't be shared
+    """
+    def __init__(self):
+        super().__init__('More than one process only works with the memory model and the thread or asyncio engines')
+
+
+class TargetsConfigError(ge.Error):
+    """Exception raised for errors in the targets file: The file can't be read or some webs are not valid
+
+    All the errors of the file are in the message, the first MAX_SHOWN of them one per line
+
+    Parameters
+    ----------
+    path : str
+        Path of the targets file
+    errors : list
+        Description of each error, with its line in the file
+    """
+    MAX_SHOWN = 50
+
+    def __init__(self, path, errors):
+        self.errors = errors
+        lines = errors[:self.MAX_SHOWN]
+        if len(errors) > self.MAX_SHOWN:
+            lines.append("... and {} more".format(len(errors) - self.MAX_SHOWN))
+        super().__init__('{} errors in targets file {}:\n    {}'.format(len(errors), path, '\n    '.join(lines)))
@@ -6,3 +6,19 @@ class WebObjectCreateException(ge.Error):
     """
     def __init__(self):
         super().__init__('Could not create web object. Dictionary must have name, interval and url')
+
+
+class WebParameterException(ge.Error):
+    """Exception raised with a not valid value for a parameter of the Web Class
+
+    Parameters
+    ----------
+    name : str
+        Name of the web
+    parameter : str
+        Name of the parameter
+    value : str
+        Value of the parameter
+    """
+    def __init__(self, name, parameter, value):
+        super().__init__('Could not create web object {}. Value {} is not valid for {}'.format(name, value, parameter))
@@ -1,11 +1,28 @@
 from configparser import ConfigParser, ExtendedInterpolation
+import argparse
+import functools
+import json
 import os
 import logging
 
 from controller import Controller
 from model import Web as web
+from model import SqliteWeb as sqlite_web
 from view import ConsoleView as view
 from exceptions import config_exceptions
+from exceptions import generic_exception
+from classes import AsyncWebChecker
+from classes import BatchFileHandler
+from classes import ConfigWatcher
+from classes import QueuedLog
+from classes import Replay
+from classes import ResultStore
+from classes import TargetLoader
+from classes import Worker
+
+CONFIG_FILE = "config/app.ini"
+ENGINES = ('thread', 'asyncio', 'coordinator')
+MODELS = ('memory', 'sqlite')
 
 
 def validate_conf(conf):
@@ -24,11 +41,34 @@ def validate_conf(conf):
         If the paths does not exist
     DefaultConfigError
         If the default configuration does not exist
+    EngineConfigError
+        If the engine does not exist or its dependencies are not installed
+    ModelConfigError
+        If the model does not exist
+    ProcessesConfigError
+        If there are several processes with a model that is not memory or with the coordinator
+    MetricsConfigError
+        If the metrics window does not have running stats
     """
     if 'default' in conf.sections() and 'log' in conf.sections():
         # Validate paths
         if not (os.path.exists(conf['default']['home_dir']) & os.path.exists(conf['log']['log_dir'])):
             raise config_exceptions.DefaultConfigPathError()
+        # Validate engine
+        engine = conf['default'].get('engine', 'thread')
+        if engine not in ENGINES or (engine == 'asyncio' and AsyncWebChecker.aiohttp is None):
+            raise config_exceptions.EngineConfigError(engine)
+        # Validate model
+        model = conf['default'].get('model', 'memory')
+        if model not in MODELS:
+            raise config_exceptions.ModelConfigError(model)
+        # Validate processes
+        if int(conf['default'].get('processes', 1)) > 1 and (model != 'memory' or engine == 'coordinator'):
+            raise config_exceptions.ProcessesConfigError()
+        # Validate metrics window
+        metrics_window = conf['default'].get('metrics_window', '10')
+        if not metrics_window.isdigit() or int(metrics_window) not in web.Web.STATS_WINDOWS:
+            raise config_exceptions.MetricsConfigError(metrics_window)
     else:
         raise config_exceptions.DefaultConfigError()
 
@@ -58,9 +98,126 @@ def conf_to_dict(conf):
     return conf_dict
 
 
+def read_conf(path):
+    """Load and validate the config file
+
+    The webs of the targets file, if it's set, are added to the webs of the config file
+
+    Parameters
+    ----------
+    path : str
+        Path of the config file
+
+    Returns
+    -------
+    conf_dict : dict
+        Dict with all the configurations
+
+    Raises
+    ------
+    TargetsConfigError
+        If the targets file can't be read or any of its webs is not valid
+    """
+    conf = ConfigParser(interpolation=ExtendedInterpolation())
+    conf.read(path)
+    validate_conf(conf)
+    conf_dict = conf_to_dict(conf)
+    targets_file = conf_dict['default'].get('targets_file')
+    if targets_file:
+        webs_data = conf_dict.setdefault('webs', {})
+        loader = TargetLoader.TargetLoader(targets_file, int(conf_dict['default'].get('targets_batch', 1000)))
+        # The targets are saved by name, so a name can't be the name or the section of a web of the config file
+        webs_data.update(loader.load(set(webs_data.keys()) | {data.get('name') for data in webs_data.values()}))
+    return conf_dict
+
+
+def reload_webs(controller, path):
+    """Apply the webs of the config file to the running monitor
+
+    Parameters
+    ----------
+    controller : Controller
+        Controller of the monitor
+    path : str
+        Path of the config file
+    """
+    controller.reload(read_conf(path).get('webs', {}))
+
+
+def run_command(controller, command, path):
+    """Run a command of the console input
+
+    Commands:
+        reload : apply the webs of the config file
+        add NAME INTERVAL URL : monitor a new web, or change a web
+        remove NAME : stop monitoring a web
+        stats : show the stats of the monitor since the last stats
+        profile on [SAMPLE] : profile one of every SAMPLE checks
+        profile off : stop profiling and show the slowest functions
+
+    Parameters
+    ----------
+    controller : Controller
+        Controller of the monitor
+    command : str
+        Line written in the console
+    path : str
+        Path of the config file
+    """
+    words = command.split()
+    try:
+        if words == ['reload']:
+            reload_webs(controller, path)
+        elif len(words) == 4 and words[0] == 'add':
+            webs_data = dict(controller.webs_data)
+            webs_data[words[1]] = {'name': words[1], 'interval': words[2], 'url': words[3]}
+            controller.reload(webs_data)
+        elif len(words) == 2 and words[0] == 'remove':
+            webs_data = dict(controller.webs_data)
+            if webs_data.pop(words[1], None) is None:
+                logging.getLogger("Monitor").error("Web {} is not monitored".format(words[1]))
+                return
+            controller.reload(webs_data)
+        elif words == ['stats']:
+            controller.show_monitor_stats()
+        elif words[:2] == ['profile', 'on'] and len(words) <= 3 and all(word.isdigit() for word in words[2:]):
+            controller.start_profile(int(words[2]) if len(words) == 3 else None)
+        elif words == ['profile', 'off']:
+            controller.stop_profile()
+        elif words:
+            logging.getLogger("Monitor").error("Unknown command: {}".format(command))
+    except generic_exception.Error:
+        pass  # The exception already logged the error, the monitor keeps running
+
+
+def model_init(default_config):
+    """Get the model class set in the configuration
+
+    Parameters
+    ----------
+    default_config : dict
+        Data with the default options
+
+    Returns
+    -------
+    model : callable
+        Creates the model objects from the web data
+    store : ResultStore
+        Store of the responses. None if the model doesn't use it
+    """
+    if default_config.get('model', 'memory') == 'sqlite':
+        store = ResultStore.ResultStore(default_config['database'], float(default_config.get('database_retention', 7)))
+        return functools.partial(sqlite_web.SqliteWeb, store), store
+
+    return web.Web, None
+
+
 def log_init(log_config):
     """Init root logger with file and console output
 
+    The records are written by a background thread, so the threads that log don't wait for the disk or the terminal.
+    The file is flushed in batches every log_flush_interval seconds
+
     Parameters
     ----------
     log_config : dict
@@ -82,39 +239,134 @@ def log_init(log_config):
     root_logger = logging.getLogger("Monitor")
     root_logger.propagate = False
 
-    # Add file handler
-    file_handler = logging.FileHandler("{0}/{1}.log".format(log_config['log_dir'], log_config['log_file_name']))
+    # Create file handler
+    file_handler = BatchFileHandler.BatchFileHandler(
+        "{0}/{1}.log".format(log_config['log_dir'], log_config['log_file_name']),
+        float(log_config.get('log_flush_interval', 1)))
     file_handler.setFormatter(log_file_formatter)
-    root_logger.addHandler(file_handler)
 
-    # Add console handler
+    # Create console handler
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(log_console_formatter)
-    root_logger.addHandler(console_handler)
+
+    # Write both outputs from the queue
+    QueuedLog.QueuedLog(root_logger, file_handler, console_handler).start()
 
     return root_logger
 
 
-if __name__ == '__main__':
-    # Load app configuration file
-    config = ConfigParser(interpolation=ExtendedInterpolation())
-    config.read("config/app.ini")
+def run_replay(conf_data, args):
+    """Replay a recording of check results with the webs of the configuration and save the report
+
+    Parameters
+    ----------
+    conf_data : dict
+        Dict with all the configurations
+    args : argparse.Namespace
+        Recording, thresholds, windows and output file of the replay
+    """
+    log = logging.getLogger("Monitor")
+    overrides = {key: value for key, value in (('alert_threshold', args.alert_threshold),
+                                               ('recovery_threshold', args.recovery_threshold)) if value is not None}
+    webs_data = {name: dict(parameters, **overrides) for name, parameters in conf_data.get('webs', {}).items()}
+    model = Replay.Replay.with_availability_window(web.Web, args.availability_window or web.Web.AVAILABILITY_WINDOW)
+    if args.window not in model.STATS_WINDOWS:
+        log.error("The window must be one of {} minutes".format(', '.join(map(str, model.STATS_WINDOWS))))
+        return
 
-    # Validate configuration
-    validate_conf(config)
+    default = conf_data['default']
+    replay = Replay.Replay(model, webs_data, args.window, args.stats_interval,
+                           float(default.get('alert_batch_window', 1)), float(default.get('alert_flap_window', 600)),
+                           int(default.get('alert_flap_limit', 4)))
+    try:
+        report = replay.run(Replay.Replay.read(args.replay))
+    except (OSError, ValueError, KeyError) as error:
+        log.error("Can't replay {}: {}".format(args.replay, error))
+        return
 
-    # Transform into a dict for the controller
-    conf_data = conf_to_dict(config)
+    with open(args.output, 'w') as output:
+        json.dump(report, output)
+    counts = report['responses']
+    log.info("Replayed {} responses of {} webs in {}s ({} responses/minute), skipped {} of unknown webs and {} out "
+             "of order".format(counts['replayed'], report['webs'], report['seconds'], report['responses_per_minute'],
+                               counts['unknown_web'], counts['out_of_order']))
+    log.info("{} alerts fired, {} sent".format(len(report['alerts']), len(report['sent_alerts'])))
+    for name, summary in sorted(report['summary'].items()):
+        if summary['down_alerts']:
+            log.info("{}: {} down alerts, {} sent, {}s down".format(name, summary['down_alerts'],
+                                                                    summary['sent_alerts'], summary['down_seconds']))
+    log.info("Report saved in {}".format(args.output))
+
+
+def parse_args():
+    """Parse the command line arguments
+
+    Returns
+    -------
+    args : argparse.Namespace
+        worker address and name, and recording and options of the replay. The worker is None if the program is not a
+        worker node and the replay is None if the program doesn't replay a recording
+    """
+    parser = argparse.ArgumentParser(description="Web monitor")
+    parser.add_argument('--worker', metavar='HOST:PORT',
+                        help="run as a worker node that checks the webs assigned by the coordinator")
+    parser.add_argument('--name', help="name of the worker node in the coordinator")
+    parser.add_argument('--replay', metavar='FILE',
+                        help="run the stats and the alerts of the webs over a recording of check results (.jsonl, or "
+                             ".db of the sqlite model) with a virtual clock, save the report and exit")
+    parser.add_argument('--alert-threshold', type=float, help="alert threshold of all the webs in the replay")
+    parser.add_argument('--recovery-threshold', type=float, help="recovery threshold of all the webs in the replay")
+    parser.add_argument('--availability-window', type=int, metavar='MINUTES',
+                        help="minutes of the availability that sets the status of the webs in the replay")
+    parser.add_argument('--window', type=int, default=10, metavar='MINUTES',
+                        help="minutes of the stats saved in the report of the replay (default 10)")
+    parser.add_argument('--stats-interval', type=float, default=600, metavar='SECONDS',
+                        help="seconds of the recording between the stats of the report (default 600)")
+    parser.add_argument('--output', default='replay_report.json', help="report of the replay (default %(default)s)")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    # Load and validate app configuration file
+    conf_data = read_conf(CONFIG_FILE)
 
     # Init logger
     log = log_init(conf_data['log'])
 
+    if args.replay:
+        # Replay the recording at full speed and exit
+        run_replay(conf_data, args)
+        raise SystemExit
+
+    if args.worker:
+        # Check the webs of the coordinator until the program is stopped
+        worker_host, _, worker_port = args.worker.rpartition(':')
+        Worker.Worker(worker_host, int(worker_port), conf_data['default'], args.name).run()
+
+    # Init model
+    model, store = model_init(conf_data['default'])
+
     # Init controller
-    c = Controller.Controller(web.Web, view.ConsoleView, conf_data['webs'])
+    c = Controller.Controller(model, view.ConsoleView, conf_data.get('webs', {}), conf_data['default'])
+
+    # Reload the webs when the config file changes
+    reload_interval = float(conf_data['default'].get('reload_interval', 0))
+    if reload_interval > 0:
+        ConfigWatcher.ConfigWatcher(CONFIG_FILE, reload_interval,
+                                    functools.partial(reload_webs, c, CONFIG_FILE)).start()
+        if conf_data['default'].get('targets_file'):
+            ConfigWatcher.ConfigWatcher(conf_data['default']['targets_file'], reload_interval,
+                                        functools.partial(reload_webs, c, CONFIG_FILE)).start()
 
-    # Lock the program until user request to finish
-    input_str = ""
+    # Run the commands until user request to finish
+    input_str = input()
     while input_str != "exit":
+        run_command(c, input_str, CONFIG_FILE)
         input_str = input()
 
+    if store is not None:  # Save the pending responses
+        store.close()
+
     log.info("End of program")
@@ -0,0 +1,44 @@
+from model import Web as web
+
+
+class RemoteWeb(web.Web):
+    """
+        A Web checked by a worker node for a coordinator.
+
+        The worker keeps only the responses of the availability window, enough to adapt the interval of the checks,
+        and puts every response in an outbox that is sent to the coordinator in batches. The stats and the alerts are
+        done by the coordinator.
+
+        Attributes
+        ----------
+        _outbox : queue.Queue
+            Queue where the name of the web and each response are put
+
+        Methods
+        -------
+        """
+
+    def __init__(self, outbox, **kwargs):
+        """Init class
+
+        Parameters
+        ----------
+        outbox : queue.Queue
+            Queue where the name of the web and each response are put
+        kwargs : dict
+            Parameters of the Web class
+        """
+        kwargs['retention'] = self.AVAILABILITY_WINDOW
+        super().__init__(**kwargs)
+        self._outbox = outbox
+
+    def add_response(self, response):
+        """Add response data to the object and put it in the outbox
+
+        Parameters
+        ----------
+        response : dict
+            Web data response
+        """
+        super().add_response(response)
+        self._outbox.put((self.name, response))
@@ -0,0 +1,117 @@
+from datetime import datetime
+import time
+
+from classes import WindowAggregate as wa
+from model import Web as web
+
+
+class SqliteWeb(web.Web):
+    """
+        A Web that also saves its responses in a ResultStore.
+
+        When it's created it loads the responses of the retention time from the store, and the summary of the
+        buckets of the rollups from the database, so the stats, the long windows and the status of the web are not
+        lost when the program restarts. The stats of the windows longer than the retention time are calculated by the
+        database.
+
+        Attributes
+        ----------
+        _store : ResultStore
+            Store where the responses are saved
+
+        Methods
+        -------
+        """
+
+    def __init__(self, store, **kwargs):
+        """Init class
+
+        Parameters
+        ----------
+        store : ResultStore
+            Store where the responses are saved
+        kwargs : dict
+            Parameters of the Web class
+        """
+        super().__init__(**kwargs)
+        self._store = store
+        # Reload the recent responses and the rollups in bulk. The restored status is not notified
+        now = time.time()
+        retention_start = now - self.retention * 60
+        rollups = [store.rollups(self.name, now - seconds * capacity, seconds)
+                   for seconds, capacity in self.ROLLUP_TIERS]
+        self.load_responses(*store.load(self.name, retention_start), store.count(self.name, retention_start), rollups)
+
+    def add_response(self, response):
+        """Add response data to the object and queue it to be saved in the store
+
+        Parameters
+        ----------
+        response : dict
+            Web data response
+        """
+        super().add_response(response)
+        self._store.add(self.name, response)
+
+    def window_stats(self, minutes, now=None):
+        """Stats of the last minutes from the running stats, or from the database if the window is longer than the
+        retention time
+
+        The responses of the last ResultStore.FLUSH_INTERVAL seconds could still be waiting to be saved, so they are not
+        included in the stats of the database
+
+        Parameters
+        ----------
+        minutes : int
+            Window of minutes, must be one of STATS_WINDOWS
+        now : float
+            Actual timestamp. Current time if it's not set
+
+        Returns
+        -------
+        stats : dict
+            Same format as calculate_stats
+        """
+        if minutes <= self.retention:
+            return super().window_stats(minutes, now)
+        now = time.time() if now is None else now
+        return self.calculate_stats(datetime.fromtimestamp(now - minutes * 60), now)
+
+    def calculate_stats(self, from_time, now=None):
+        """Calculate response avg and percentiles, response codes count and availability from the time passed
+
+        Uses the responses in memory if the time is inside the retention time, if not the database
+
+        Parameters
+        ----------
+        from_time : datetime.datetime
+            Responses older time
+        now : float
+            Actual timestamp. Current time if it's not set
+
+        Returns
+        -------
+        responses : list
+            Responses list
+        """
+        now = time.time() if now is None else now
+        if from_time.timestamp() >= now - self.retention * 60:
+            return super().calculate_stats(from_time)
+
+        stats = {
+            'response_avg': -1,
+            'response_codes': {},
+            'availability': 0.0,
+            'reasons': {},  # The reasons, the phases and the queue wait are not stored in the database
+            'phases': {},
+            'queue_wait_avg': -1
+        }
+        num_responses, not_available, total_seconds, response_codes, histogram = self._store.stats(
+            self.name, from_time.timestamp())
+        stats['response_codes'] = response_codes
+        stats.update(wa.WindowAggregate.percentile_stats(histogram))
+        if (num_responses - not_available) > 0:
+            stats['response_avg'] = round(total_seconds / (num_responses - not_available), 4)  # Response average
+            stats['availability'] = round(((num_responses - not_available) / num_responses) * 100, 2)  # Availability
+
+        return stats
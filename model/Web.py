@@ -1,6 +1,21 @@
-from datetime import datetime, timedelta
+from collections import namedtuple
+from threading import Lock
+from urllib.parse import urlsplit
+import math
+import re
+import time
+
+from classes import ResponseHistory as rh
+from classes import WindowAggregate as wa
+from classes import LatencyHistogram as lh
+from classes import RollupTier as rt
+from classes import WebChecker as wc
+from classes import ContentCheck as cc
 from exceptions import web_exception as we
 
+# Consistent copy of the status and the running stats of a web. The version changes with each response
+WebSnapshot = namedtuple('WebSnapshot', ('version', 'status', 'availability', 'next_interval', 'windows'))
+
 
 class Web(object):
     """
@@ -18,32 +33,315 @@ class Web(object):
             Status of the web page. True=Up, False=Down
         _availability : float
             Calculated availability for the last 2 minutes
-        _responses : list
-            List of responses of the request made
+        _retention : int
+            Minutes of responses that are kept
+        _probe : str
+            Probe mode of the requests. One of WebChecker.PROBE_MODES
+        _timings : bool
+            Keep the seconds of the phases and the queue wait of each response for the stats
+        _responses : ResponseHistory
+            Ring buffer with the responses of the request made
+        _windows : dict
+            Running stats of the responses for each window of minutes in STATS_WINDOWS
+        _rollups : tuple
+            RollupTier of each size in ROLLUP_TIERS, finer first, with the summary of the responses of long windows
+        _lock : Lock
+            Lock of the writers of the responses. The readers only take it if the responses change too fast
+        _version : int
+            Version of the responses and the running stats. Odd while a response is being added
+        _reads : int
+            Reads of the responses and the running stats since the last read stats
+        _read_retries : int
+            Reads repeated because a response was added meanwhile
+        _locked_reads : int
+            Reads that had to take the lock after READ_ATTEMPTS retries
+        _alert_threshold : float
+            The web is down when the availability is less than this percentage
+        _recovery_threshold : float
+            The web is up again when the availability is greater than this percentage
+        _alerts : queue.Queue
+            Queue where the status changes are put. If it's None the status changes are not notified
+        _timeout : float
+            Max seconds waiting for the web in each check
+        _max_backoff : float
+            Max times the interval is multiplied when the web is down
+        _circuit_timeouts : int
+            Consecutive timeouts of a down web that open the circuit
+        _circuit_interval : float
+            Seconds between checks while the circuit is open
+        _failures : int
+            Consecutive not available responses
+        _timeouts : int
+            Consecutive timeouts
+        _next_interval : float
+            Seconds until the next check, adapted to the last responses
+        _content_contains : str
+            Text the body must contain. Empty if it's not checked
+        _content_regex : str
+            Regular expression the body must match. Empty if it's not checked
+        _content_hash : str
+            SHA-256 the body must have, or 'change' to detect the changes of the body. Empty if it's not checked
+        _max_size : int
+            Max bytes of the decoded body. 0 = no limit
+        _content_check : ContentCheck
+            Content checks of the body done in each check. None if the web has no content checks
 
         Methods
         -------
         """
 
+    # Minutes of the windows that have running stats
+    AVAILABILITY_WINDOW = 2
+    STATS_WINDOWS = (AVAILABILITY_WINDOW, 10, 60)
+
+    # Reads of the responses that are tried without the lock
+    READ_ATTEMPTS = 3
+
+    # Seconds and number of the rollup buckets: per minute for 2 hours and per hour for 7 days
+    ROLLUP_TIERS = ((60, 120), (3600, 7 * 24 + 1))
+    # Minutes of the long windows shown with the stats, 24 hours and 7 days
+    ROLLUP_WINDOWS = (24 * 60, 7 * 24 * 60)
+
+    # A web whose availability is this close to the thresholds is checked FAST_FACTOR times more often
+    NEAR_THRESHOLD_MARGIN = 10
+    FAST_FACTOR = 2
+    MIN_INTERVAL = 1
+
+    required_keys = {'name', 'interval', 'url'}
+
+    # Optional parameters and their default values
+    optional_keys = {
+        'retention': 60,
+        'probe': wc.WebChecker.PROBE_GET,
+        'alert_threshold': 80,
+        'recovery_threshold': 80,
+        'timeout': 1,
+        'max_backoff': 8,
+        'circuit_timeouts': 5,
+        'circuit_interval': 60,
+        'content_contains': '',
+        'content_regex': '',
+        'content_hash': '',
+        'max_size': 0,
+        'timings': False
+    }
+
+    # Type of the parameters that are converted
+    parameter_types = {
+        'interval': int,
+        'retention': int,
+        'alert_threshold': float,
+        'recovery_threshold': float,
+        'timeout': float,
+        'max_backoff': float,
+        'circuit_timeouts': int,
+        'circuit_interval': float,
+        'max_size': int
+    }
+
+    # Values of the yes or no parameters
+    FLAG_VALUES = {'yes': True, 'true': True, '1': True, 'no': False, 'false': False, '0': False}
+
     def __init__(self, **kwargs):
         """Init class
 
         Parameters
         ----------
         kwargs : dict
-            name, interval and url dictionary
+            name, interval and url dictionary. Optionally the retention in minutes, the probe mode, the alert
+            thresholds, the timeout, the backoff and circuit breaker options, the content checks and if the timings
+            are kept
+
+        Raises
+        ------
+        WebObjectCreateException
+            If the required parameters are missing or there are unknown parameters
+        WebParameterException
+            If the value of a parameter is not valid
         """
-        required_keys = {'name', 'interval', 'url'}
-        if len(kwargs) == 3 and set(kwargs.keys()) == required_keys:
+        keys = set(kwargs.keys())
+        if self.required_keys <= keys and keys <= self.required_keys | set(self.optional_keys):
             self._name = kwargs['name']
-            self._interval = int(kwargs['interval'])
+            try:
+                self._interval = int(kwargs['interval'])
+            except (TypeError, ValueError):  # Webs added from the console input
+                raise we.WebParameterException(self._name, 'interval', kwargs['interval'])
             self._url = kwargs['url']
+            self._retention = self.__parameter(kwargs, 'retention', int)
+            self._probe = kwargs.get('probe', self.optional_keys['probe'])
+            if self._probe not in wc.WebChecker.PROBE_MODES:
+                raise we.WebParameterException(self._name, 'probe', self._probe)
+            self._timings = self.__flag(kwargs.get('timings', self.optional_keys['timings']))
+            if self._timings is None:
+                raise we.WebParameterException(self._name, 'timings', kwargs['timings'])
+            self._alert_threshold = self.__parameter(kwargs, 'alert_threshold', float)
+            self._recovery_threshold = self.__parameter(kwargs, 'recovery_threshold', float)
+            if self._recovery_threshold < self._alert_threshold:  # The web would be up and down at the same time
+                raise we.WebParameterException(self._name, 'recovery_threshold', self._recovery_threshold)
+            self._timeout = self.__parameter(kwargs, 'timeout', float)
+            self._max_backoff = max(1.0, self.__parameter(kwargs, 'max_backoff', float))
+            self._circuit_timeouts = self.__parameter(kwargs, 'circuit_timeouts', int)
+            self._circuit_interval = self.__parameter(kwargs, 'circuit_interval', float)
+            if self._timeout <= 0:
+                raise we.WebParameterException(self._name, 'timeout', self._timeout)
+            self._content_contains = str(kwargs.get('content_contains', self.optional_keys['content_contains']))
+            self._content_regex = str(kwargs.get('content_regex', self.optional_keys['content_regex']))
+            self._content_hash = str(kwargs.get('content_hash', self.optional_keys['content_hash']))
+            self._max_size = self.__parameter(kwargs, 'max_size', int)
+            self._content_check = self.__content_check()
+            self._failures = 0
+            self._timeouts = 0
+            self._next_interval = self._interval
+            self._alerts = None
             self._status = False
             self._availability = 0.0
-            self._responses = []
+            # Enough space to keep all the responses of the retention time, also while the web is checked faster
+            capacity = math.ceil(self._retention * 60 / max(self.MIN_INTERVAL, self._interval / self.FAST_FACTOR)) + 1
+            self._responses = rh.ResponseHistory(capacity, self._timings)
+            self._windows = {minutes: wa.WindowAggregate(self._responses, minutes) for minutes in self.STATS_WINDOWS}
+            self._rollups = tuple(rt.RollupTier(seconds, capacity) for seconds, capacity in self.ROLLUP_TIERS)
+            self._lock = Lock()
+            self._version = 0
+            self._reads = 0
+            self._read_retries = 0
+            self._locked_reads = 0
         else:
             raise we.WebObjectCreateException()
 
+    @classmethod
+    def validate(cls, kwargs):
+        """Check the parameters of a web without creating it, so the errors of many webs can be reported together
+
+        It's stricter than the creation of the web: the url must be http or https and the interval must be positive
+
+        Parameters
+        ----------
+        kwargs : dict
+            Parameters of the web
+
+        Returns
+        -------
+        errors : list
+            Description of each wrong parameter. Empty if the web is valid
+        """
+        keys = set(kwargs.keys())
+        errors = ["missing parameter {}".format(key) for key in sorted(cls.required_keys - keys)]
+        errors += ["unknown parameter {}".format(key) if key is not None else "more values than parameters"
+                   for key in sorted(keys - cls.required_keys - set(cls.optional_keys), key=str)]
+
+        values = dict(cls.optional_keys)
+        values.update(kwargs)
+        for key, cast in cls.parameter_types.items():
+            if key not in values:
+                continue
+            try:
+                values[key] = cast(values[key])
+            except (TypeError, ValueError):
+                errors.append("{} is not valid: {!r}".format(key, values[key]))
+                values[key] = None
+
+        if 'name' in values and not (isinstance(values['name'], str) and values['name']):
+            errors.append("name is not valid: {!r}".format(values['name']))
+        if values.get('interval') is not None and values['interval'] <= 0:
+            errors.append("interval must be positive: {}".format(values['interval']))
+        if 'url' in values:
+            url = urlsplit(str(values['url']))
+            if url.scheme not in ('http', 'https') or not url.netloc:
+                errors.append("url is not valid: {!r}".format(values['url']))
+        if values['probe'] not in wc.WebChecker.PROBE_MODES:
+            errors.append("probe is not valid: {!r}".format(values['probe']))
+        if cls.__flag(values['timings']) is None:
+            errors.append("timings is not valid: {!r}".format(values['timings']))
+        if values['timeout'] is not None and values['timeout'] <= 0:
+            errors.append("timeout must be positive: {}".format(values['timeout']))
+        thresholds = (values['alert_threshold'], values['recovery_threshold'])
+        if None not in thresholds and thresholds[1] < thresholds[0]:
+            errors.append("recovery_threshold is less than alert_threshold")
+        if values['max_size'] is not None and values['max_size'] < 0:
+            errors.append("max_size must not be negative: {}".format(values['max_size']))
+        content_keys = ('content_contains', 'content_regex', 'content_hash', 'max_size')
+        if any(values[key] for key in content_keys) and values['probe'] != wc.WebChecker.PROBE_GET:
+            errors.append("content checks need the get probe")
+        if values['content_hash'] and not cc.ContentCheck.valid_hash(str(values['content_hash'])):
+            errors.append("content_hash is not a SHA-256 or 'change': {!r}".format(values['content_hash']))
+        try:
+            cc.ContentCheck.compile_pattern(str(values['content_regex']))
+        except re.error as error:
+            errors.append("content_regex is not valid: {}".format(error))
+        return errors
+
+    @classmethod
+    def __flag(cls, value):
+        """Convert a yes or no parameter, that is a bool or a string of FLAG_VALUES in the config file
+
+        Parameters
+        ----------
+        value : object
+            Value of the parameter
+
+        Returns
+        -------
+        flag : bool
+            None if the value is not valid
+        """
+        if isinstance(value, bool):
+            return value
+        return cls.FLAG_VALUES.get(str(value).strip().lower())
+
+    def __content_check(self):
+        """Create the content checks of the body
+
+        Returns
+        -------
+        content_check : ContentCheck
+            None if the web has no content checks
+
+        Raises
+        ------
+        WebParameterException
+            If a content check is not valid or the probe mode doesn't download the body
+        """
+        if self._max_size < 0:
+            raise we.WebParameterException(self._name, 'max_size', self._max_size)
+        if not (self._content_contains or self._content_regex or self._content_hash or self._max_size):
+            return None
+        if self._probe != wc.WebChecker.PROBE_GET:  # The other probes don't download the body
+            raise we.WebParameterException(self._name, 'probe', self._probe)
+        if self._content_hash and not cc.ContentCheck.valid_hash(self._content_hash):
+            raise we.WebParameterException(self._name, 'content_hash', self._content_hash)
+        try:
+            return cc.ContentCheck(self._content_contains, self._content_regex, self._content_hash, self._max_size)
+        except re.error:
+            raise we.WebParameterException(self._name, 'content_regex', self._content_regex)
+
+    def __parameter(self, kwargs, key, cast):
+        """Get an optional parameter converted to its type
+
+        Parameters
+        ----------
+        kwargs : dict
+            Parameters of the web
+        key : str
+            Name of the parameter
+        cast : type
+            Type of the parameter
+
+        Returns
+        -------
+        value : object
+            Value of the parameter or its default value
+
+        Raises
+        ------
+        WebParameterException
+            If the value can't be converted
+        """
+        value = kwargs.get(key, self.optional_keys[key])
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise we.WebParameterException(self._name, key, value)
+
     @property
     def name(self):
         return self._name
@@ -64,34 +362,286 @@ class Web(object):
     def availability(self):
         return self._availability
 
+    @property
+    def retention(self):
+        return self._retention
+
+    @property
+    def probe(self):
+        return self._probe
+
+    @property
+    def alert_threshold(self):
+        return self._alert_threshold
+
+    @property
+    def recovery_threshold(self):
+        return self._recovery_threshold
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def content_check(self):
+        return self._content_check
+
+    @property
+    def next_interval(self):
+        return self._next_interval
+
+    @property
+    def circuit_open(self):
+        return not self._status and self._circuit_timeouts > 0 and self._timeouts >= self._circuit_timeouts
+
+    @property
+    def alerts(self):
+        return self._alerts
+
+    @alerts.setter
+    def alerts(self, alerts):
+        self._alerts = alerts
+
+    @property
+    def version(self):
+        return self._version
+
     @property
     def responses(self):
-        return self._responses
+        return self.__read(lambda: [self._responses.get(sequence)
+                                    for sequence in self._responses.sequences_from_time(self.__retention_start())])
+
+    def __retention_start(self):
+        """Start of the retention time, counted from the newest response
+
+        The buffer is sized for the fastest checks, so it can keep older responses that are not used
+
+        Returns
+        -------
+        timestamp : float
+            -inf if there are no responses
+        """
+        if not len(self._responses):
+            return -math.inf
+        return self._responses.timestamp(self._responses.next_sequence - 1) - self._retention * 60
+
+    def __read(self, read):
+        """Read the responses or the running stats without blocking the writer
+
+        The read is done again if a response was added meanwhile (the version changed), so the result is always
+        consistent. After READ_ATTEMPTS retries the read is done with the lock, so it always finishes
+
+        Parameters
+        ----------
+        read : callable
+            Function without parameters that reads the state of the web
+
+        Returns
+        -------
+        result : object
+            Result of the function
+        """
+        self._reads += 1
+        for _ in range(self.READ_ATTEMPTS):
+            version = self._version
+            if version % 2 == 0:  # No response is being added
+                try:
+                    result = read()
+                except Exception:
+                    if self._version == version:  # Not caused by a write, a real error
+                        raise
+                else:
+                    if self._version == version:
+                        return result
+            self._read_retries += 1
+        with self._lock:
+            self._locked_reads += 1
+            return read()
+
+    def read_stats(self, reset=True):
+        """Contention of the reads since the last call
+
+        Parameters
+        ----------
+        reset : bool
+            If false the counters are not started again, so the next call still has them
+
+        Returns
+        -------
+        stats : dict
+            Number of reads, reads repeated because a response was added meanwhile and reads that took the lock
+        """
+        stats = {'reads': self._reads, 'retries': self._read_retries, 'locked': self._locked_reads}
+        if reset:
+            self._reads = 0
+            self._read_retries = 0
+            self._locked_reads = 0
+        return stats
+
+    def parameters(self):
+        """Parameters that create the same web
+
+        Returns
+        -------
+        parameters : dict
+            name, interval, url and the optional parameters
+        """
+        return {
+            'name': self._name,
+            'interval': self._interval,
+            'url': self._url,
+            'retention': self._retention,
+            'probe': self._probe,
+            'alert_threshold': self._alert_threshold,
+            'recovery_threshold': self._recovery_threshold,
+            'timeout': self._timeout,
+            'max_backoff': self._max_backoff,
+            'circuit_timeouts': self._circuit_timeouts,
+            'circuit_interval': self._circuit_interval,
+            'content_contains': self._content_contains,
+            'content_regex': self._content_regex,
+            'content_hash': self._content_hash,
+            'max_size': self._max_size,
+            'timings': self._timings
+        }
 
     def __calculate_availability(self):
         """Calculate percentage of availability for the last 2 minutes
+
+        It's 0.0 if there are no responses in the last 2 minutes
         """
-        responses = self.responses_from_time(datetime.now() - timedelta(minutes=2))  # Get responses for last 2 minutes
-        not_available = 0
-        for response in responses:  # Count not available requests
-            if not response['available']:
-                not_available += 1
+        self._availability = self._windows[self.AVAILABILITY_WINDOW].availability()
 
-        # Calculate percentage
-        self._availability = round((((len(responses) - not_available) / len(responses)) * 100), 2)
+    def __check_status(self, timestamp):
+        """Change the status of the web if the availability crossed the thresholds and notify it to the alerts queue
+
+        Parameters
+        ----------
+        timestamp : float
+            Time of the response that changed the availability
+        """
+        if self._windows[self.AVAILABILITY_WINDOW].count == 0:  # No responses, nothing to evaluate
+            return
+
+        if self._availability > self._recovery_threshold and not self._status:
+            # Web was down and now is available again
+            self.set_up()
+        elif self._availability < self._alert_threshold and self._status:
+            # Web was up and now is down
+            self.set_down()
+        else:
+            return
+
+        if self._alerts is not None:
+            self._alerts.put({
+                'name': self._name,
+                'status': self._status,
+                'availability': self._availability,
+                'timestamp': timestamp
+            })
+
+    def __adapt_interval(self, response):
+        """Calculate the seconds until the next check from the last responses
+
+        A down web that keeps failing is checked less often, doubling the interval up to max_backoff times. If it keeps
+        timing out the circuit is opened and it's only checked every circuit_interval seconds, so it doesn't hold the
+        workers. A web whose availability is near the thresholds is checked more often to detect the change sooner
+
+        Parameters
+        ----------
+        response : dict
+            Last web data response
+        """
+        if response['available']:
+            self._failures = 0
+            self._timeouts = 0
+        else:
+            self._failures += 1
+            self._timeouts = self._timeouts + 1 if response.get('timeout') else 0
+
+        if self.circuit_open:
+            self._next_interval = max(self._circuit_interval, self._interval)
+        elif not self._status and self._failures > 0:  # Down and still failing
+            self._next_interval = self._interval * min(2 ** min(self._failures, 32), self._max_backoff)
+        elif (self._alert_threshold - self.NEAR_THRESHOLD_MARGIN <= self._availability
+              <= self._recovery_threshold + self.NEAR_THRESHOLD_MARGIN):
+            self._next_interval = max(self.MIN_INTERVAL, self._interval / self.FAST_FACTOR)
+        else:
+            self._next_interval = self._interval
 
     def add_response(self, response):
         """Add response data to the object
 
-        Also calculates availability for the last 2 minutes
+        Also updates the running stats of the windows and the rollups, calculates availability for the last 2 minutes,
+        changes the status of the web if the availability crossed the alert thresholds and adapts the interval of next
+        check
 
         Parameters
         ----------
         response : dict
             Web data response
         """
-        self._responses.insert(0, response)
-        self.__calculate_availability()
+        with self._lock:  # One writer at a time
+            self._version += 1  # The readers don't use the state until the version is even again
+            try:
+                for window in self._windows.values():  # Remove the response that is going to be overwritten
+                    window.before_append()
+                sequence = self._responses.append(response)
+                for window in self._windows.values():
+                    window.add(sequence)
+                    window.expire(response['timestamp'])
+                for tier in self._rollups:
+                    tier.add(response)
+                self.__calculate_availability()
+                self.__check_status(response['timestamp'])
+                self.__adapt_interval(response)
+            finally:
+                self._version += 1
+
+    def load_responses(self, timestamps, status_codes, response_times, available, skipped=0, rollups=None):
+        """Add the saved responses at once, before any response is added
+
+        The responses are the columns of the fields saved by ResultStore. The responses, the running stats and the
+        rollups are filled in bulk, and the status is set from the availability without notifying it and without
+        adapting the interval, so loading the history is not seen as a change of the web. The rollups can be filled
+        with the summary of a longer time than the responses
+
+        Parameters
+        ----------
+        timestamps : list
+            Timestamp of each response, ordered by time
+        status_codes : list
+            Status code of each response. 0 if the web didn't respond
+        response_times : list
+            Response time of each response
+        available : list
+            1 if the web was available, 0 if not
+        skipped : int
+            Number of older responses of the web that are not loaded
+        rollups : list
+            Buckets of each tier of ROLLUP_TIERS, as returned by ResultStore.rollups. If it's not set the rollups are
+            filled with the responses
+        """
+        if not timestamps and not rollups:
+            return
+        columns = (timestamps, status_codes, response_times, available)
+        with self._lock:
+            self._version += 1
+            try:
+                self._responses.load(*columns, skipped)
+                for position, tier in enumerate(self._rollups):
+                    if rollups is None:
+                        tier.load(*columns)
+                    else:
+                        tier.load_buckets(rollups[position])
+                for window in self._windows.values():
+                    window.load(timestamps[-1] if timestamps else math.inf)
+                self.__calculate_availability()
+                # Up unless the web was going down, the recovery threshold is not needed to stay up
+                self._status = (self._windows[self.AVAILABILITY_WINDOW].count > 0
+                                and self._availability >= self._alert_threshold)
+            finally:
+                self._version += 1
 
     def set_down(self):
         """Set web as down
@@ -116,18 +666,12 @@ class Web(object):
         responses : list
             Responses list
         """
-        responses = []
-        for response in self._responses:
-            if response['timestamp'] > from_time.timestamp():  # Insert only responses newer than the time
-                responses.append(response)
-            else:
-                # As responses is ordered by newer response, when we arrive to a older response than time we finished
-                break
-
-        return responses
+        return self.__read(lambda: [self._responses.get(sequence) for sequence in self._responses.sequences_from_time(
+            max(from_time.timestamp(), self.__retention_start()))])
 
     def calculate_stats(self, from_time):
-        """Calculate response avg, response codes count and availability from the time passed
+        """Calculate response time, phase and queue wait averages, response codes, reasons of the failed content checks
+        and availability from a time
 
         Parameters
         ----------
@@ -139,31 +683,242 @@ class Web(object):
         responses : list
             Responses list
         """
+        return self.__read(lambda: self.__calculate_stats(from_time))
+
+    def __calculate_stats(self, from_time):
+        """Walk the responses from a time and calculate their stats
+
+        Parameters
+        ----------
+        from_time : datetime.datetime
+            Responses older time
+
+        Returns
+        -------
+        stats : dict
+        """
 
         # Init dictionary where all the data is going to save
         stats = {
             'response_avg': -1,
             'response_codes': {},
+            'reasons': {},
             'availability': 0.0
         }
 
-        responses_delimited = self.responses_from_time(from_time)  # Get responses from time
+        # Get responses from time
+        sequences = self._responses.sequences_from_time(max(from_time.timestamp(), self.__retention_start()))
         total_seconds = 0.0
-        num_responses = len(responses_delimited)
+        num_responses = len(sequences)
         not_available = 0
-        for response in responses_delimited:  # Iterate all responses
-            if response['available']:  # If it's available
-                total_seconds += response['response_time']  # Sum all the responses seconds
-                status_code = response['status_code']
+        histogram = lh.LatencyHistogram()
+        phase_count = 0
+        phase_seconds = [0.0] * len(wc.WebChecker.PHASES)
+        queue_wait_count = 0
+        queue_wait_total = 0.0
+        for sequence in sequences:  # Iterate all responses
+            queue_wait = self._responses.queue_wait(sequence)
+            if queue_wait is not None:  # Time waiting for a worker and for the rate limit, not part of the response
+                queue_wait_count += 1
+                queue_wait_total += queue_wait
+            if self._responses.available(sequence):  # If it's available
+                total_seconds += self._responses.response_time(sequence)  # Sum all the responses seconds
+                histogram.add(self._responses.response_time(sequence))
+                phases = self._responses.phases(sequence)
+                if phases is not None:
+                    phase_count += 1
+                    phase_seconds = [total + seconds for total, seconds in zip(phase_seconds, phases)]
+                status_code = self._responses.status_code(sequence)
                 if status_code in stats['response_codes']:  # If the status code exist add, if not create
                     stats['response_codes'][status_code] += 1
                 else:
                     stats['response_codes'][status_code] = 1
             else:
                 not_available += 1  # Variable to know if we can calculate stats
+                reason = self._responses.reason(sequence)
+                if reason is not None:  # Status 200 but the body failed a content check
+                    stats['reasons'][reason] = stats['reasons'].get(reason, 0) + 1
 
+        stats.update(wa.WindowAggregate.percentile_stats(histogram))
+        stats['phases'] = wa.WindowAggregate.phase_stats(phase_count, phase_seconds)
+        stats['queue_wait_avg'] = wa.WindowAggregate.queue_wait_avg(queue_wait_count, queue_wait_total)
         if (num_responses - not_available) > 0:  # If not_available is greater than num_responses don't calculate stats
             stats['response_avg'] = round(total_seconds / (num_responses - not_available), 4)  # Response average
             stats['availability'] = round(((num_responses - not_available) / num_responses)*100, 2)  # Availability
 
         return stats
+
+    def snapshot(self, now=None, windows=STATS_WINDOWS):
+        """Consistent copy of the status and the running stats, read without blocking the checks
+
+        The running stats are copied and the copies are expired, so the running stats are only changed by the writer
+
+        Parameters
+        ----------
+        now : float
+            Actual timestamp. Current time if it's not set
+        windows : tuple
+            Minutes of the windows of STATS_WINDOWS included
+
+        Returns
+        -------
+        snapshot : WebSnapshot
+            Version, status, availability, next interval and stats of each window
+        """
+        now = time.time() if now is None else now
+        return self.__read(lambda: self.__snapshot(now, windows))
+
+    def __snapshot(self, now, windows):
+        """Copy the status and the running stats
+
+        Parameters
+        ----------
+        now : float
+            Actual timestamp
+        windows : tuple
+            Minutes of the windows included
+
+        Returns
+        -------
+        snapshot : WebSnapshot
+        """
+        version = self._version
+        stats = {}
+        for minutes in windows:
+            window = self._windows[minutes].copy()
+            window.expire(now)
+            stats[minutes] = window.stats()
+        return WebSnapshot(version, self._status, self._availability, self._next_interval, stats)
+
+    def window_stats(self, minutes, now=None):
+        """Stats of the last minutes from the running stats, without walking the responses
+
+        Parameters
+        ----------
+        minutes : int
+            Window of minutes, must be one of STATS_WINDOWS
+        now : float
+            Actual timestamp. Current time if it's not set
+
+        Returns
+        -------
+        stats : dict
+            Same format as calculate_stats
+        """
+        return self.snapshot(now, (minutes,)).windows[minutes]
+
+    def __responses_cover(self, timestamp):
+        """Check if the responses kept include all the responses since the timestamp
+
+        Parameters
+        ----------
+        timestamp : float
+
+        Returns
+        -------
+        covers : bool
+        """
+        if timestamp < self.__retention_start():
+            return False
+        if len(self._responses) < self._responses.capacity:  # Nothing was overwritten yet
+            return True
+        return self._responses.timestamp(self._responses.oldest_sequence) <= timestamp
+
+    def __history_after(self, timestamp):
+        """Check if all the responses of the web are newer than the timestamp
+
+        Parameters
+        ----------
+        timestamp : float
+
+        Returns
+        -------
+        after : bool
+        """
+        if self._responses.oldest_sequence > 0:  # Some were overwritten
+            return False
+        return not len(self._responses) or self._responses.timestamp(0) > timestamp
+
+    def __rollup_totals(self, from_timestamp, now):
+        """Add up the rollups and the responses of a window
+
+        Parameters
+        ----------
+        from_timestamp : float
+            Start of the window
+        now : float
+            Actual timestamp
+
+        Returns
+        -------
+        totals : dict
+            count, failures, total_seconds, min, max and codes of the window
+        """
+        totals = {'count': 0, 'failures': 0, 'total_seconds': 0.0, 'min': math.inf, 'max': 0.0, 'codes': {}}
+        coarsest = self._rollups[-1]
+        if self.__history_after(from_timestamp) and coarsest.covers(from_timestamp, now):
+            # The bucket of the start of the window has no older responses, so the whole buckets are used
+            coarsest.collect(totals, coarsest.align(from_timestamp), math.inf, now)
+            return totals
+
+        until = math.inf
+        for position in range(len(self._rollups) - 1, -1, -1):  # Coarsest first
+            tier = self._rollups[position]
+            start = tier.align(from_timestamp)
+            if position > 0:
+                finer_covers = self._rollups[position - 1].covers(from_timestamp, now)
+            else:
+                finer_covers = self.__responses_cover(from_timestamp)
+            if start < from_timestamp and finer_covers:  # The partial bucket is added from the finer data
+                start += tier.seconds
+            tier.collect(totals, start, until, now)
+            until = min(until, start)
+            if not finer_covers:
+                break
+        else:  # The edge before the finest buckets, at most one bucket of responses
+            for sequence in self._responses.sequences_between(from_timestamp, until):
+                totals['count'] += 1
+                if self._responses.available(sequence):
+                    response_time = self._responses.response_time(sequence)
+                    totals['total_seconds'] += response_time
+                    totals['min'] = min(totals['min'], response_time)
+                    totals['max'] = max(totals['max'], response_time)
+                else:
+                    totals['failures'] += 1
+                    status_code = self._responses.status_code(sequence)
+                    if status_code != self._responses.NO_STATUS_CODE:
+                        totals['codes'][status_code] = totals['codes'].get(status_code, 0) + 1
+        return totals
+
+    def rollup_stats(self, minutes, now=None):
+        """Stats of a long window from the rollups, for windows longer than the retention
+
+        The window is covered with the coarsest buckets that fit inside it, and the edge of the window that is not a
+        whole bucket with the finer buckets and at last with the responses kept. If the finer data of the edge was
+        already overwritten, the whole coarse bucket of the edge is used
+
+        Parameters
+        ----------
+        minutes : int
+            Minutes of the window
+        now : float
+            Actual timestamp. Current time if it's not set
+
+        Returns
+        -------
+        stats : dict
+            Number of responses, availability, response time avg, min and max and codes of the not available responses
+        """
+        now = time.time() if now is None else now
+        from_timestamp = now - minutes * 60
+        totals = self.__read(lambda: self.__rollup_totals(from_timestamp, now))
+
+        stats = {'count': totals['count'], 'availability': 0.0, 'response_avg': -1, 'response_min': -1,
+                 'response_max': -1, 'error_codes': totals['codes']}
+        available = totals['count'] - totals['failures']
+        if available > 0:
+            stats['availability'] = round(available / totals['count'] * 100, 2)
+            stats['response_avg'] = round(totals['total_seconds'] / available, 4)
+            stats['response_min'] = round(totals['min'], 4)
+            stats['response_max'] = round(totals['max'], 4)
+        return stats
@@ -0,0 +1,56 @@
+import contextlib
+import io
+import time
+import unittest
+
+from benchmarks import WebhookReceiver as wr
+from classes import AlertDispatcher as ad
+from classes import AlertSinks as sk
+
+
+class AlertDispatcherTest(unittest.TestCase):
+    """
+    Tests of the alert dispatcher against the local stand-in of a webhook.
+    """
+
+    @staticmethod
+    def alert(name, status):
+        return {'name': name, 'status': status, 'availability': 100.0 if status else 0.0, 'timestamp': time.time()}
+
+    @staticmethod
+    def statuses(batch):
+        return [(alert['name'], alert['status']) for alert in batch]
+
+    def test_initial_up_not_sent(self):
+        dispatcher = ad.AlertDispatcher([])
+        now = time.time()
+        batch = dispatcher.filter([self.alert('web1', True), self.alert('web2', False)], now)
+        self.assertEqual(self.statuses(batch), [('web2', False)])
+
+        # Only the recoveries after a down are sent
+        batch = dispatcher.filter([self.alert('web1', False), self.alert('web2', True)], now + 1)
+        self.assertEqual(self.statuses(batch), [('web1', False), ('web2', True)])
+        batch = dispatcher.filter([self.alert('web1', True)], now + 2)
+        self.assertEqual(self.statuses(batch), [('web1', True)])
+
+    def test_webhook(self):
+        receiver = wr.WebhookReceiver()
+        receiver.start()
+        self.addCleanup(receiver.shutdown)
+        dispatcher = ad.AlertDispatcher([sk.WebhookSink(receiver.url)], batch_window=0.1)
+        dispatcher.start()
+
+        with contextlib.redirect_stdout(io.StringIO()):  # The receiver prints each batch
+            for index in range(3):  # Webs that start up
+                dispatcher.put(self.alert('web{}'.format(index), True))
+            dispatcher.put(self.alert('web0', False))
+            time.sleep(0.5)
+            dispatcher.put(self.alert('web0', True))
+            time.sleep(0.5)
+
+        received = [self.statuses(batch['alerts']) for batch in receiver.batches]
+        self.assertEqual(received, [[('web0', False)], [('web0', True)]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+from threading import Thread
+import time
+import unittest
+
+from benchmarks import TargetFarm as tf
+from classes import Coordinator as co
+from classes import WebChecker as wc
+from classes import Worker as wk
+from model import Web as web
+
+
+class CoordinatorTest(unittest.TestCase):
+    """
+    Tests of the coordinator with several workers on localhost.
+    """
+
+    @staticmethod
+    def response(timestamp):
+        response = wc.WebChecker.site_up_response(200, 0.01)
+        response['timestamp'] = timestamp
+        return response
+
+    def test_results_added_in_order(self):
+        site = web.Web(name='site', url='http://127.0.0.1:1/', interval='1')
+        coordinator = co.Coordinator([site], port=0, reorder_delay=2)
+        add_results = coordinator._Coordinator__add_results
+
+        # Two replicas whose batches arrive out of order
+        add_results([['site', self.response(101)], ['site', self.response(103)]], now=102)
+        add_results([['site', self.response(100)], ['site', self.response(102)]], now=104)
+        self.assertEqual([response['timestamp'] for response in site.responses], [102, 101, 100])
+
+        # Older than the last response added, it arrived too late
+        add_results([['site', self.response(99)], ['unknown', self.response(104)]], now=110)
+        self.assertEqual([response['timestamp'] for response in site.responses], [103, 102, 101, 100])
+
+    def test_held_results_drained(self):
+        site = web.Web(name='site', url='http://127.0.0.1:1/', interval='1')
+        coordinator = co.Coordinator([site], port=0, reorder_delay=0.2)
+        coordinator.start()
+
+        # The only results message, nothing else arrives to flush it
+        coordinator._Coordinator__add_results([['site', self.response(time.time())]])
+        self.assertEqual(len(site.responses), 0)
+        time.sleep(0.5)
+        self.assertEqual(len(site.responses), 1)
+
+    def test_workers_on_localhost(self):
+        server = tf.FarmServer(('127.0.0.1', 0), tf.TargetHandler)
+        server.start_time = time.time()
+        Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        url = "http://127.0.0.1:{}/".format(server.server_address[1])
+
+        webs = [web.Web(name='web{}'.format(index), url=url, interval='1') for index in range(4)]
+        coordinator = co.Coordinator(webs, port=0, replicas=2, reorder_delay=0.5)
+        coordinator.start()
+        settings = {'worker_batch_interval': 0.1, 'worker_stats_interval': 0.5, 'worker_reconnect_interval': 0.5,
+                    'workers': 4}
+        for index in range(3):
+            worker = wk.Worker('127.0.0.1', coordinator.port, settings, 'worker{}'.format(index))
+            Thread(target=worker.run, daemon=True).start()
+
+        time.sleep(5)
+        self.assertEqual(coordinator.load_stats()['workers'], 3)
+        for checked_web in webs:
+            timestamps = [response['timestamp'] for response in checked_web.responses]
+            self.assertGreaterEqual(len(timestamps), 3)
+            self.assertEqual(timestamps, sorted(timestamps, reverse=True))  # Newest first
+            self.assertTrue(checked_web.status)
+
+
+if __name__ == '__main__':
+    unittest.main()
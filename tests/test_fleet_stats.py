@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from classes import FleetStats as fs
+
+
+class FleetStatsTest(unittest.TestCase):
+    """
+    Tests of the fleet stats with NumPy and without it.
+    """
+
+    @staticmethod
+    def web_stats():
+        values = [('a', True, 100.0, 0.1, 0.2), ('b', False, 50.0, 0.5, 0.9), ('c', True, 90.0, -1, -1),
+                  ('d', False, 0.0, -1, -1), ('e', True, 99.5, 0.3, 0.4)]
+        return [{'name': name, 'status': status,
+                 'stats': {'availability': availability, 'response_avg': response_avg, 'response_p95': response_p95}}
+                for name, status, availability, response_avg, response_p95 in values]
+
+    def check_stats(self, fleet_stats):
+        self.assertEqual(fleet_stats.calculate(self.web_stats()), {
+            'webs': 5,
+            'down': 2,
+            'availability_avg': 67.9,
+            'response_avg': 0.3,
+            'worst_availability': [('d', 0.0), ('b', 50.0), ('c', 90.0)],
+            'worst_latency': [('b', 0.9), ('e', 0.4), ('a', 0.2)]
+        })
+        self.assertEqual(fleet_stats.calculate([])['webs'], 0)
+
+    @unittest.skipIf(fs.numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        fleet_stats = fs.FleetStats(worst=3)
+        self.assertTrue(fleet_stats.use_numpy)
+        self.check_stats(fleet_stats)
+
+    def test_python(self):
+        with mock.patch.object(fs, 'numpy', None):  # As if NumPy was not installed
+            fleet_stats = fs.FleetStats(worst=3)
+        self.assertFalse(fleet_stats.use_numpy)
+        self.check_stats(fleet_stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,18 @@
+import datetime
+import io
 import logging
+import pstats
+
+from classes import QueuedLog
 
 
 class ConsoleView(object):
     """
             A class that prints the data to console prompt
 
+            The output is written by a background thread and each stats report is written in one call, so printing
+            the stats of many webs doesn't stop the threads that show them
+
             Attributes
             ----------
             out : LogRecord
@@ -18,8 +26,9 @@ class ConsoleView(object):
         # Init new log with console output only
         log = logging.getLogger("View")
         log.setLevel(logging.INFO)
-        log.addHandler(logging.StreamHandler())
         log.propagate = False
+        if not log.handlers:  # Only one writer thread for all the views
+            QueuedLog.QueuedLog(log, logging.StreamHandler()).start()
         self.out = log
 
     @staticmethod
@@ -38,7 +47,109 @@ class ConsoleView(object):
         """
         return time.strftime('%d/%m/%Y %H:%M:%S')
 
-    def show_response(self, web_stats, time_from):
+    @staticmethod
+    def __format_window(minutes):
+        """Short name of a window of minutes
+
+        Parameters
+        ----------
+        minutes : int
+
+        Returns
+        -------
+        window : str
+            Example 24h or 7d
+        """
+        if minutes % (24 * 60) == 0:
+            return "{}d".format(minutes // (24 * 60)) if minutes > 24 * 60 else "{}h".format(minutes // 60)
+        if minutes % 60 == 0:
+            return "{}h".format(minutes // 60)
+        return "{}m".format(minutes)
+
+    @staticmethod
+    def __engine_lines(engine_stats):
+        """Lines with the stats of the engine
+
+        Parameters
+        ----------
+        engine_stats : dict
+            Stats of the connections, of the DNS cache, of the scheduler, of the load and the timings
+
+        Returns
+        -------
+        lines : list
+        """
+        lines = []
+        pool_stats = engine_stats['connections']
+        message = "Connections: hosts={}, requests={}, new connections={}, reuse={}%"
+        lines.append(message.format(pool_stats['hosts'], pool_stats['requests'], pool_stats['connections'],
+                                    pool_stats['reuse_rate']))
+        dns_stats = engine_stats['dns']
+        message = "DNS cache: hosts={}, hits={}, misses={}, hit rate={}%"
+        lines.append(message.format(dns_stats['entries'], dns_stats['hits'], dns_stats['misses'],
+                                    dns_stats['hit_rate']))
+        scheduler_stats = engine_stats['scheduler']
+        message = ("Scheduler: webs={}, checks={}, missed={}, lag avg={}s, lag max={}s, "
+                   "interval avg={}s (target {}s)")
+        lines.append(message.format(scheduler_stats['scheduled'], scheduler_stats['dispatched'],
+                                    scheduler_stats['missed'], scheduler_stats['lag_avg'], scheduler_stats['lag_max'],
+                                    scheduler_stats['interval_avg'], scheduler_stats['target_avg']))
+        if 'load' in engine_stats:
+            load_stats = engine_stats['load']
+            message = "Load: threads={}, requests in flight={}, checks queued={}, alerts queued={}"
+            message = message.format(load_stats['threads'], load_stats['in_flight'], load_stats['queued'],
+                                     load_stats.get('alerts', 0))
+            if 'workers' in load_stats:  # Coordinator
+                message += ", workers={}".format(load_stats['workers'])
+            if load_stats.get('pending'):  # Webs waiting for their start wave
+                message += ", webs waiting to start={}".format(load_stats['pending'])
+            lines.append(message)
+        if 'alert_delivery' in engine_stats:
+            delivery = engine_stats['alert_delivery']
+            message = ("Alert delivery: alerts={}, batches={}, sent={}, duplicates={}, held flapping={}, retries={}, "
+                       "failed={}, queued={}, batches pending={}")
+            lines.append(message.format(delivery['alerts'], delivery['batches'], delivery['sent'],
+                                        delivery['duplicates'], delivery['held'], delivery['retries'],
+                                        delivery['failed'], delivery['queued'], delivery['pending_batches']))
+        if engine_stats.get('timings'):
+            timings = ", ".join("{}={}ms (max {}ms, {} calls)".format(name, timing['avg_ms'], timing['max_ms'],
+                                                                      timing['count'])
+                                for name, timing in engine_stats['timings'].items())
+            lines.append("Timings AVG: {}".format(timings))
+        if 'snapshots' in engine_stats:
+            snapshot_stats = engine_stats['snapshots']
+            message = "Web reads: reads={}, retried={}, locked={}"
+            lines.append(message.format(snapshot_stats['reads'], snapshot_stats['retries'], snapshot_stats['locked']))
+        return lines
+
+    def show_monitor_stats(self, engine_stats):
+        """Print the stats of the monitor
+
+        Parameters
+        ----------
+        engine_stats : dict
+            Stats of the connections, of the DNS cache, of the scheduler, of the load and the timings
+        """
+        lines = ["Monitor stats at {}".format(self.__format_datetime(datetime.datetime.now()))]
+        lines.extend(self.__engine_lines(engine_stats))
+        self.out.info("\n".join(lines))
+
+    def show_profile(self, path, limit=20):
+        """Print the functions with more cumulative time of a profile
+
+        Parameters
+        ----------
+        path : str
+            File of the profile
+        limit : int
+            Number of functions printed
+        """
+        stream = io.StringIO()
+        stats = pstats.Stats(path, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        self.out.info("Profile saved in {}\n{}".format(path, stream.getvalue()))
+
+    def show_response(self, web_stats, time_from, engine_stats=None, fleet_stats=None):
         """Print all webs stats
 
         Parameters
@@ -47,17 +158,51 @@ class ConsoleView(object):
             Stats of all the webs
         time_from : datetime.datetime
             Time from the stats are calculated
+        engine_stats : dict
+            Stats of the connections, of the DNS cache and of the scheduler of the engine
+        fleet_stats : dict
+            Stats of all the webs together and the worst webs
         """
-        self.out.info("########################")
-        self.out.info("#   Web Monitor Stats  #")
-        self.out.info("########################")
-        self.out.info("Average calculated from {}".format(self.__format_datetime(time_from)))
+        lines = [
+            "########################",
+            "#   Web Monitor Stats  #",
+            "########################",
+            "Average calculated from {}".format(self.__format_datetime(time_from))
+        ]
+        if fleet_stats is not None:
+            message = "Fleet: webs={}, down={}, availability AVG={}%, response time AVG={}"
+            lines.append(message.format(fleet_stats['webs'], fleet_stats['down'], fleet_stats['availability_avg'],
+                                        fleet_stats['response_avg']))
+            if fleet_stats['worst_availability']:
+                worst = ", ".join("{}={}%".format(name, value) for name, value in fleet_stats['worst_availability'])
+                lines.append("Worst availability: {}".format(worst))
+            if fleet_stats['worst_latency']:
+                worst = ", ".join("{}={}".format(name, value) for name, value in fleet_stats['worst_latency'])
+                lines.append("Worst response time p95: {}".format(worst))
+        if engine_stats is not None:
+            lines.extend(self.__engine_lines(engine_stats))
         for web in web_stats:
-            self.out.info("Web: {}".format(web['name']))
-            self.out.info("Response time AVG: {}".format(web['stats']['response_avg']))
-            self.out.info("Response codes: {}".format(web['stats']['response_codes']))
-            self.out.info("Availability: {}%".format(web['stats']['availability']))
-            self.out.info("------------------------")
+            lines.append("Web: {}".format(web['name']))
+            stats = web['stats']
+            message = "Response time AVG: {} (p50={}, p95={}, p99={})"
+            lines.append(message.format(stats['response_avg'], stats['response_p50'], stats['response_p95'],
+                                        stats['response_p99']))
+            if stats.get('phases'):  # Webs without timings and stats read from the database have no phases
+                phases = ", ".join("{}={}".format(phase, seconds) for phase, seconds in stats['phases'].items())
+                lines.append("Phases AVG: {}".format(phases))
+            if stats.get('queue_wait_avg', -1) >= 0:
+                lines.append("Queue wait AVG: {}".format(stats['queue_wait_avg']))
+            lines.append("Response codes: {}".format(web['stats']['response_codes']))
+            if stats.get('reasons'):  # Responses with status 200 that failed a content check
+                lines.append("Content failures: {}".format(stats['reasons']))
+            lines.append("Availability: {}%".format(web['stats']['availability']))
+            if web.get('rollups'):
+                windows = ", ".join("{}={}%".format(self.__format_window(minutes), stats['availability'])
+                                    for minutes, stats in web['rollups'].items() if stats['count'])
+                if windows:
+                    lines.append("Availability long windows: {}".format(windows))
+            lines.append("------------------------")
+        self.out.info("\n".join(lines))  # One write for the whole report
 
     def web_available(self, web_name, actual_time):
         """Print website available
@@ -0,0 +1,209 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+import json
+import logging
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of the metrics server. Sends the last body rendered by the view, nothing is calculated here.
+    """
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/metrics':
+            body, content_type = self.server.view.prometheus, MetricsView.PROMETHEUS_CONTENT_TYPE
+        elif path == '/metrics.json':
+            body, content_type = self.server.view.json, 'application/json'
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Don't print each scrape
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    Threading HTTP server of the metrics view.
+    """
+
+    daemon_threads = True
+
+
+class MetricsView(object):
+    """
+    A class that serves the stats of the webs in Prometheus format (/metrics) and in JSON (/metrics.json)
+
+    The bodies are rendered when the stats are updated, not when they are requested, so a scrape only sends bytes that
+    are already built. Each web keeps its rendered lines and they are only rendered again when its stats change.
+
+    Attributes
+    ----------
+    host : str
+        Address where the server listens
+    port : int
+        Port where the server listens
+    prometheus : bytes
+        Last body in Prometheus text format
+    json : bytes
+        Last body in JSON
+    log : LogRecord
+        log object
+    _webs : dict
+        Stats, Prometheus lines of each metric and JSON of each web
+    _lock : Lock
+        Lock for the updates, that are done from the stats thread
+    _server : MetricsServer
+        HTTP server
+
+    Methods
+    -------
+    """
+
+    PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    # Name, type and help of the metrics of each web
+    WEB_METRICS = (
+        ('webmonitor_up', 'gauge', 'Status of the web. 1 up, 0 down'),
+        ('webmonitor_availability_percent', 'gauge', 'Percentage of available responses'),
+        ('webmonitor_response_time_avg_seconds', 'gauge', 'Average response time of the available responses'),
+        ('webmonitor_response_time_seconds', 'gauge', 'Percentiles of the response time of the available responses'),
+        ('webmonitor_phase_avg_seconds', 'gauge', 'Average seconds of each phase of the available responses'),
+        ('webmonitor_queue_wait_avg_seconds', 'gauge', 'Average seconds the checks waited before the request was sent'),
+        ('webmonitor_responses', 'gauge', 'Number of available responses by status code'),
+        ('webmonitor_content_failures', 'gauge', 'Number of responses with status 200 that failed a content check')
+    )
+
+    # Name, type, help and engine stats key of the metrics of the engine
+    ENGINE_METRICS = (
+        ('webmonitor_connection_requests_total', 'counter', 'Requests done', ('connections', 'requests')),
+        ('webmonitor_connections_total', 'counter', 'New connections opened', ('connections', 'connections')),
+        ('webmonitor_connection_reuse_percent', 'gauge', 'Percentage of requests that reused a connection',
+         ('connections', 'reuse_rate')),
+        ('webmonitor_dns_cache_hits_total', 'counter', 'Resolutions answered from the DNS cache', ('dns', 'hits')),
+        ('webmonitor_dns_cache_misses_total', 'counter', 'Resolutions that needed a DNS query', ('dns', 'misses')),
+        ('webmonitor_scheduler_webs', 'gauge', 'Webs scheduled', ('scheduler', 'scheduled')),
+        ('webmonitor_scheduler_checks', 'gauge', 'Checks dispatched in the last stats interval',
+         ('scheduler', 'dispatched')),
+        ('webmonitor_scheduler_missed', 'gauge', 'Checks missed in the last stats interval', ('scheduler', 'missed')),
+        ('webmonitor_scheduler_lag_avg_seconds', 'gauge', 'Average delay of the checks in the last stats interval',
+         ('scheduler', 'lag_avg')),
+        ('webmonitor_scheduler_lag_max_seconds', 'gauge', 'Max delay of the checks in the last stats interval',
+         ('scheduler', 'lag_max'))
+    )
+
+    def __init__(self, host, port):
+        """
+        Parameters
+        ----------
+        host : str
+            Address where the server listens
+        port : int
+            Port where the server listens
+        """
+        self.host = host
+        self.port = port
+        self.prometheus = b''
+        self.json = b'{}'
+        self.log = logging.getLogger("Monitor")
+        self._webs = {}
+        self._lock = Lock()
+        self._server = None
+
+    def start(self):
+        """Starts the HTTP server in its own thread
+        """
+        self._server = MetricsServer((self.host, self.port), MetricsHandler)
+        self._server.view = self
+        Thread(target=self._server.serve_forever, name="Metrics", daemon=True).start()
+        self.log.info("Serving metrics on http://{}:{}/metrics".format(self.host, self._server.server_port))
+
+    @staticmethod
+    def __label(value):
+        """Escape a label value of the Prometheus format
+
+        Parameters
+        ----------
+        value : str
+
+        Returns
+        -------
+        value : str
+        """
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @classmethod
+    def render_web(cls, web):
+        """Prometheus lines of each metric of a web
+
+        Parameters
+        ----------
+        web : dict
+            Name, stats and status of the web
+
+        Returns
+        -------
+        lines : tuple
+            Lines of each metric of WEB_METRICS
+        """
+        stats = web['stats']
+        label = 'web="{}"'.format(cls.__label(web['name']))
+        percentiles = ''.join('webmonitor_response_time_seconds{{{},quantile="0.{}"}} {}\n'.format(
+            label, key[len('response_p'):], stats[key]) for key in ('response_p50', 'response_p95', 'response_p99'))
+        phases = ''.join('webmonitor_phase_avg_seconds{{{},phase="{}"}} {}\n'.format(label, phase, seconds)
+                         for phase, seconds in stats.get('phases', {}).items())
+        codes = ''.join('webmonitor_responses{{{},code="{}"}} {}\n'.format(label, code, count)
+                        for code, count in sorted(stats['response_codes'].items()))
+        reasons = ''.join('webmonitor_content_failures{{{},reason="{}"}} {}\n'.format(label, reason, count)
+                          for reason, count in sorted(stats.get('reasons', {}).items()))
+        return (
+            'webmonitor_up{{{}}} {}\n'.format(label, 1 if web['status'] else 0),
+            'webmonitor_availability_percent{{{}}} {}\n'.format(label, stats['availability']),
+            'webmonitor_response_time_avg_seconds{{{}}} {}\n'.format(label, stats['response_avg']),
+            percentiles,
+            phases,
+            'webmonitor_queue_wait_avg_seconds{{{}}} {}\n'.format(label, stats.get('queue_wait_avg', -1)),
+            codes,
+            reasons
+        )
+
+    def update(self, web_stats, engine_stats):
+        """Render the bodies with new stats. Only the webs whose stats changed are rendered again
+
+        Parameters
+        ----------
+        web_stats : list
+            Name, stats and status of each web
+        engine_stats : dict
+            Stats of the connections, of the DNS cache and of the scheduler of the engine. None if there are no stats
+            yet
+        """
+        with self._lock:
+            webs = {}
+            for web in web_stats:
+                cached = self._webs.get(web['name'])
+                if cached is not None and (cached[0] is web or cached[0] == web):  # Nothing changed
+                    webs[web['name']] = cached
+                else:
+                    webs[web['name']] = (web, self.render_web(web), json.dumps(web))
+            self._webs = webs  # Removed webs are dropped
+
+            parts = []
+            for index, (name, metric_type, description) in enumerate(self.WEB_METRICS):
+                parts.append('# HELP {} {}\n# TYPE {} {}\n'.format(name, description, name, metric_type))
+                parts.extend(cached[1][index] for cached in webs.values())
+            for name, metric_type, description, (group, key) in self.ENGINE_METRICS if engine_stats else ():
+                parts.append('# HELP {} {}\n# TYPE {} {}\n{} {}\n'.format(name, description, name, metric_type, name,
+                                                                          engine_stats[group][key]))
+
+            # Replacing the references is atomic, the server threads always read a complete body
+            self.prometheus = ''.join(parts).encode()
+            self.json = '{{"engine": {}, "webs": [{}]}}'.format(
+                json.dumps(engine_stats), ', '.join(cached[2] for cached in webs.values())).encode()